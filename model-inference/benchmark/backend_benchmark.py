@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+CPU inference backend benchmark
+Compares latency and throughput of PyTorch, ONNX Runtime, OpenVINO and TorchScript
+on images from model-monitoring/test/input
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Reuse the same backend and batching code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from backends import BACKENDS, load_model
+from batching import build_batch
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "test", "input")
+
+
+def load_images(input_folder):
+    """Load all images from folder"""
+    images = []
+    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
+        image = cv2.imread(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def measure_latency(model, images, imgsz, repeats):
+    """Per-image latency in ms (batch size 1) and number of detections per image"""
+    latencies = []
+    detections = []
+    for _ in range(repeats):
+        for image in images:
+            start_time = time.perf_counter()
+            result = model(image, imgsz=imgsz, verbose=False)[0]
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            detections.append(len(result.boxes))
+    return np.array(latencies), detections[:len(images)]
+
+
+def measure_throughput(model, images, imgsz, batch_size, repeats):
+    """Images/sec with letterboxed batches"""
+    batch = [images[i % len(images)] for i in range(batch_size)]
+    frames, _ = build_batch(batch, imgsz)
+
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        model(frames, imgsz=imgsz, verbose=False)
+    return batch_size * repeats / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO CPU inference backend benchmark")
+    parser.add_argument("--model", default="yolov8n.pt", help="Path to YOLO .pt weights")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated backends")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--batch-size", type=int, default=8, help="Batch size for throughput run")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the input images")
+    parser.add_argument("--cache-dir", default=".export-cache", help="Exported models cache")
+    args = parser.parse_args()
+
+    images = load_images(args.input)
+    if not images:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    print(f"📁 {len(images)} images | imgsz={args.imgsz} | batch={args.batch_size}")
+    rows = []
+    reference = None
+    for backend in args.backends.split(","):
+        try:
+            model = load_model(args.model, backend, args.imgsz, args.cache_dir)
+        except Exception as e:
+            print(f"❌ {backend}: {e}")
+            continue
+
+        # Warm-up
+        model(images[0], imgsz=args.imgsz, verbose=False)
+
+        latencies, detections = measure_latency(model, images, args.imgsz, args.repeats)
+        throughput = measure_throughput(model, images, args.imgsz, args.batch_size, args.repeats)
+        if reference is None:
+            reference = detections
+        mismatched = sum(1 for a, b in zip(detections, reference) if a != b)
+        rows.append((backend, np.percentile(latencies, 50), np.percentile(latencies, 95), throughput, mismatched))
+
+    print(f"\n{'backend':>12} | {'p50 ms':>8} | {'p95 ms':>8} | {'images/sec':>10} | {'count diff':>10}")
+    print("-" * 62)
+    for backend, p50, p95, throughput, mismatched in rows:
+        print(f"{backend:>12} | {p50:>8.1f} | {p95:>8.1f} | {throughput:>10.2f} | {mismatched:>10}")
+    if rows:
+        print(f"\n'count diff' = images where the number of detections differs from '{rows[0][0]}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+CPU throughput benchmark for batched YOLO inference
+Compares images/sec at different batch sizes using letterboxed mixed-size images
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+from ultralytics import YOLO
+
+# Reuse the same batching code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from batching import build_batch, scale_boxes
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "test", "input")
+
+
+def load_images(input_folder):
+    """Load all images from folder"""
+    images = []
+    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
+        image = cv2.imread(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def run_batch(model, images, imgsz):
+    """Letterbox, infer and map boxes back for one batch"""
+    frames, metas = build_batch(images, imgsz)
+    results = model(frames, imgsz=imgsz, verbose=False)
+    for result, meta in zip(results, metas):
+        scale_boxes(result.boxes.xyxy.cpu().numpy(), meta)
+
+
+def benchmark(model, images, batch_size, imgsz, total_images, warmup):
+    """Measure images/sec for the given batch size"""
+    batches = [
+        [images[(start + i) % len(images)] for i in range(batch_size)]
+        for start in range(0, total_images, batch_size)
+    ]
+
+    for batch in batches[:warmup]:
+        run_batch(model, batch, imgsz)
+
+    start_time = time.perf_counter()
+    for batch in batches:
+        run_batch(model, batch, imgsz)
+    elapsed = time.perf_counter() - start_time
+
+    processed = len(batches) * batch_size
+    return processed / elapsed, elapsed * 1000 / len(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched YOLO inference benchmark (CPU)")
+    parser.add_argument("--model", default="yolov8n.pt", help="Path to YOLO weights")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--batch-sizes", default="1,4,8,16", help="Comma-separated batch sizes")
+    parser.add_argument("--images", type=int, default=64, help="Images processed per batch size")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--warmup", type=int, default=2, help="Warm-up batches per batch size")
+    args = parser.parse_args()
+
+    images = load_images(args.input)
+    if not images:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    print(f"🤖 Loading model: {args.model}")
+    model = YOLO(args.model)
+
+    print(f"📁 {len(images)} source images | imgsz={args.imgsz} | {args.images} images per run")
+    print(f"{'batch':>6} | {'images/sec':>10} | {'ms/batch':>9}")
+    print("-" * 32)
+
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        throughput, batch_latency = benchmark(model, images, batch_size, args.imgsz, args.images, args.warmup)
+        print(f"{batch_size:>6} | {throughput:>10.2f} | {batch_latency:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
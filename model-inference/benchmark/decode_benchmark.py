@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Reduced-resolution decode benchmark
+Decode time of full versus DCT-downscaled JPEG decoding per decoder backend, and detection
+parity: boxes from the reduced decode (scaled back to original coordinates) are matched
+against a full-resolution OpenCV decode of the same image.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+# Reuse the decoder of the FastAPI service and the matching of the tiling benchmark
+# (which puts ray-deploy first on the path, so postprocess is the Ray Serve copy)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "yolo"))
+from decoding import DECODER_BACKENDS, ImageDecoder, rescale_columns
+from tiling_benchmark import DEFAULT_INPUT, matched
+from postprocess import result_columns
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def load_files(input_folder):
+    """(file name, bytes) of every image in the folder"""
+    files = []
+    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            with open(path, "rb") as file:
+                files.append((os.path.basename(path), file.read()))
+    return files
+
+
+def detect(model, decoded, imgsz):
+    """Detections of a decoded image in original image coordinates"""
+    image, scale, shape = decoded
+    return rescale_columns(result_columns(model(image, imgsz=imgsz, verbose=False)[0]), scale, shape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full versus reduced-resolution JPEG decoding: time and detection parity")
+    parser.add_argument("--model", default="yolov8n.pt", help="Path to YOLO weights")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--backends", default=",".join(DECODER_BACKENDS), help="Comma-separated decoder backends")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size (target size of the reduced decode)")
+    parser.add_argument("--max-factor", type=int, default=8, help="Largest reduction factor (2, 4 or 8)")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU threshold for a match")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed decodes per image")
+    args = parser.parse_args()
+
+    files = load_files(args.input)
+    if not files:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    model = YOLO(args.model)
+    reference_decoder = ImageDecoder("opencv")
+    references = []
+    for _, contents in files:
+        decoded = reference_decoder.decode(contents)
+        references.append(detect(model, decoded, args.imgsz))
+    total_reference = sum(len(reference["bbox"]) for reference in references)
+    jpegs = sum(1 for name, _ in files if name.lower().endswith((".jpg", ".jpeg")))
+    print(f"📁 {len(files)} images ({jpegs} JPEG) | {total_reference} reference boxes (full OpenCV decode) | imgsz={args.imgsz}")
+
+    print(f"\n{'backend':>10} | {'mode':>7} | {'MPix/img':>8} | {'p50 ms':>7} | {'p95 ms':>7} | {'total ms':>8} | "
+          f"{'boxes':>6} | {'recall':>7} | {'precision':>9}")
+    print("-" * 95)
+    for backend in args.backends.split(","):
+        try:
+            decoder = ImageDecoder(backend, max_factor=args.max_factor)
+        except ImportError as e:
+            print(f"{backend:>10} | skipped: {e}")
+            continue
+
+        for mode, target_size in (("full", 0), ("reduced", args.imgsz)):
+            latencies, pixels, boxes, found = [], [], 0, 0
+            for (_, contents), reference in zip(files, references):
+                for _ in range(args.repeats):
+                    start_time = time.perf_counter()
+                    decoded = decoder.decode(contents, target_size)
+                    latencies.append((time.perf_counter() - start_time) * 1000)
+                if decoded[0] is None:
+                    continue
+                pixels.append(decoded[0].shape[0] * decoded[0].shape[1] / 1e6)
+                columns = detect(model, decoded, args.imgsz)
+                boxes += len(columns["bbox"])
+                found += matched(reference, columns, args.iou)
+
+            recall = found / total_reference if total_reference else float("nan")
+            precision = found / boxes if boxes else float("nan")
+            print(f"{backend:>10} | {mode:>7} | {np.mean(pixels):>8.2f} | {np.percentile(latencies, 50):>7.2f} | "
+                  f"{np.percentile(latencies, 95):>7.2f} | {sum(latencies) / args.repeats:>8.1f} | {boxes:>6} | "
+                  f"{recall:>7.3f} | {precision:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Post-processing and response encoding benchmark
+Compares the previous per-box conversion loops (Ray Serve: tensor indexing per box,
+FastAPI: numpy columns converted value by value) with the vectorized columnar conversion
+and measures encode time / payload size of each response format
+for 1, 50 and 300 detections per image
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+# Reuse the same post-processing and response code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from postprocess import result_columns, to_records
+from responses import COLUMNAR_JSON, JSON, MSGPACK, encode, msgpack, upload_response
+
+NAMES = {i: f"class_{i}" for i in range(80)}
+
+
+def make_result(detections, seed=0):
+    """Synthetic ultralytics result with the given number of boxes"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 1200, size=(detections, 2))
+    wh = rng.uniform(10, 300, size=(detections, 2))
+    data = np.column_stack([
+        xy, xy + wh,
+        rng.uniform(0.25, 1.0, size=detections),
+        rng.integers(0, len(NAMES), size=detections),
+    ]).astype(np.float32)
+    image = np.zeros((1280, 1280, 3), dtype=np.uint8)
+    return Results(image, path="synthetic.jpg", names=NAMES, boxes=torch.from_numpy(data))
+
+
+def box_loop_records(result):
+    """Previous Ray Serve conversion: per-box Boxes objects, tensor indexing and .tolist() per value"""
+    detections = []
+    for box in result.boxes:
+        class_id = int(box.cls[0])
+        detections.append({
+            "bbox": box.xyxy[0].tolist(),
+            "confidence": float(box.conf[0]),
+            "class_name": result.names[class_id]
+        })
+    return detections
+
+
+def loop_records(result):
+    """Previous FastAPI conversion: one .cpu().numpy() per column, then float() per value"""
+    detections = []
+    boxes = result.boxes.xyxy.cpu().numpy()
+    confidences = result.boxes.conf.cpu().numpy()
+    class_ids = result.boxes.cls.cpu().numpy().astype(int)
+    for box, confidence, class_id in zip(boxes, confidences, class_ids):
+        x1, y1, x2, y2 = box
+        detections.append({
+            "bbox": [float(x1), float(y1), float(x2), float(y2)],
+            "confidence": float(confidence),
+            "class_name": result.names[class_id]
+        })
+    return detections
+
+
+def timeit(fn, repeats):
+    """Median call time in microseconds"""
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start_time) * 1e6)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO post-processing / response encoding benchmark")
+    parser.add_argument("--detections", default="1,50,300", help="Comma-separated detections per image")
+    parser.add_argument("--precision", type=int, default=2, help="Decimals for the rounded variant")
+    parser.add_argument("--repeats", type=int, default=500, help="Timed calls per measurement")
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.detections.split(",")]
+    formats = [JSON, COLUMNAR_JSON] + ([MSGPACK] if msgpack else [])
+    if msgpack is None:
+        print("⚠️  msgpack is not installed, skipping msgpack encoding")
+
+    print("\nPost-processing (µs per image)")
+    print(f"{'detections':>10} | {'per-box loop':>12} | {'numpy loop':>10} | {'columnar':>10} | {'+records':>10} | "
+          f"{'speedup':>8}")
+    print("-" * 75)
+    for count in counts:
+        result = make_result(count)
+        box_loop_us = timeit(lambda: box_loop_records(result), args.repeats)
+        loop_us = timeit(lambda: loop_records(result), args.repeats)
+        columns_us = timeit(lambda: result_columns(result), args.repeats)
+        records_us = timeit(lambda: to_records(result_columns(result)), args.repeats)
+        print(f"{count:>10} | {box_loop_us:>12.1f} | {loop_us:>10.1f} | {columns_us:>10.1f} | {records_us:>10.1f} | "
+              f"x{box_loop_us / records_us:>7.2f}")
+
+    print("\nResponse encoding (µs / bytes per response)")
+    print(f"{'detections':>10} | {'format':>36} | {'precision':>9} | {'encode µs':>10} | {'bytes':>8}")
+    print("-" * 86)
+    for count in counts:
+        columns = result_columns(make_result(count))
+        for media_type in formats:
+            for precision in (None, args.precision):
+                def build_and_encode():
+                    return encode(upload_response(columns, 12.5, media_type, precision), media_type)
+
+                encode_us = timeit(build_and_encode, args.repeats)
+                size = len(build_and_encode())
+                label = "full" if precision is None else str(precision)
+                print(f"{count:>10} | {media_type:>36} | {label:>9} | {encode_us:>10.1f} | {size:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Preprocessing allocation micro-benchmark
+Compares the allocating letterbox/normalize path (per-request copies, like ultralytics
+preprocessing) with the pooled path from buffer_pool.py. Each mode runs in a fresh
+process, so peak RSS is measured independently.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Reuse the same preprocessing code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from batching import build_batch
+from buffer_pool import BufferPool, PooledPreprocessor
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "test", "input")
+MODES = ("allocating", "pooled")
+
+
+def load_images(input_folder):
+    """Load all images from folder"""
+    images = []
+    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
+        image = cv2.imread(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def allocating(images, imgsz):
+    """letterbox copies + stack + channel flip/transpose + float conversion per batch"""
+    frames, _ = build_batch(images, imgsz)
+    batch = np.stack(frames)[..., ::-1].transpose(0, 3, 1, 2)
+    tensor = np.ascontiguousarray(batch).astype(np.float32) / 255.0
+    return float(tensor[0, 0, 0, 0])
+
+
+def make_pooled(imgsz):
+    preprocessor = PooledPreprocessor(imgsz, BufferPool())
+
+    def pooled(images, _):
+        with preprocessor.batch(images) as (tensor, _metas):
+            return float(tensor[0, 0, 0, 0])
+
+    return pooled, preprocessor.pool
+
+
+def run_mode(mode, input_folder, imgsz, batch_size, iterations):
+    """Runs in a child process and returns its measurements"""
+    images = load_images(input_folder)
+    batches = [[images[(i + j) % len(images)] for j in range(batch_size)] for i in range(len(images))]
+
+    pool = None
+    if mode == "pooled":
+        preprocess, pool = make_pooled(imgsz)
+    else:
+        preprocess = allocating
+
+    # Warm-up: fills the pool and the allocator caches
+    for batch in batches:
+        preprocess(batch, imgsz)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    faults_before = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    pool_allocations = pool.allocations if pool else 0
+    latencies = []
+    peak_per_batch = []
+    for i in range(iterations):
+        batch = batches[i % len(batches)]
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        preprocess(batch, imgsz)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        peak_per_batch.append(tracemalloc.get_traced_memory()[1] - current)
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults_before
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "transient_mb_per_batch": float(np.mean(peak_per_batch)) / 1024 ** 2,
+        "page_faults_per_batch": faults / iterations,
+        "buffer_allocations": (pool.allocations - pool_allocations) if pool else None,
+        "pool": pool.stats() if pool else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing allocation micro-benchmark")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per batch")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed batches per mode")
+    parser.add_argument("--output", default=None, help="Optional JSON file with the results")
+    args = parser.parse_args()
+
+    if not load_images(args.input):
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for mode in MODES:
+        with context.Pool(1) as pool:
+            rows.append(pool.apply(run_mode, (mode, args.input, args.imgsz, args.batch_size, args.iterations)))
+
+    print(f"\nimgsz={args.imgsz} | batch={args.batch_size} | iterations={args.iterations}")
+    print(f"{'mode':>11} | {'p50 ms':>7} | {'MB/batch':>9} | {'faults/batch':>12} | {'buffer allocs':>13} | {'peak RSS MB':>11}")
+    print("-" * 80)
+    for row in rows:
+        allocations = "-" if row["buffer_allocations"] is None else row["buffer_allocations"]
+        print(f"{row['mode']:>11} | {row['p50_ms']:>7.2f} | {row['transient_mb_per_batch']:>9.1f} | "
+              f"{row['page_faults_per_batch']:>12.1f} | {allocations:>13} | {row['peak_rss_mb']:>11.1f}")
+    print("\nMB/batch = transient numpy/Python allocations (tracemalloc peak), "
+          "faults/batch = minor page faults, buffer allocs = new pool buffers after warm-up")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(rows, file, indent=2)
+        print(f"📄 Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
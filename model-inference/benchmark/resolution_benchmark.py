@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Adaptive resolution benchmark
+Throughput versus accuracy of the resolutions the adaptive mode can pick (640 -> 480 -> 320).
+Accuracy is recall/precision against YOLO-format labels when --labels is given, otherwise
+against detections at --reference-imgsz as pseudo ground truth.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+# Reuse the same preprocessing and post-processing code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from buffer_pool import BufferPool, PooledPreprocessor
+from postprocess import result_columns
+from tiling_benchmark import DEFAULT_INPUT, load_images, load_labels, matched
+
+
+def detect(model, preprocessor, images):
+    """Server inference path: pooled letterbox/normalize, one forward pass, boxes in image coordinates"""
+    with preprocessor.batch(images) as (tensor, metas):
+        results = model(torch.from_numpy(tensor), verbose=False)
+        return [result_columns(result, meta) for result, meta in zip(results, metas)]
+
+
+def run(model, images, imgsz, batch_size, repeats):
+    """Returns per-image columns and per-batch latencies in ms"""
+    preprocessor = PooledPreprocessor(imgsz, BufferPool())
+    detect(model, preprocessor, images[:batch_size])  # warm-up
+
+    columns, latencies = [], []
+    for repeat in range(repeats):
+        for start in range(0, len(images), batch_size):
+            batch = images[start:start + batch_size]
+            start_time = time.perf_counter()
+            batch_columns = detect(model, preprocessor, batch)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            if repeat == 0:
+                columns.extend(batch_columns)
+    return columns, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO adaptive resolution throughput / accuracy benchmark")
+    parser.add_argument("--model", default="yolov8n.pt", help="Path to YOLO weights")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--labels", default=None, help="Folder with YOLO txt labels (same file names)")
+    parser.add_argument("--resolutions", default="640,480,416,320,256", help="Comma-separated inference sizes")
+    parser.add_argument("--reference-imgsz", type=int, default=640, help="Pseudo ground truth size without --labels")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per forward pass")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU threshold for a match")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the images")
+    args = parser.parse_args()
+
+    named_images = load_images(args.input)
+    if not named_images:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+    images = [image for _, image in named_images]
+
+    model = YOLO(args.model)
+    if args.labels:
+        references = [load_labels(args.labels, name, image.shape, model.names) for name, image in named_images]
+        reference_name = "labels"
+    else:
+        references, _ = run(model, images, args.reference_imgsz, args.batch_size, 1)
+        reference_name = f"imgsz={args.reference_imgsz}"
+    total_truth = sum(len(reference["bbox"]) for reference in references)
+    print(f"📁 {len(images)} images | {total_truth} reference boxes ({reference_name}) | batch={args.batch_size}")
+
+    print(f"\n{'imgsz':>6} | {'img/s':>7} | {'p50 ms':>7} | {'p95 ms':>7} | {'boxes':>6} | {'recall':>7} | {'precision':>9}")
+    print("-" * 66)
+    for imgsz in sorted({int(size) for size in args.resolutions.split(",")}, reverse=True):
+        columns, latencies = run(model, images, imgsz, args.batch_size, args.repeats)
+        boxes = sum(len(image_columns["bbox"]) for image_columns in columns)
+        found = sum(matched(reference, image_columns, args.iou) for reference, image_columns in zip(references, columns))
+
+        throughput = len(images) * args.repeats / (sum(latencies) / 1000)
+        recall = found / total_truth if total_truth else float("nan")
+        precision = found / boxes if boxes else float("nan")
+        print(f"{imgsz:>6} | {throughput:>7.1f} | {np.percentile(latencies, 50):>7.1f} | "
+              f"{np.percentile(latencies, 95):>7.1f} | {boxes:>6} | {recall:>7.3f} | {precision:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
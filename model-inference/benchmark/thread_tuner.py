@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Thread topology tuner
+Sweeps replica count, CPUs per replica and torch intra/inter-op / OpenCV threads on this
+machine and picks the configuration with the highest throughput at a target p99.
+
+Each replica is a separate process running the ObjectDetection path (JPEG decode, pooled
+letterbox/normalize, batched forward pass, box conversion) with its thread pools sized by
+thread_topology.py, pulling batches from a shared queue like Serve's batching. For every
+configuration the closed-loop concurrency is doubled until p99 exceeds the target; the
+best throughput within the target counts. The winner is printed as environment variables
+for run_serve.py (and written to --env-file).
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+# Reuse the same preprocessing code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "test", "input")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def load_corpus(input_folder):
+    """Encoded images, decoded by the replicas like uploads"""
+    corpus = []
+    for name in sorted(os.listdir(input_folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(input_folder, name), "rb") as file:
+                corpus.append(file.read())
+    return corpus
+
+
+def replica(config, args, cores, requests, results, ready):
+    """One model replica: thread pools sized to its CPUs, dynamic batches from the shared queue"""
+    if cores and args.pin:
+        # Pinned to its share of the cores, like a container CPU limit
+        os.sched_setaffinity(0, cores)
+
+    from thread_topology import apply_thread_topology
+    threads = apply_thread_topology(config["cpus"], config["intra_op"], config["inter_op"], config["cv2"])
+
+    import cv2
+    import torch
+    from ultralytics import YOLO
+    from buffer_pool import BufferPool, PooledPreprocessor
+    from postprocess import result_columns
+
+    model = YOLO(args.model)
+    preprocessor = PooledPreprocessor(args.imgsz, BufferPool())
+
+    def detect(contents):
+        images = [cv2.imdecode(np.frombuffer(item, np.uint8), cv2.IMREAD_COLOR) for item in contents]
+        with preprocessor.batch(images) as (tensor, metas):
+            outputs = model(torch.from_numpy(tensor), verbose=False)
+            return [result_columns(output, meta) for output, meta in zip(outputs, metas)]
+
+    detect([args.warmup_image] * args.batch_size)
+    ready.put(threads)
+
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        batch = [item]
+        deadline = time.perf_counter() + args.batch_wait_s
+        while len(batch) < args.batch_size:
+            try:
+                item = requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is None:
+                requests.put(None)  # leave the stop signal for the other replicas
+                break
+            batch.append(item)
+        detect([contents for _, _, contents in batch])
+        finished_at = time.perf_counter()
+        for request_id, sent_at, _ in batch:
+            results.put((request_id, (finished_at - sent_at) * 1000))
+
+
+def measure(requests, results, corpus, concurrency, duration, warmup):
+    """Closed loop: keeps `concurrency` requests outstanding; returns (req/s, p50, p99)"""
+    sent = 0
+    for _ in range(concurrency):
+        requests.put((sent, time.perf_counter(), corpus[sent % len(corpus)]))
+        sent += 1
+
+    latencies = []
+    start_time = time.perf_counter()
+    measure_from, end_at = start_time + warmup, start_time + warmup + duration
+    while time.perf_counter() < end_at:
+        try:
+            _, latency_ms = results.get(timeout=max(0.01, end_at - time.perf_counter()))
+        except queue.Empty:
+            break
+        if time.perf_counter() >= measure_from:
+            latencies.append(latency_ms)
+        requests.put((sent, time.perf_counter(), corpus[sent % len(corpus)]))
+        sent += 1
+
+    # Drain the requests still in flight before the next level
+    for _ in range(concurrency):
+        try:
+            results.get(timeout=60)
+        except queue.Empty:
+            break
+    if not latencies:
+        return 0.0, None, None
+    return len(latencies) / duration, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def run_config(config, args, corpus):
+    context = multiprocessing.get_context("spawn")
+    requests, results, ready = context.Queue(), context.Queue(), context.Queue()
+    cpus_per_replica = max(1, int(config["cpus"]))
+    available = sorted(os.sched_getaffinity(0))
+    processes = []
+    for index in range(config["replicas"]):
+        cores = available[index * cpus_per_replica:(index + 1) * cpus_per_replica]
+        process = context.Process(target=replica, args=(config, args, cores, requests, results, ready), daemon=True)
+        process.start()
+        processes.append(process)
+
+    threads = [ready.get(timeout=args.ready_timeout) for _ in processes]
+    levels = []
+    try:
+        concurrency = config["replicas"]
+        while concurrency <= args.max_concurrency:
+            throughput, p50, p99 = measure(requests, results, corpus, concurrency, args.duration, args.warmup)
+            levels.append({"concurrency": concurrency, "throughput": throughput, "p50_ms": p50, "p99_ms": p99})
+            if p99 is None or p99 > args.target_p99_ms:
+                break
+            concurrency *= 2
+    finally:
+        for _ in processes:
+            requests.put(None)
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+    within = [level for level in levels if level["p99_ms"] is not None and level["p99_ms"] <= args.target_p99_ms]
+    best = max(within, key=lambda level: level["throughput"]) if within else None
+    return {**config, "threads": threads[0], "levels": levels, "best": best}
+
+
+def configurations(args):
+    """Grid of topologies that fit into the CPUs of this machine"""
+    cpus = args.cpus or len(os.sched_getaffinity(0))
+    grid = itertools.product(
+        (int(value) for value in args.replicas.split(",")),
+        (float(value) for value in args.replica_cpus.split(",")),
+        (int(value) for value in args.intra_op.split(",")),
+        (int(value) for value in args.inter_op.split(",")),
+        (int(value) for value in args.cv2_threads.split(",")),
+    )
+    seen = set()
+    for replicas, replica_cpus, intra_op, inter_op, cv2_threads in grid:
+        if replicas * replica_cpus > cpus:
+            continue
+        # 0 = derived from the replica CPUs, so equal thread counts are the same configuration
+        key = (replicas, replica_cpus, intra_op or max(1, int(replica_cpus)), inter_op or 1, cv2_threads or 1)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield {"replicas": replicas, "cpus": replica_cpus, "intra_op": intra_op, "inter_op": inter_op, "cv2": cv2_threads}
+
+
+def to_env(config):
+    return {
+        "MODEL_MIN_REPLICAS": str(config["replicas"]),
+        "MODEL_MAX_REPLICAS": str(config["replicas"]),
+        "MODEL_NUM_CPUS": f"{config['cpus']:g}",
+        "TORCH_INTRA_OP_THREADS": str(config["threads"]["torch_intra_op"]),
+        "TORCH_INTER_OP_THREADS": str(config["threads"]["torch_inter_op"]),
+        "CV2_THREADS": str(config["threads"]["cv2"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep replica / thread topologies for the best throughput at a target p99")
+    parser.add_argument("--model", default="yolov8n.pt", help="Path to YOLO weights")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--target-p99-ms", type=float, default=500.0, help="Latency target")
+    parser.add_argument("--replicas", default="1,2,4", help="Replica counts")
+    parser.add_argument("--replica-cpus", default="1,2,4", help="CPUs reserved per replica")
+    parser.add_argument("--intra-op", default="0,1", help="Torch intra-op threads (0 = replica CPUs)")
+    parser.add_argument("--inter-op", default="1", help="Torch inter-op threads")
+    parser.add_argument("--cv2-threads", default="1,2", help="OpenCV threads per replica (0 = 1)")
+    parser.add_argument("--cpus", type=int, default=0, help="CPUs available to the replicas (0 = all of this machine)")
+    parser.add_argument("--pin", action="store_true", help="Pin every replica to its own cores")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--batch-size", type=int, default=8, help="BATCH_MAX_SIZE of the replicas")
+    parser.add_argument("--batch-wait-s", type=float, default=0.05, help="BATCH_WAIT_TIMEOUT_S of the replicas")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Highest closed-loop concurrency")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds excluded per concurrency level")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="Seconds to wait for replicas to load")
+    parser.add_argument("--output", default=None, help="Optional JSON file with all results")
+    parser.add_argument("--env-file", default=None, help="Write the best configuration as KEY=value lines")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.input)
+    if not corpus:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+    args.warmup_image = corpus[0]
+
+    rows = []
+    print(f"{'replicas':>8} | {'CPUs':>4} | {'intra':>5} | {'inter':>5} | {'cv2':>3} | {'clients':>7} | "
+          f"{'req/s':>7} | {'p50 ms':>7} | {'p99 ms':>7}")
+    print("-" * 78)
+    for config in configurations(args):
+        row = run_config(config, args, corpus)
+        rows.append(row)
+        threads, best = row["threads"], row["best"]
+        if best:
+            print(f"{row['replicas']:>8} | {row['cpus']:>4g} | {threads['torch_intra_op']:>5} | {threads['torch_inter_op']:>5} | "
+                  f"{threads['cv2']:>3} | {best['concurrency']:>7} | {best['throughput']:>7.1f} | "
+                  f"{best['p50_ms']:>7.1f} | {best['p99_ms']:>7.1f}")
+        else:
+            print(f"{row['replicas']:>8} | {row['cpus']:>4g} | {threads['torch_intra_op']:>5} | {threads['torch_inter_op']:>5} | "
+                  f"{threads['cv2']:>3} | {'-':>7} | p99 above {args.target_p99_ms:g} ms at the lowest load")
+
+    candidates = [row for row in rows if row["best"]]
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"target_p99_ms": args.target_p99_ms, "results": rows}, file, indent=2, default=str)
+        print(f"📄 Results saved: {args.output}")
+    if not candidates:
+        print(f"❌ No configuration reaches p99 <= {args.target_p99_ms:g} ms")
+        sys.exit(1)
+
+    winner = max(candidates, key=lambda row: row["best"]["throughput"])
+    env = to_env(winner)
+    print(f"\n🏆 {winner['best']['throughput']:.1f} req/s at p99 {winner['best']['p99_ms']:.1f} ms "
+          f"(target {args.target_p99_ms:g} ms):")
+    for key, value in env.items():
+        print(f"   {key}={value}")
+    if args.env_file:
+        with open(args.env_file, "w") as file:
+            file.writelines(f"{key}={value}\n" for key, value in env.items())
+        print(f"📄 Configuration saved: {args.env_file} (add it to .env for run_serve.py)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tiled inference benchmark
+Latency versus recall of tiled inference against plain single-pass inference.
+Recall is measured against YOLO-format labels when --labels is given, otherwise
+against a dense high-resolution reference (small tiles, large overlap) as pseudo ground truth.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+# Reuse the same tiling and post-processing code as the Ray Serve deployment
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from postprocess import result_columns
+from tiling import crop_tiles, merge_tiles, tile_grid
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "test", "input")
+DEFAULT_CONFIGS = "none,1024:0.2:16,640:0.2:16,640:0.3:32,480:0.2:32"
+
+
+def load_images(input_folder):
+    """Load all images from folder with their names"""
+    images = []
+    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
+        image = cv2.imread(path)
+        if image is not None:
+            images.append((os.path.splitext(os.path.basename(path))[0], image))
+    return images
+
+
+def load_labels(labels_folder, name, shape, names):
+    """YOLO txt labels (class cx cy w h, normalized) -> columns in pixels"""
+    path = os.path.join(labels_folder, f"{name}.txt")
+    height, width = shape[:2]
+    columns = {"bbox": [], "confidence": [], "class_name": []}
+    if not os.path.exists(path):
+        return columns
+    with open(path) as file:
+        for line in file:
+            values = line.split()
+            if len(values) < 5:
+                continue
+            class_id, cx, cy, w, h = int(values[0]), *map(float, values[1:5])
+            columns["bbox"].append([(cx - w / 2) * width, (cy - h / 2) * height,
+                                    (cx + w / 2) * width, (cy + h / 2) * height])
+            columns["confidence"].append(1.0)
+            columns["class_name"].append(names[class_id])
+    return columns
+
+
+def detect(model, image, imgsz, tiling, batch_size):
+    """Single pass (tiling=None) or tiled detection with the server's merge logic"""
+    if tiling is None:
+        return result_columns(model(image, imgsz=imgsz, verbose=False)[0]), 1
+
+    tile_size, overlap, max_tiles = tiling
+    height, width = image.shape[:2]
+    grid = tile_grid(height, width, tile_size, overlap, max_tiles)
+    tiles = crop_tiles(image, grid)
+    if len(grid) > 1:
+        grid.append((0, 0, width, height))
+        tiles.append(image)
+
+    tile_columns = []
+    for start in range(0, len(tiles), batch_size):
+        results = model(tiles[start:start + batch_size], imgsz=imgsz, verbose=False)
+        tile_columns.extend(result_columns(result) for result in results)
+    return merge_tiles(tile_columns, grid), len(tiles)
+
+
+def iou_matrix(a, b):
+    a, b = np.asarray(a)[:, None, :], np.asarray(b)[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+
+def matched(truth, predicted, iou_threshold):
+    """Number of ground truth boxes matched by a prediction of the same class (greedy by IoU)"""
+    if not truth["bbox"] or not predicted["bbox"]:
+        return 0
+    ious = iou_matrix(truth["bbox"], predicted["bbox"])
+    same_class = np.asarray(truth["class_name"])[:, None] == np.asarray(predicted["class_name"])[None, :]
+    ious = np.where(same_class, ious, 0)
+
+    count = 0
+    used = set()
+    for row in np.argsort(-ious.max(axis=1)):
+        for column in np.argsort(-ious[row]):
+            if ious[row, column] < iou_threshold:
+                break
+            if column not in used:
+                used.add(column)
+                count += 1
+                break
+    return count
+
+
+def parse_config(spec):
+    """'none' or 'TILE_SIZE:OVERLAP:MAX_TILES'"""
+    if spec == "none":
+        return None
+    tile_size, overlap, max_tiles = spec.split(":")
+    return int(tile_size), float(overlap), int(max_tiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO tiled inference latency / recall benchmark")
+    parser.add_argument("--model", default="yolov8n.pt", help="Path to YOLO weights")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--labels", default=None, help="Folder with YOLO txt labels (same file names)")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="Comma-separated 'none' or TILE:OVERLAP:MAX")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--batch-size", type=int, default=8, help="Tiles per forward pass")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU threshold for a match")
+    parser.add_argument("--repeats", type=int, default=2, help="Timed passes over the images")
+    args = parser.parse_args()
+
+    images = load_images(args.input)
+    if not images:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    model = YOLO(args.model)
+    model(images[0][1], imgsz=args.imgsz, verbose=False)  # warm-up
+
+    if args.labels:
+        references = [load_labels(args.labels, name, image.shape, model.names) for name, image in images]
+        reference_name = "labels"
+    else:
+        dense = (max(args.imgsz // 2, 128), 0.4, 256)
+        references = [detect(model, image, args.imgsz, dense, args.batch_size)[0] for _, image in images]
+        reference_name = f"dense tiling {dense[0]}:{dense[1]}"
+    total_truth = sum(len(reference["bbox"]) for reference in references)
+    print(f"📁 {len(images)} images | {total_truth} reference boxes ({reference_name}) | imgsz={args.imgsz}")
+
+    print(f"\n{'config':>14} | {'tiles/img':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'boxes':>6} | {'recall':>7}")
+    print("-" * 68)
+    for spec in args.configs.split(","):
+        tiling = parse_config(spec)
+        latencies, tile_counts, found, boxes = [], [], 0, 0
+        for repeat in range(args.repeats):
+            for (_, image), reference in zip(images, references):
+                start_time = time.perf_counter()
+                columns, tiles = detect(model, image, args.imgsz, tiling, args.batch_size)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+                if repeat == 0:
+                    tile_counts.append(tiles)
+                    boxes += len(columns["bbox"])
+                    found += matched(reference, columns, args.iou)
+
+        recall = found / total_truth if total_truth else float("nan")
+        print(f"{spec:>14} | {np.mean(tile_counts):>9.1f} | {np.percentile(latencies, 50):>8.1f} | "
+              f"{np.percentile(latencies, 95):>8.1f} | {boxes:>6} | {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Multi-worker FastAPI benchmark
+Starts the model-monitoring API under gunicorn (gunicorn.conf.py) with increasing worker
+counts and measures upload throughput / latency and memory of the whole process tree.
+'shared' loads the model in the gunicorn master (copy-on-write), 'per-worker' lets every
+worker load its own copy. PSS splits shared pages between the processes that map them,
+so it is the memory the workers really cost together.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+MONITORING_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring")
+API_DIR = os.path.join(MONITORING_DIR, "yolo")
+
+# Reuse the load generator from the API tests
+sys.path.insert(0, os.path.join(MONITORING_DIR, "test"))
+from load_test import DEFAULT_INPUT, LoadTest, load_corpus, report
+
+MODES = {"shared": "true", "per-worker": "false"}
+
+
+def process_tree(pid):
+    """pid and all its descendants"""
+    pids = [pid]
+    for child in pids:
+        try:
+            for task in os.listdir(f"/proc/{child}/task"):
+                with open(f"/proc/{child}/task/{task}/children") as file:
+                    pids.extend(int(value) for value in file.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def memory_mb(pids):
+    """Summed Rss, Pss and private memory of the processes (from smaps_rollup)"""
+    totals = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as file:
+                for line in file:
+                    key, _, value = line.partition(":")
+                    if key in totals:
+                        totals[key] += int(value.split()[0])
+        except OSError:
+            continue
+    return {
+        "rss_mb": totals["Rss"] / 1024,
+        "pss_mb": totals["Pss"] / 1024,
+        "private_mb": (totals["Private_Clean"] + totals["Private_Dirty"]) / 1024,
+    }
+
+
+def wait_ready(url, workers, timeout_s):
+    """Until every worker has answered a healthy /health (each one warms up on its own)"""
+    ready = set()
+    session = requests.Session()
+    deadline = time.time() + timeout_s
+    while len(ready) < workers and time.time() < deadline:
+        try:
+            # New connection per probe, so the probes spread over the workers
+            response = session.get(f"{url}/health", timeout=5, headers={"Connection": "close"})
+            if response.status_code == 200:
+                ready.add(response.json()["pid"])
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return len(ready) >= workers
+
+
+def run_config(args, workers, mode):
+    env = {
+        **os.environ,
+        "WORKERS": str(workers),
+        "PORT": str(args.port),
+        "PRELOAD_MODEL": MODES[mode],
+        "MODEL_NAME": args.model_name,
+        "INFERENCE_BACKEND": args.backend,
+        # Repeated corpus images must not be served from the result cache
+        "RESULT_CACHE_ENABLED": "false",
+        "WARMUP_ROUNDS": "1",
+        "OTEL_SDK_DISABLED": "true",
+        "PYTHONPATH": os.path.abspath(MONITORING_DIR),
+    }
+    if args.torch_threads:
+        env["TORCH_THREADS_PER_WORKER"] = str(args.torch_threads)
+
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py"], cwd=API_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    try:
+        if not wait_ready(url, workers, args.ready_timeout):
+            raise RuntimeError(f"{workers} workers ({mode}) not ready after {args.ready_timeout}s")
+        idle = memory_mb(process_tree(server.pid))
+
+        load_args = argparse.Namespace(
+            target="upload", url=url, mode="closed", concurrency=args.concurrency or 2 * workers,
+            duration=args.duration, warmup=args.warmup, interval=args.duration,
+            connections=64, timeout=60.0, accept=None, priority=None,
+        )
+        test = LoadTest(load_args, load_corpus(args.input))
+        asyncio.run(test.run())
+        summary, _ = report(test, load_args)
+        loaded = memory_mb(process_tree(server.pid))
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        "mode": mode,
+        "concurrency": load_args.concurrency,
+        **{key: summary[key] for key in ("throughput_rps", "p50_ms", "p99_ms", "error_rate")},
+        "idle": idle,
+        "loaded": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and memory of the FastAPI API versus gunicorn workers")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--modes", default="shared,per-worker", help=f"Model loading modes: {', '.join(MODES)}")
+    parser.add_argument("--concurrency", type=int, default=0, help="Closed-loop clients (0 = 2 per worker)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Load seconds excluded from the results")
+    parser.add_argument("--torch-threads", type=int, default=0, help="Torch threads per worker (0 = CPUs / workers)")
+    parser.add_argument("--model-name", default="yolo11n", help="MODEL_NAME of the API")
+    parser.add_argument("--backend", default="pytorch", help="INFERENCE_BACKEND of the API")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with benchmark images")
+    parser.add_argument("--port", type=int, default=18000, help="Port of the API under test")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="Seconds to wait for warm workers")
+    parser.add_argument("--output", default=None, help="Optional JSON file with the results")
+    args = parser.parse_args()
+
+    if not load_corpus(args.input):
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    rows = []
+    for mode in args.modes.split(","):
+        for workers in (int(value) for value in args.workers.split(",")):
+            print(f"⏳ {workers} workers, {mode} model...")
+            rows.append(run_config(args, workers, mode))
+
+    print(f"\n{'workers':>7} | {'mode':>10} | {'req/s':>7} | {'p50 ms':>7} | {'p99 ms':>7} | "
+          f"{'errors':>6} | {'RSS MB':>7} | {'PSS MB':>7} | {'private MB':>10}")
+    print("-" * 92)
+    for row in rows:
+        memory = row["loaded"]
+        print(f"{row['workers']:>7} | {row['mode']:>10} | {row['throughput_rps']:>7.1f} | {row['p50_ms'] or 0:>7.1f} | "
+              f"{row['p99_ms'] or 0:>7.1f} | {row['error_rate']:>6.1%} | {memory['rss_mb']:>7.0f} | "
+              f"{memory['pss_mb']:>7.0f} | {memory['private_mb']:>10.0f}")
+    print("\nMemory of master + workers after the load; RSS counts shared pages once per process, PSS splits them")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(rows, file, indent=2)
+        print(f"📄 Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
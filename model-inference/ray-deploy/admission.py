@@ -0,0 +1,326 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from ray.serve import metrics
+
+
+class AdmissionRejectedError(RuntimeError):
+    """Raised when a request is shed instead of queued; carries the HTTP status and Retry-After"""
+
+    def __init__(self, message: str, reason: str, status_code: int, retry_after_s: float):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+    @property
+    def retry_after(self) -> str:
+        """Retry-After header value in whole seconds"""
+        return str(max(1, math.ceil(self.retry_after_s)))
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when the client deadline passes before the work has started"""
+
+
+def parse_deadline(value: Optional[str], default_ms: float = 0) -> Optional[float]:
+    """
+    Client budget in milliseconds (relative, so client clock skew does not matter)
+    -> absolute deadline on the time.time() clock, which other Ray processes can check.
+    Returns None when there is no header and no default.
+    """
+    if value is None:
+        budget_ms = default_ms
+    else:
+        try:
+            budget_ms = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid deadline '{value}', expected milliseconds")
+        if not budget_ms > 0:
+            raise ValueError(f"Invalid deadline '{value}', expected a positive number of milliseconds")
+    if not budget_ms:
+        return None
+    return time.time() + budget_ms / 1000
+
+
+def remaining_s(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until the deadline (None without a deadline)"""
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check_deadline(deadline: Optional[float], stage: str):
+    """Drops work whose result nobody will read anymore"""
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceededError(f"Deadline exceeded before {stage}")
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """'interactive:8,bulk:1' -> {"interactive": 8.0, "bulk": 1.0}; the first class is the latency-sensitive one"""
+    weights = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, weight = item.split(":")
+            weights[name.strip()] = max(float(weight), 1e-3)
+    return weights
+
+
+def parse_api_keys(spec: str) -> Dict[str, str]:
+    """'KEY_A:bulk,KEY_B:interactive' -> {"KEY_A": "bulk", "KEY_B": "interactive"}"""
+    api_keys = {}
+    for item in spec.split(","):
+        if item.strip():
+            key, priority = item.rsplit(":", 1)
+            api_keys[key.strip()] = priority.strip()
+    return api_keys
+
+
+def request_priority(header: Optional[str],
+                     api_key: Optional[str],
+                     api_keys: Dict[str, str],
+                     classes: Dict[str, float],
+                     default: str) -> str:
+    """A class assigned to the API key wins over the priority header, so keys cannot escalate"""
+    if api_key and api_keys.get(api_key) in classes:
+        return api_keys[api_key]
+    if header:
+        if header not in classes:
+            raise ValueError(f"Unknown priority '{header}', expected one of {', '.join(classes)}")
+        return header
+    return default
+
+
+class AdmissionController:
+    """
+    Per-replica admission control and weighted fair queuing in front of the model.
+
+    At most max_in_flight requests are processed and at most max_queue wait for a slot.
+    Every priority class has its own FIFO queue; free slots go to the class with the
+    smallest virtual time (start-time fair queuing), so with weights 8:1 bulk requests
+    get one slot in nine while interactive requests wait, and every slot when idle.
+
+    The first class is latency-sensitive. Requests of the other classes hold at most
+    background_limit slots, chosen so that they add no more than background_delay_ms
+    to its queue wait (each in-flight request is assumed to cost service_ms / max_in_flight,
+    the same model as predicted_wait_ms). A full queue rejects (429), except that a
+    latency-sensitive request preempts the newest background waiter. A request whose
+    predicted wait plus service time exceeds its deadline is rejected right away (503).
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_in_flight: int = 16,
+                 max_queue: int = 32,
+                 weights: Optional[Dict[str, float]] = None,
+                 background_delay_ms: float = 0,
+                 initial_service_ms: float = 100,
+                 smoothing: float = 0.2):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.weights = weights or {"default": 1.0}
+        self.protected = next(iter(self.weights))
+        self.background_delay_ms = background_delay_ms
+        self.service_ms = initial_service_ms
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.class_in_flight = {priority: 0 for priority in self.weights}
+        self._queues = {priority: deque() for priority in self.weights}
+        self._virtual = {priority: 0.0 for priority in self.weights}
+        self._clock = 0.0
+
+        tags = {"ingress": name}
+        self._rejected = metrics.Counter(
+            "admission_rejected_requests",
+            description="Requests shed by admission control (reason: queue_full, preempted, deadline, expired)",
+            tag_keys=("ingress", "priority", "reason"),
+        )
+        self._rejected.set_default_tags(tags)
+        self._queue_time = metrics.Histogram(
+            "admission_queue_ms",
+            description="Time an admitted request waited for a processing slot",
+            boundaries=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000],
+            tag_keys=("ingress", "priority"),
+        )
+        self._queue_time.set_default_tags(tags)
+        self._in_flight = metrics.Gauge(
+            "admission_in_flight",
+            description="Requests holding a processing slot",
+            tag_keys=("ingress", "priority"),
+        )
+        self._in_flight.set_default_tags(tags)
+        self._queued = metrics.Gauge(
+            "admission_queued",
+            description="Requests waiting for a processing slot",
+            tag_keys=("ingress", "priority"),
+        )
+        self._queued.set_default_tags(tags)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def background_in_flight(self) -> int:
+        return self.in_flight - self.class_in_flight[self.protected]
+
+    def background_limit(self) -> int:
+        """Slots background classes may hold together"""
+        if self.background_delay_ms <= 0 or len(self.weights) == 1:
+            return self.max_in_flight
+        slots = int(self.background_delay_ms * self.max_in_flight / max(self.service_ms, 1e-3))
+        return min(max(slots, 1), self.max_in_flight)
+
+    def predicted_wait_ms(self, priority: Optional[str] = None) -> float:
+        """Expected wait of a new request: requests ahead of it by fair share, each needing one slot"""
+        priority = priority or self.protected
+        if self.in_flight < self.max_in_flight and not self.queued:
+            return 0.0
+        own = len(self._queues[priority])
+        weight = self.weights[priority]
+        ahead = own + sum(
+            min(len(queue), (own + 1) * self.weights[other] / weight)
+            for other, queue in self._queues.items() if other != priority
+        )
+        slots = self.max_in_flight if priority == self.protected else self.background_limit()
+        return (ahead + 1) * self.service_ms / slots
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "service_ms": round(self.service_ms, 2),
+            "background_limit": self.background_limit(),
+            "classes": {
+                priority: {
+                    "weight": weight,
+                    "in_flight": self.class_in_flight[priority],
+                    "queued": len(self._queues[priority]),
+                    "predicted_wait_ms": round(self.predicted_wait_ms(priority), 2),
+                }
+                for priority, weight in self.weights.items()
+            },
+        }
+
+    @asynccontextmanager
+    async def admit(self, deadline: Optional[float] = None, priority: Optional[str] = None) -> AsyncIterator[float]:
+        """Holds a processing slot for the block; yields the queue time in ms"""
+        priority = priority or self.protected
+        start_time = time.perf_counter()
+        await self._acquire(priority, deadline)
+        queue_ms = (time.perf_counter() - start_time) * 1000
+        self._queue_time.observe(queue_ms, tags={"priority": priority})
+
+        start_time = time.perf_counter()
+        try:
+            yield queue_ms
+        finally:
+            duration = (time.perf_counter() - start_time) * 1000
+            self.service_ms += self.smoothing * (duration - self.service_ms)
+            self._release(priority)
+
+    def _eligible(self, priority: str) -> bool:
+        return priority == self.protected or self.background_in_flight < self.background_limit()
+
+    async def _acquire(self, priority: str, deadline: Optional[float]):
+        if self.in_flight < self.max_in_flight and not self.queued and self._eligible(priority):
+            self._start(priority)
+            return
+
+        predicted_ms = self.predicted_wait_ms(priority)
+        left = remaining_s(deadline)
+        if left is not None and predicted_ms + self.service_ms > left * 1000:
+            raise self._reject(priority, "deadline", 503, predicted_ms,
+                               f"Predicted wait {predicted_ms:.0f}ms exceeds the request deadline")
+        if self.queued >= self.max_queue and not self._preempt(priority):
+            raise self._reject(priority, "queue_full", 429, predicted_ms,
+                               f"{self.name} queue is full ({self.max_queue} requests waiting)")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter, timeout=None if left is None else max(left, 0))
+        except asyncio.TimeoutError:
+            self._discard(priority, waiter)
+            raise self._reject(priority, "expired", 503, self.predicted_wait_ms(priority),
+                               "Request deadline expired while waiting in the queue")
+        except asyncio.CancelledError:
+            # Client went away: give the slot back if it was already assigned
+            self._discard(priority, waiter)
+            raise
+
+    def _preempt(self, priority: str) -> bool:
+        """Latency-sensitive requests take the queue place of the newest background waiter"""
+        if priority != self.protected:
+            return False
+        for other in reversed(list(self._queues)):
+            queue = self._queues[other]
+            while other != self.protected and queue:
+                waiter = queue.pop()
+                if waiter.done():
+                    continue
+                waiter.set_exception(self._reject(other, "preempted", 503, self.predicted_wait_ms(other),
+                                                  f"Preempted by {priority} traffic"))
+                self._update_gauges()
+                return True
+        return False
+
+    def _discard(self, priority: str, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            self._release(priority)
+            return
+        try:
+            self._queues[priority].remove(waiter)
+        except ValueError:
+            pass
+        self._update_gauges()
+
+    def _start(self, priority: str):
+        self.in_flight += 1
+        self.class_in_flight[priority] += 1
+        # Start-time fair queuing: an idle class restarts at the current virtual time
+        start = max(self._virtual[priority], self._clock)
+        self._clock = start
+        self._virtual[priority] = start + 1 / self.weights[priority]
+        self._update_gauges()
+
+    def _release(self, priority: str):
+        self.in_flight -= 1
+        self.class_in_flight[priority] -= 1
+        self._dispatch()
+        self._update_gauges()
+
+    def _dispatch(self):
+        """Assigns free slots to waiters, class with the smallest virtual time first"""
+        while self.in_flight < self.max_in_flight:
+            candidates = [
+                priority for priority, queue in self._queues.items()
+                if queue and self._eligible(priority)
+            ]
+            if not candidates:
+                return
+            priority = min(candidates, key=lambda name: max(self._virtual[name], self._clock))
+            waiter = self._queues[priority].popleft()
+            if waiter.done():
+                continue
+            self._start(priority)
+            waiter.set_result(None)
+
+    def _reject(self, priority: str, reason: str, status_code: int,
+                retry_after_ms: float, message: str) -> AdmissionRejectedError:
+        self._rejected.inc(tags={"priority": priority, "reason": reason})
+        return AdmissionRejectedError(message, reason, status_code, retry_after_ms / 1000)
+
+    def _update_gauges(self):
+        for priority, queue in self._queues.items():
+            tags = {"priority": priority}
+            self._in_flight.set(self.class_in_flight[priority], tags=tags)
+            self._queued.set(len(queue), tags=tags)
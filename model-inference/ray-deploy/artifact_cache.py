@@ -0,0 +1,163 @@
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Optional, Tuple
+
+COMPLETE_MARKER = ".complete"
+EXPORTED_MODEL_SUFFIXES = ("_openvino_model", ".onnx", ".torchscript")
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _find_model_file(path: str) -> str:
+    """Finds .pt weights or a pre-exported model (e.g. INT8 OpenVINO) in the artifact"""
+    files = os.listdir(path)
+    for file in files:
+        if file.endswith('.pt'):
+            return os.path.join(path, file)
+    for file in files:
+        if file.endswith(EXPORTED_MODEL_SUFFIXES):
+            return os.path.join(path, file)
+    raise FileNotFoundError("No .pt or exported model file found in the downloaded artifact")
+
+
+class ArtifactCache:
+    """
+    On-node cache of W&B model artifacts keyed by artifact digest.
+    Replicas on the same node share one copy; entries are populated atomically
+    (download to a temp dir + rename) and evicted by last use above max_bytes.
+    Entries used within grace_s are never evicted: another replica may be loading them.
+    """
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_bytes: int = 2 * 1024 ** 3,
+                 offline: bool = False,
+                 grace_s: float = 600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.grace_s = grace_s
+        # Resolve/download timings of the last get(), also when it failed
+        self.last_timings = {"resolve": 0.0, "download": 0.0}
+        self.index_dir = os.path.join(cache_dir, "index")
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _entry_dir(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    def _index_file(self, artifact_name: str) -> str:
+        return os.path.join(self.index_dir, re.sub(r"[^A-Za-z0-9._-]", "_", artifact_name))
+
+    def _is_complete(self, digest: str) -> bool:
+        return os.path.exists(os.path.join(self._entry_dir(digest), COMPLETE_MARKER))
+
+    def resolve(self, artifact_name: str):
+        """Resolves artifact name/alias to its digest through W&B API (no run is created)"""
+        if not os.getenv("WANDB_API_KEY"):
+            raise ValueError("WANDB_API_KEY not found in environment variables")
+
+        import wandb
+
+        artifact = wandb.Api().artifact(artifact_name, type='model')
+        # Remember the digest so the artifact can be loaded offline later
+        with open(self._index_file(artifact_name), "w") as file:
+            file.write(artifact.digest)
+        return artifact.digest, artifact
+
+    def pinned_digest(self, artifact_name: str) -> str:
+        """Digest of the last resolved version of artifact (for offline mode)"""
+        index_file = self._index_file(artifact_name)
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(f"No cached digest for {artifact_name}, set MODEL_ARTIFACT_DIGEST")
+        with open(index_file) as file:
+            return file.read().strip()
+
+    def _populate(self, digest: str, artifact):
+        """Downloads artifact into a temp dir and atomically moves it into the cache"""
+        tmp_dir = os.path.join(self.cache_dir, f".tmp-{digest}-{uuid.uuid4().hex[:8]}")
+        try:
+            artifact.download(root=tmp_dir)
+            open(os.path.join(tmp_dir, COMPLETE_MARKER), "w").close()
+            os.rename(tmp_dir, self._entry_dir(digest))
+        except OSError:
+            # Another replica on this node populated the entry first
+            if not self._is_complete(digest):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self, keep_digest: str):
+        """Removes least recently used entries until cache fits into max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name in ("index", keep_digest) or name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+
+        total = sum(size for _, size, _ in entries) + _dir_size(self._entry_dir(keep_digest))
+        in_use_after = time.time() - self.grace_s
+        for used_at, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if used_at >= in_use_after:
+                # Used recently (possibly being loaded right now); the cache stays over budget for now
+                continue
+            print(f"🧹 Evicting cached artifact: {os.path.basename(path)}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def get(self, artifact_name: str, digest: Optional[str] = None) -> Tuple[str, dict]:
+        """
+        Returns path to the cached .pt file and resolve/download timings in ms.
+        In offline mode the pinned digest (argument or index) is loaded without W&B access.
+        """
+        timings = {"resolve": 0.0, "download": 0.0}
+        try:
+            return self._get(artifact_name, digest, timings)
+        finally:
+            self.last_timings = timings
+
+    def _get(self, artifact_name: str, digest: Optional[str], timings: dict) -> Tuple[str, dict]:
+        artifact = None
+        start_time = time.perf_counter()
+        try:
+            if digest is None:
+                if self.offline:
+                    digest = self.pinned_digest(artifact_name)
+                else:
+                    digest, artifact = self.resolve(artifact_name)
+            elif not self.offline and not self._is_complete(digest):
+                resolved_digest, artifact = self.resolve(artifact_name)
+                if resolved_digest != digest:
+                    raise ValueError(f"{artifact_name} resolves to {resolved_digest}, expected pinned {digest}")
+        finally:
+            timings["resolve"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+        if self._is_complete(digest):
+            # Mark as in use before loading, so other replicas do not evict it meanwhile
+            os.utime(self._entry_dir(digest))
+        else:
+            if self.offline or artifact is None:
+                raise FileNotFoundError(f"Artifact {digest} is not in the local cache")
+
+            print(f"📥 Downloading model artifact: {artifact_name} ({digest})")
+            start_time = time.perf_counter()
+            try:
+                self._populate(digest, artifact)
+            finally:
+                timings["download"] = round((time.perf_counter() - start_time) * 1000, 2)
+            self._evict(keep_digest=digest)
+            return _find_model_file(self._entry_dir(digest)), timings
+
+        print(f"📦 Using cached model artifact: {artifact_name} ({digest})")
+        return _find_model_file(self._entry_dir(digest)), timings
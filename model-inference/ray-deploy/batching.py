@@ -0,0 +1,71 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+import requests
+
+# Padding color used by ultralytics for letterboxing
+LETTERBOX_COLOR = (114, 114, 114)
+
+
+def load_image(image_url: str, timeout: float = 30.0) -> np.ndarray:
+    """Download image from URL and decode it to a BGR numpy array"""
+    response = requests.get(image_url, timeout=timeout)
+    response.raise_for_status()
+
+    image_array = np.frombuffer(response.content, dtype=np.uint8)
+    image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Failed to decode image from URL: {image_url}")
+    return image
+
+
+def letterbox(image: np.ndarray, imgsz: int = 640) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize image keeping aspect ratio and pad it to a square imgsz x imgsz frame.
+    Returns padded image, scale ratio and (pad_x, pad_y) offsets.
+    """
+    height, width = image.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (imgsz - new_width) / 2, (imgsz - new_height) / 2
+
+    if (width, height) != (new_width, new_height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+
+    return padded, ratio, (left, top)
+
+
+def build_batch(images: List[np.ndarray], imgsz: int = 640) -> Tuple[List[np.ndarray], List[dict]]:
+    """
+    Letterbox mixed-size images to one shape so they run as a single tensor batch.
+    Returns letterboxed frames and per-image metadata needed to map boxes back.
+    """
+    frames = []
+    metas = []
+    for image in images:
+        frame, ratio, pad = letterbox(image, imgsz)
+        frames.append(frame)
+        metas.append({"ratio": ratio, "pad": pad, "shape": image.shape[:2]})
+    return frames, metas
+
+
+def scale_boxes(boxes: np.ndarray, meta: dict) -> np.ndarray:
+    """Map xyxy boxes from letterboxed coordinates back to the original image"""
+    if len(boxes) == 0:
+        return boxes
+
+    pad_x, pad_y = meta["pad"]
+    height, width = meta["shape"]
+
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / meta["ratio"]
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / meta["ratio"]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes
@@ -0,0 +1,141 @@
+import math
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Padding value used by ultralytics for letterboxing
+LETTERBOX_VALUE = 114
+SCALE = np.float32(1 / 255.0)
+
+
+def batch_bucket(size: int) -> int:
+    """Batch sizes round up to powers of two, so a few tensor shapes cover every batch"""
+    return 1 << (max(size, 1) - 1).bit_length()
+
+
+class BufferPool:
+    """
+    Reusable numpy buffers keyed by (shape, dtype).
+    A buffer is handed out to one user at a time; at most max_idle buffers per key are kept.
+    """
+
+    def __init__(self, max_idle: int = 4):
+        self.max_idle = max_idle
+        self.allocations = 0
+        self.reuses = 0
+        self._free = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            if self._free[key]:
+                self.reuses += 1
+                return self._free[key].pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer: np.ndarray):
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            if len(self._free[key]) < self.max_idle:
+                self._free[key].append(buffer)
+
+    @contextmanager
+    def borrow(self, shape: Tuple[int, ...], dtype=np.uint8) -> Iterator[np.ndarray]:
+        buffer = self.acquire(shape, dtype)
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = [buffer for buffers in self._free.values() for buffer in buffers]
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "idle_buffers": len(idle),
+                "idle_bytes": sum(buffer.nbytes for buffer in idle),
+            }
+
+
+def letterbox_into(image: np.ndarray, canvas: np.ndarray) -> dict:
+    """
+    Same geometry as batching.letterbox, but resizes straight into a preallocated
+    canvas and only paints the padding. Returns the metadata for scale_boxes.
+    """
+    canvas_height, canvas_width = canvas.shape[:2]
+    height, width = image.shape[:2]
+    ratio = min(canvas_height / height, canvas_width / width)
+
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    top = int(round((canvas_height - new_height) / 2 - 0.1))
+    left = int(round((canvas_width - new_width) / 2 - 0.1))
+    bottom, right = top + new_height, left + new_width
+
+    canvas[:top] = LETTERBOX_VALUE
+    canvas[bottom:] = LETTERBOX_VALUE
+    canvas[top:bottom, :left] = LETTERBOX_VALUE
+    canvas[top:bottom, right:] = LETTERBOX_VALUE
+
+    region = canvas[top:bottom, left:right]
+    if (width, height) == (new_width, new_height):
+        region[...] = image
+    else:
+        resized = cv2.resize(image, (new_width, new_height), dst=region, interpolation=cv2.INTER_LINEAR)
+        # OpenCV may allocate a new array instead of writing into the view
+        if not np.shares_memory(resized, canvas):
+            region[...] = resized
+
+    return {"ratio": ratio, "pad": (left, top), "shape": (height, width)}
+
+
+def normalize_into(canvas: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """BGR HWC uint8 -> RGB CHW float32 in [0, 1], written into out without temporaries"""
+    np.multiply(canvas.transpose(2, 0, 1)[::-1], SCALE, out=out, casting="unsafe")
+    return out
+
+
+class PooledPreprocessor:
+    """
+    Letterbox + normalize a batch into pooled buffers: a uint8 canvas and a BCHW float32
+    tensor per (batch-size bucket, canvas shape), reused across requests.
+    With rect=True the canvas is the smallest stride-aligned rectangle that fits the batch
+    (ultralytics 'auto' letterbox); otherwise it is always imgsz x imgsz.
+    """
+
+    def __init__(self, imgsz: int = 640, pool: Optional[BufferPool] = None, rect: bool = False, stride: int = 32):
+        self.imgsz = imgsz
+        self.pool = pool or BufferPool()
+        self.rect = rect
+        self.stride = stride
+
+    def canvas_shape(self, images: List[np.ndarray]) -> Tuple[int, int]:
+        if not self.rect:
+            return self.imgsz, self.imgsz
+
+        canvas_height = canvas_width = self.stride
+        for image in images:
+            height, width = image.shape[:2]
+            ratio = self.imgsz / max(height, width)
+            canvas_height = max(canvas_height, math.ceil(round(height * ratio) / self.stride) * self.stride)
+            canvas_width = max(canvas_width, math.ceil(round(width * ratio) / self.stride) * self.stride)
+        return min(canvas_height, self.imgsz), min(canvas_width, self.imgsz)
+
+    @contextmanager
+    def batch(self, images: List[np.ndarray]) -> Iterator[Tuple[np.ndarray, List[dict]]]:
+        """Yields (tensor of len(images), metas); the tensor is only valid inside the block"""
+        bucket = batch_bucket(len(images))
+        height, width = self.canvas_shape(images)
+        with self.pool.borrow((bucket, 3, height, width), np.float32) as tensor, \
+                self.pool.borrow((height, width, 3), np.uint8) as canvas:
+            metas = []
+            for index, image in enumerate(images):
+                metas.append(letterbox_into(image, canvas))
+                normalize_into(canvas, tensor[index])
+            yield tensor[:len(images)], metas
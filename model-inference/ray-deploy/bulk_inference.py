@@ -0,0 +1,280 @@
+"""
+Offline bulk inference with Ray Data.
+read (image folders / object stores / manifests) -> decode + letterbox (parallel tasks)
+-> batched forward pass + NMS (autoscaling actor pool, one model per actor)
+-> optional annotated images (parallel tasks) -> Parquet or JSONL.
+
+Locally `ray.init()` starts a single-machine cluster; submitted as a Ray job it attaches to
+the KubeRay cluster and the stages are spread over its workers.
+"""
+
+import argparse
+import os
+import time
+import zlib
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+import pyarrow as pa
+import pyarrow.fs as pafs
+import ray
+import requests
+import torch
+
+from artifact_cache import ArtifactCache
+from backends import load_model
+from buffer_pool import LETTERBOX_VALUE, BufferPool, letterbox_into, normalize_into
+from postprocess import result_columns
+
+IMAGE_EXTENSIONS = ["jpg", "jpeg", "png", "bmp", "webp", "tif", "tiff"]
+
+# Same model source as the Ray Serve deployment
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/tmp/ray/model-cache")
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "false").lower() == "true"
+MODEL_ARTIFACT_DIGEST = os.getenv("MODEL_ARTIFACT_DIGEST") or None
+EXPORT_CACHE_DIR = os.path.join(MODEL_CACHE_DIR, "exports")
+
+# Detections schema, explicit so batches without any box write the same Parquet types
+SCHEMA = pa.schema([
+    ("path", pa.string()),
+    ("height", pa.int32()),
+    ("width", pa.int32()),
+    ("objects_detected", pa.int32()),
+    ("bbox", pa.list_(pa.list_(pa.float32()))),
+    ("confidence", pa.list_(pa.float32())),
+    ("class_name", pa.list_(pa.string())),
+    ("model", pa.string()),
+    ("inference_ms", pa.float32()),
+    ("error", pa.string()),
+])
+
+# Annotation colors (BGR), one per class id modulo the list
+COLORS = [(0, 255, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
+
+
+def filesystem(uri: str):
+    """pyarrow filesystem and path for local paths and object store URIs (s3://, gs://)"""
+    if "://" not in uri:
+        uri = os.path.abspath(uri)
+    return pafs.FileSystem.from_uri(uri)
+
+
+def read_manifest(manifest: str) -> "ray.data.Dataset":
+    """
+    Image list: .txt (one path or URL per line), .csv or .jsonl with a 'path' or 'url' column.
+    Returns a dataset with a 'path' column.
+    """
+    if manifest.endswith(".csv"):
+        ds = ray.data.read_csv(manifest)
+    elif manifest.endswith((".jsonl", ".json")):
+        ds = ray.data.read_json(manifest)
+    else:
+        return ray.data.read_text(manifest).filter(lambda row: row["text"].strip()).rename_columns({"text": "path"})
+
+    if "path" not in ds.columns():
+        ds = ds.rename_columns({"url": "path"})
+    return ds.select_columns(["path"])
+
+
+def load_bytes(batch: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Reads the manifest entries: HTTP(S) URLs through a keep-alive session, anything else through pyarrow"""
+    session = requests.Session()
+    contents = []
+    paths = [str(path).strip() for path in batch["path"]]
+    for path in paths:
+        try:
+            if path.startswith(("http://", "https://")):
+                response = session.get(path, timeout=30)
+                response.raise_for_status()
+                contents.append(response.content)
+            else:
+                fs, fs_path = filesystem(path)
+                with fs.open_input_file(fs_path) as file:
+                    contents.append(file.read())
+        except Exception as e:
+            print(f"❌ Failed to read {path}: {e}")
+            contents.append(b"")
+    return {"path": paths, "bytes": contents}
+
+
+def decode_batch(batch: Dict[str, np.ndarray], imgsz: int = 640, keep_bytes: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Decodes and letterboxes to imgsz x imgsz, so the model actors receive fixed-size uint8
+    frames (smaller than decoded originals) plus the metadata to map boxes back.
+    Images that cannot be decoded keep an empty frame and an 'error'.
+    """
+    count = len(batch["path"])
+    frames = np.full((count, imgsz, imgsz, 3), LETTERBOX_VALUE, dtype=np.uint8)
+    ratio = np.ones(count, dtype=np.float32)
+    pad = np.zeros((count, 2), dtype=np.float32)
+    shape = np.zeros((count, 2), dtype=np.int32)
+    errors = []
+    for index, contents in enumerate(batch["bytes"]):
+        image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR) if len(contents) else None
+        if image is None:
+            errors.append("Invalid image format" if len(contents) else "Failed to read image")
+            continue
+        meta = letterbox_into(image, frames[index])
+        ratio[index], pad[index], shape[index] = meta["ratio"], meta["pad"], meta["shape"]
+        errors.append("")
+
+    decoded = {"path": batch["path"], "frame": frames, "ratio": ratio, "pad": pad, "shape": shape, "error": np.array(errors)}
+    if keep_bytes:
+        decoded["bytes"] = batch["bytes"]
+    return decoded
+
+
+class Detector:
+    """Actor of the pool: loads the model once and runs one forward pass per batch"""
+
+    def __init__(self, weights: Optional[str], backend: str, imgsz: int, threads: int):
+        torch.set_num_threads(max(1, threads))
+        self.imgsz = imgsz
+        self.pool = BufferPool()
+        if weights is None:
+            # W&B registry artifact through the on-node cache, like the Serve replicas
+            artifact_name = os.getenv("WANDB_MODEL_ARTIFACT", "maslov-mykhailo-set-university-org/wandb-registry-model/TestCollection:v1")
+            cache = ArtifactCache(MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES, offline=MODEL_OFFLINE)
+            try:
+                weights, _ = cache.get(artifact_name, digest=MODEL_ARTIFACT_DIGEST)
+            except Exception as e:
+                print(f"❌ Failed to load model artifact: {e}")
+                print("🔄 Switching to fallback model yolov8n.pt...")
+                weights = "yolov8n.pt"
+        self.model = load_model(weights, backend, imgsz, EXPORT_CACHE_DIR)
+        self.model_name = os.path.basename(str(weights))
+
+    def __call__(self, batch: Dict[str, np.ndarray]) -> pa.Table:
+        count = len(batch["path"])
+        valid = [index for index in range(count) if not batch["error"][index]]
+        columns = [None] * count
+        start_time = time.perf_counter()
+        if valid:
+            with self.pool.borrow((len(valid), 3, self.imgsz, self.imgsz), np.float32) as tensor:
+                for row, index in enumerate(valid):
+                    normalize_into(batch["frame"][index], tensor[row])
+                results = self.model(torch.from_numpy(tensor), verbose=False)
+                for index, result in zip(valid, results):
+                    meta = {"ratio": float(batch["ratio"][index]), "pad": tuple(batch["pad"][index]), "shape": tuple(batch["shape"][index])}
+                    columns[index] = result_columns(result, meta)
+        # Amortized over the batch, so it is comparable to the per-request latency of the API
+        inference_ms = (time.perf_counter() - start_time) * 1000 / max(len(valid), 1)
+
+        empty = {"bbox": [], "confidence": [], "class_name": []}
+        table = {
+            "path": [str(path) for path in batch["path"]],
+            "height": [int(height) for height, _ in batch["shape"]],
+            "width": [int(width) for _, width in batch["shape"]],
+            "objects_detected": [len((column or empty)["bbox"]) for column in columns],
+            "bbox": [(column or empty)["bbox"] for column in columns],
+            "confidence": [(column or empty)["confidence"] for column in columns],
+            "class_name": [(column or empty)["class_name"] for column in columns],
+            "model": [self.model_name] * count,
+            "inference_ms": [round(inference_ms, 2)] * count,
+            "error": [str(error) or None for error in batch["error"]],
+        }
+        schema = SCHEMA
+        if "bytes" in batch:
+            table["bytes"] = list(batch["bytes"])
+            schema = schema.append(pa.field("bytes", pa.binary()))
+        return pa.Table.from_pydict(table, schema=schema)
+
+
+def annotate_batch(batch: pa.Table, annotate_dir: str) -> pa.Table:
+    """Draws the boxes on the original images and writes them as JPEG to annotate_dir"""
+    fs, root = filesystem(annotate_dir)
+    fs.create_dir(root, recursive=True)
+    rows = batch.to_pylist()
+    for row in rows:
+        image = cv2.imdecode(np.frombuffer(row["bytes"], np.uint8), cv2.IMREAD_COLOR) if row["bytes"] else None
+        if image is None:
+            continue
+        for bbox, confidence, class_name in zip(row["bbox"], row["confidence"], row["class_name"]):
+            x1, y1, x2, y2 = (int(value) for value in bbox)
+            color = COLORS[zlib.crc32(class_name.encode()) % len(COLORS)]
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(image, f"{class_name} {confidence:.2f}", (x1, max(y1 - 5, 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        ok, encoded = cv2.imencode(".jpg", image)
+        if ok:
+            # Flattened source path keeps names unique across folders
+            name = row["path"].split("://")[-1].strip("/").replace("/", "__")
+            with fs.open_output_stream(f"{root}/{os.path.splitext(name)[0]}.jpg") as file:
+                file.write(encoded.tobytes())
+    return batch.drop_columns(["bytes"])
+
+
+def build_dataset(args) -> "ray.data.Dataset":
+    """Read -> decode -> detect (-> annotate) plan; nothing runs until the dataset is written"""
+    annotate = args.annotate_dir is not None
+    if args.manifest:
+        ds = read_manifest(args.manifest).map_batches(load_bytes, batch_size=args.decode_batch_size)
+    else:
+        ds = ray.data.read_binary_files(args.input, include_paths=True, file_extensions=IMAGE_EXTENSIONS)
+
+    ds = ds.map_batches(
+        decode_batch,
+        fn_kwargs={"imgsz": args.imgsz, "keep_bytes": annotate},
+        batch_size=args.decode_batch_size,
+        num_cpus=args.decode_cpus,
+    )
+    ds = ds.map_batches(
+        Detector,
+        fn_constructor_kwargs={
+            "weights": args.model,
+            "backend": args.backend,
+            "imgsz": args.imgsz,
+            "threads": int(args.actor_cpus),
+        },
+        batch_size=args.batch_size,
+        num_cpus=args.actor_cpus,
+        # Autoscaling actor pool: grows to max_actors while decoded batches are waiting
+        concurrency=(args.min_actors, args.max_actors),
+    )
+    if annotate:
+        ds = ds.map_batches(annotate_batch, fn_kwargs={"annotate_dir": args.annotate_dir}, batch_format="pyarrow")
+    return ds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline YOLO bulk inference with Ray Data")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", nargs="+", help="Image folders, files or object store URIs (s3://bucket/prefix)")
+    source.add_argument("--manifest", help="List of image paths / URLs (.txt, .csv or .jsonl with 'path' or 'url')")
+    parser.add_argument("--output", required=True, help="Output folder or object store URI")
+    parser.add_argument("--format", choices=["parquet", "jsonl"], default="parquet", help="Detections output format")
+    parser.add_argument("--annotate-dir", default=None, help="Also write images with drawn boxes here")
+    parser.add_argument("--model", default=None, help="Weights file (default: WANDB_MODEL_ARTIFACT via the model cache)")
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "pytorch"), help="Inference backend")
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("INFERENCE_IMGSZ", "640")), help="Inference size")
+    parser.add_argument("--batch-size", type=int, default=16, help="Images per forward pass")
+    parser.add_argument("--decode-batch-size", type=int, default=32, help="Images per decode task")
+    parser.add_argument("--decode-cpus", type=float, default=1, help="CPUs per decode task")
+    parser.add_argument("--actor-cpus", type=float, default=2, help="CPUs (and torch threads) per model actor")
+    parser.add_argument("--min-actors", type=int, default=1, help="Minimum model actors")
+    parser.add_argument("--max-actors", type=int, default=4, help="Maximum model actors")
+    args = parser.parse_args()
+
+    # Starts a local cluster, or attaches to the cluster when submitted as a Ray job (RAY_ADDRESS)
+    ray.init()
+    print(f"🚀 Bulk inference on {int(ray.cluster_resources().get('CPU', 0))} CPUs "
+          f"({args.min_actors}-{args.max_actors} model actors x {args.actor_cpus} CPUs)")
+
+    start_time = time.perf_counter()
+    ds = build_dataset(args)
+    if args.format == "parquet":
+        ds.write_parquet(args.output)
+    else:
+        ds.write_json(args.output)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"✅ Detections written to {args.output} ({args.format}) in {elapsed:.1f}s")
+    if args.annotate_dir:
+        print(f"🖼️  Annotated images: {args.annotate_dir}")
+    print(ds.stats())
+
+
+if __name__ == "__main__":
+    main()
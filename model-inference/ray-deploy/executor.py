@@ -0,0 +1,95 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from ray.serve import metrics
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """Raised when the executor queue is full"""
+
+
+class BoundedExecutor:
+    """
+    Size-limited thread pool for blocking work (decoding, inference, post-processing).
+    Keeps the replica event loop free and rejects work once the queue is full.
+    """
+
+    def __init__(self, name: str, max_workers: int = 1, max_queue_size: int = 16):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0
+
+        tags = {"pool": name}
+        self._queue_depth = metrics.Gauge(
+            "executor_queue_depth",
+            description="Number of tasks waiting for a free worker",
+            tag_keys=("pool",),
+        )
+        self._queue_depth.set_default_tags(tags)
+        self._running = metrics.Gauge(
+            "executor_running_tasks",
+            description="Number of tasks currently running in the pool",
+            tag_keys=("pool",),
+        )
+        self._running.set_default_tags(tags)
+        self._queue_wait = metrics.Histogram(
+            "executor_queue_wait_ms",
+            description="Time a task waited in the queue before running",
+            boundaries=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+            tag_keys=("pool",),
+        )
+        self._queue_wait.set_default_tags(tags)
+        self._rejected = metrics.Counter(
+            "executor_rejected_tasks",
+            description="Number of tasks rejected because the queue was full",
+            tag_keys=("pool",),
+        )
+        self._rejected.set_default_tags(tags)
+
+    @property
+    def running(self) -> int:
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queued(self) -> int:
+        return max(self._pending - self.max_workers, 0)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+        }
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run blocking function in the pool and await its result"""
+        if self._pending >= self.max_workers + self.max_queue_size:
+            self._rejected.inc()
+            raise ExecutorOverloadedError(f"{self.name} executor queue is full ({self.max_queue_size})")
+
+        submitted_at = time.perf_counter()
+
+        def timed_call():
+            self._queue_wait.observe((time.perf_counter() - submitted_at) * 1000)
+            return fn(*args)
+
+        self._pending += 1
+        self._update_gauges()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, timed_call)
+        finally:
+            self._pending -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        self._queue_depth.set(self.queued)
+        self._running.set(self.running)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
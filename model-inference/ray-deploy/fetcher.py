@@ -0,0 +1,107 @@
+import time
+from typing import Optional, Tuple
+
+import aiohttp
+import cv2
+import numpy as np
+
+from executor import BoundedExecutor
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when the remote image exceeds the configured size limit"""
+
+
+class ImageDecodeError(ValueError):
+    """Raised when downloaded bytes are not a valid image"""
+
+
+def decode_image(buffer: np.ndarray) -> np.ndarray:
+    """Decode encoded image bytes to a BGR numpy array"""
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ImageDecodeError("Invalid image format")
+    return image
+
+
+class ImageFetcher:
+    """
+    Async image fetcher with a keep-alive connection pool.
+    Streams the response body straight into a numpy buffer and decodes it in worker threads.
+    """
+
+    def __init__(self,
+                 max_bytes: int = 20 * 1024 * 1024,
+                 timeout_s: float = 10.0,
+                 connect_timeout_s: float = 3.0,
+                 pool_size: int = 64,
+                 decode_workers: int = 4,
+                 decode_max_queue: int = 64,
+                 chunk_size: int = 64 * 1024):
+        self.max_bytes = max_bytes
+        self.timeout_s = timeout_s
+        self.connect_timeout_s = connect_timeout_s
+        self.pool_size = pool_size
+        self.chunk_size = chunk_size
+        self.decode_executor = BoundedExecutor("fetch_decode", decode_workers, decode_max_queue)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Session is created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=30,
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(total=self.timeout_s, sock_connect=self.connect_timeout_s)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def download(self, image_url: str) -> np.ndarray:
+        """Stream image bytes into a numpy buffer, enforcing the size limit"""
+        session = self._get_session()
+        async with session.get(image_url) as response:
+            response.raise_for_status()
+
+            content_length = response.content_length
+            if content_length is not None and content_length > self.max_bytes:
+                raise ImageTooLargeError(f"Image is {content_length} bytes, limit is {self.max_bytes}")
+
+            buffer = np.empty(content_length or self.chunk_size * 4, dtype=np.uint8)
+            size = 0
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                end = size + len(chunk)
+                if end > self.max_bytes:
+                    raise ImageTooLargeError(f"Image exceeds {self.max_bytes} bytes limit")
+                if end > len(buffer):
+                    grown = np.empty(min(max(len(buffer) * 2, end), self.max_bytes), dtype=np.uint8)
+                    grown[:size] = buffer[:size]
+                    buffer = grown
+                buffer[size:end] = np.frombuffer(chunk, dtype=np.uint8)
+                size = end
+
+        return buffer[:size]
+
+    async def decode(self, buffer: np.ndarray) -> np.ndarray:
+        """Decode downloaded bytes in a worker thread"""
+        return await self.decode_executor.run(decode_image, buffer)
+
+    async def fetch(self, image_url: str) -> Tuple[np.ndarray, dict]:
+        """Download and decode image, returning it with fetch/decode timings in ms"""
+        start_time = time.perf_counter()
+        buffer = await self.download(image_url)
+        fetched_at = time.perf_counter()
+        image = await self.decode(buffer)
+        decoded_at = time.perf_counter()
+
+        timings = {
+            "fetch": round((fetched_at - start_time) * 1000, 2),
+            "decode": round((decoded_at - fetched_at) * 1000, 2),
+        }
+        return image, timings
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self.decode_executor.shutdown()
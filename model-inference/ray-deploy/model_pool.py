@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+
+class ModelNotFoundError(LookupError):
+    """Raised when a requested model version cannot be resolved or loaded"""
+
+
+def path_size(path: str) -> int:
+    """Size of a model file or exported model directory in bytes"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class MultiplexedModel:
+    """
+    Model of one multiplexed model id.
+    serve.multiplexed keeps these objects in its per-replica LRU (bounded by count) and
+    routes requests to replicas that hold them. ModelMemoryBudget may drop the weights
+    earlier; they are reloaded on the next request for this id.
+    """
+
+    def __init__(self,
+                 model_id: str,
+                 loader: Callable[[str], Tuple[Any, int]],
+                 budget: "ModelMemoryBudget"):
+        self.model_id = model_id
+        self.model = None
+        self.size_bytes = 0
+        self._loader = loader
+        self._budget = budget
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """Loads the weights in a thread (serve.multiplexed miss); load errors reach get_model, so the id is not cached"""
+        async with self._lock:
+            if self.model is None:
+                await self._load()
+
+    async def acquire(self) -> Any:
+        """Returns the model for one request: marks it most recently used, or reloads it if the budget dropped it"""
+        async with self._lock:
+            if self.model is None:
+                await self._load()
+            else:
+                self._budget.touch(self)
+            return self.model
+
+    async def _load(self):
+        self.model, self.size_bytes = await asyncio.to_thread(self._loader, self.model_id)
+        self._budget.admit(self)
+
+    def unload(self):
+        self.model = None
+
+    def __del__(self):
+        # Called by serve.multiplexed on LRU eviction and again on garbage collection
+        self._budget.release(self, reason="count")
+
+
+class ModelMemoryBudget:
+    """Per-replica LRU of loaded multiplexed models bounded by their estimated memory"""
+
+    def __init__(self, max_bytes: int, on_evict: Optional[Callable[[str, str], None]] = None):
+        self.max_bytes = max_bytes
+        self._on_evict = on_evict
+        self._resident: "OrderedDict[str, MultiplexedModel]" = OrderedDict()
+        # Reentrant: garbage collection may run MultiplexedModel.__del__ while the lock is held
+        self._lock = threading.RLock()
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._resident.values())
+
+    def admit(self, entry: MultiplexedModel):
+        """Registers a freshly loaded model and evicts least recently used ones over the budget"""
+        evicted = []
+        with self._lock:
+            self._resident[entry.model_id] = entry
+            self._resident.move_to_end(entry.model_id)
+            # The newest model always stays, even if it alone exceeds the budget
+            while self.used_bytes > self.max_bytes and len(self._resident) > 1:
+                _, victim = self._resident.popitem(last=False)
+                victim.unload()
+                evicted.append(victim.model_id)
+
+        for model_id in evicted:
+            self._notify(model_id, "memory")
+
+    def touch(self, entry: MultiplexedModel):
+        with self._lock:
+            if self._resident.get(entry.model_id) is entry:
+                self._resident.move_to_end(entry.model_id)
+
+    def release(self, entry: MultiplexedModel, reason: str):
+        with self._lock:
+            if self._resident.get(entry.model_id) is not entry:
+                return
+            del self._resident[entry.model_id]
+            entry.unload()
+        self._notify(entry.model_id, reason)
+
+    def _notify(self, model_id: str, reason: str):
+        if self._on_evict is not None:
+            self._on_evict(model_id, reason)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": list(self._resident),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,109 +1,741 @@
-from fastapi.responses import JSONResponse
-from fastapi import FastAPI
-from ultralytics import YOLO
+from fastapi.responses import JSONResponse, Response
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from typing import Dict, List, Optional, Union
+import aiohttp
+import asyncio
 import os
-import wandb
+import re
+import time
+import numpy as np
+import ray
+import torch
 
 from ray import serve
+from ray.serve import metrics
 from ray.serve.handle import DeploymentHandle
 
+from admission import AdmissionController, AdmissionRejectedError, DeadlineExceededError, check_deadline, parse_deadline, remaining_s
+from admission import parse_api_keys, parse_weights, request_priority
+from batching import build_batch, load_image
+from artifact_cache import ArtifactCache
+from backends import load_model
+from buffer_pool import BufferPool, PooledPreprocessor
+from executor import BoundedExecutor, ExecutorOverloadedError
+from fetcher import ImageDecodeError, ImageFetcher, ImageTooLargeError
+from model_pool import ModelMemoryBudget, ModelNotFoundError, MultiplexedModel, path_size
+from postprocess import model_stages, result_columns
+from resolution import ResolutionPolicy, combine_bounds, parse_client_bounds, parse_resolutions
+from responses import encode, negotiate_format, server_timing, upload_response, url_response
+from result_cache import cache_key, get_cache_actor
+from thread_topology import apply_thread_topology
+from tiling import crop_tiles, merge_tiles, tile_grid
+from uploads import read_upload
+from warmup import ReadinessState, parse_shapes, parse_sizes, synthetic_images, warm_up
+
 app = FastAPI()
 
+# Dynamic batching configuration (can be changed at runtime through user_config)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_WAIT_TIMEOUT_S = float(os.getenv("BATCH_WAIT_TIMEOUT_S", "0.05"))
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", "640"))
+
+# Executor limits: blocking work runs in bounded pools off the replica event loop
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "4"))
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", "4"))
+DECODE_MAX_QUEUE = int(os.getenv("DECODE_MAX_QUEUE", "32"))
+MAX_ONGOING_REQUESTS = int(os.getenv("MAX_ONGOING_REQUESTS", "32"))
+
+# Image fetch stage in the ingress: pooled async downloads and threaded decoding
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(20 * 1024 * 1024)))
+FETCH_TIMEOUT_S = float(os.getenv("FETCH_TIMEOUT_S", "10"))
+FETCH_CONNECT_TIMEOUT_S = float(os.getenv("FETCH_CONNECT_TIMEOUT_S", "3"))
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "64"))
+FETCH_DECODE_WORKERS = int(os.getenv("FETCH_DECODE_WORKERS", "4"))
+
+# Detection result cache shared by ingress replicas through a Ray actor
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "3600"))
+
+# On-node model artifact cache shared by replicas on the same node
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/tmp/ray/model-cache")
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "false").lower() == "true"
+MODEL_ARTIFACT_DIGEST = os.getenv("MODEL_ARTIFACT_DIGEST") or None
+
+# Inference runtime: pytorch, onnx, openvino or torchscript (exported once and cached)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+EXPORT_CACHE_DIR = os.path.join(MODEL_CACHE_DIR, "exports")
+
+# Letterbox/normalize into reusable buffers instead of ultralytics preprocessing
+PREPROCESS_POOL_ENABLED = os.getenv("PREPROCESS_POOL_ENABLED", "true").lower() == "true"
+PREPROCESS_POOL_MAX_IDLE = int(os.getenv("PREPROCESS_POOL_MAX_IDLE", "4"))
+
+# Warm-up before the replica takes traffic: synthetic inference at expected input sizes
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_SHAPES = os.getenv("WARMUP_SHAPES", "1280x720,640x480")
+WARMUP_BATCH_SIZES = os.getenv("WARMUP_BATCH_SIZES", f"1,{BATCH_MAX_SIZE}")
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "2"))
+WARMUP_REQUIRED = os.getenv("WARMUP_REQUIRED", "true").lower() == "true"
+HEALTH_TIMEOUT_S = float(os.getenv("HEALTH_TIMEOUT_S", "5"))
+
+# Model multiplexing: a request header selects another version of the W&B model artifact
+MODEL_VERSION_HEADER = os.getenv("MODEL_VERSION_HEADER", "X-Model-Version")
+MULTIPLEX_MAX_MODELS = int(os.getenv("MULTIPLEX_MAX_MODELS", "3"))
+MULTIPLEX_MEMORY_BUDGET_BYTES = int(os.getenv("MULTIPLEX_MEMORY_BUDGET_BYTES", str(512 * 1024 ** 2)))
+MODEL_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Tiled inference for high-resolution images (enabled per request with ?tiled=true)
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "16"))
+TILE_INCLUDE_FULL = os.getenv("TILE_INCLUDE_FULL", "true").lower() == "true"
+TILE_NMS_THRESHOLD = float(os.getenv("TILE_NMS_THRESHOLD", "0.5"))
+
+# Admission control in the ingress: bounded in-flight and queued requests, client deadlines
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Timeout-Ms")
+DEFAULT_DEADLINE_MS = float(os.getenv("DEFAULT_DEADLINE_MS", "0"))
+# Priority classes (header or API key) share the ingress slots by weighted fair queuing;
+# the first class is latency-sensitive and the others may add at most PRIORITY_BULK_MAX_DELAY_MS to it
+PRIORITY_HEADER = os.getenv("PRIORITY_HEADER", "X-Priority")
+API_KEY_HEADER = os.getenv("API_KEY_HEADER", "X-API-Key")
+PRIORITY_WEIGHTS = parse_weights(os.getenv("PRIORITY_WEIGHTS", "interactive:8,bulk:1"))
+PRIORITY_API_KEYS = parse_api_keys(os.getenv("PRIORITY_API_KEYS", ""))
+PRIORITY_DEFAULT = os.getenv("PRIORITY_DEFAULT") or next(iter(PRIORITY_WEIGHTS))
+PRIORITY_BULK_MAX_DELAY_MS = float(os.getenv("PRIORITY_BULK_MAX_DELAY_MS", "50"))
+
+# Load-adaptive resolution: steps down (e.g. 640 -> 480 -> 320) when the admission queue or latency grows.
+# TorchScript exports have a static input size, so they always run at INFERENCE_IMGSZ.
+ADAPTIVE_RESOLUTION = os.getenv("ADAPTIVE_RESOLUTION", "false").lower() == "true" and INFERENCE_BACKEND != "torchscript"
+ADAPTIVE_RESOLUTIONS = parse_resolutions(os.getenv("ADAPTIVE_RESOLUTIONS", f"{INFERENCE_IMGSZ},480,320"))
+ADAPTIVE_QUEUE_HIGH = float(os.getenv("ADAPTIVE_QUEUE_HIGH", "8"))
+ADAPTIVE_LATENCY_TARGET_MS = float(os.getenv("ADAPTIVE_LATENCY_TARGET_MS", "500"))
+ADAPTIVE_CLIENT_BOUNDS = parse_client_bounds(os.getenv("ADAPTIVE_CLIENT_BOUNDS", ""))
+# Serve must pass queued requests on to the ingress, otherwise they wait in the proxy unbounded
+INGRESS_MAX_ONGOING_REQUESTS = int(os.getenv(
+    "INGRESS_MAX_ONGOING_REQUESTS", str(ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE + 16)
+))
+
+# Replica topology: CPU reservation, replica count and thread pools sized to the reservation
+# (0 threads = derived from the CPUs, see thread_topology.py; benchmark/thread_tuner.py sweeps them)
+MODEL_NUM_CPUS = float(os.getenv("MODEL_NUM_CPUS", "1"))
+MODEL_MIN_REPLICAS = int(os.getenv("MODEL_MIN_REPLICAS", "1"))
+MODEL_MAX_REPLICAS = int(os.getenv("MODEL_MAX_REPLICAS", "2"))
+INGRESS_NUM_CPUS = float(os.getenv("INGRESS_NUM_CPUS", "1"))
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))
+TORCH_INTER_OP_THREADS = int(os.getenv("TORCH_INTER_OP_THREADS", "0"))
+CV2_THREADS = int(os.getenv("CV2_THREADS", "0"))
+
+# Per-stage timings are always recorded in detect_stage_ms; the Server-Timing header exposes them to clients
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+
+def tile_params(
+    tiled: bool = False,
+    tile_size: Optional[int] = Query(None, ge=128, le=4096),
+    tile_overlap: Optional[float] = Query(None, ge=0, le=0.75),
+    max_tiles: Optional[int] = Query(None, ge=1),
+) -> Optional[dict]:
+    """Per-request tiling options; max_tiles is capped by TILE_MAX_TILES"""
+    if not tiled:
+        return None
+    return {
+        "tile_size": tile_size or TILE_SIZE,
+        "overlap": TILE_OVERLAP if tile_overlap is None else tile_overlap,
+        "max_tiles": min(max_tiles or TILE_MAX_TILES, TILE_MAX_TILES),
+    }
+
+
+def resolution_bounds(
+    min_imgsz: Optional[int] = Query(None, ge=32, le=4096),
+    max_imgsz: Optional[int] = Query(None, ge=32, le=4096),
+) -> tuple:
+    """Per-request limits of the adaptive resolution"""
+    return min_imgsz, max_imgsz
+
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected(request: Request, e: AdmissionRejectedError):
+    return JSONResponse(status_code=e.status_code, content={"detail": str(e)}, headers={"Retry-After": e.retry_after})
+
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded(request: Request, e: DeadlineExceededError):
+    return JSONResponse(status_code=504, content={"detail": str(e)})
+
+
 @serve.deployment(
     num_replicas=1,
+    max_ongoing_requests=INGRESS_MAX_ONGOING_REQUESTS,
     ray_actor_options={
-        "num_cpus": 1,
+        "num_cpus": INGRESS_NUM_CPUS,
     }
 )
 @serve.ingress(app)
 class APIIngress:
     def __init__(self, object_detection_handle) -> None:
+        # Decoding and tiling use OpenCV in the fetch/decode threads
+        apply_thread_topology(INGRESS_NUM_CPUS, cv2_threads=CV2_THREADS)
         self.handle: DeploymentHandle = object_detection_handle.options(
             use_new_handle_api=True,
         )
+        self.fetcher = ImageFetcher(
+            max_bytes=FETCH_MAX_BYTES,
+            timeout_s=FETCH_TIMEOUT_S,
+            connect_timeout_s=FETCH_CONNECT_TIMEOUT_S,
+            pool_size=FETCH_POOL_SIZE,
+            decode_workers=FETCH_DECODE_WORKERS,
+        )
+        self.stage_latency = metrics.Histogram(
+            "detect_stage_ms",
+            description="Time spent in each /detect stage (read, fetch, cache, decode, preprocess, forward, nms, infer, serialize)",
+            boundaries=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000],
+            tag_keys=("stage",),
+        )
+        self.admission = AdmissionController(
+            "api",
+            ADMISSION_MAX_IN_FLIGHT,
+            ADMISSION_MAX_QUEUE,
+            weights=PRIORITY_WEIGHTS,
+            background_delay_ms=PRIORITY_BULK_MAX_DELAY_MS,
+        )
+        self.resolution = ResolutionPolicy(
+            ADAPTIVE_RESOLUTIONS if ADAPTIVE_RESOLUTION else [INFERENCE_IMGSZ],
+            ADAPTIVE_QUEUE_HIGH,
+            ADAPTIVE_LATENCY_TARGET_MS,
+            enabled=ADAPTIVE_RESOLUTION,
+        )
+
+        # Cache key identity: results are only reused for the same model and parameters
+        self.model_id = os.getenv("WANDB_MODEL_ARTIFACT", "yolov8n.pt")
+        self.model_collection = self.model_id.rsplit(":", 1)[0]
+        self.inference_params = {"imgsz": INFERENCE_IMGSZ, "backend": INFERENCE_BACKEND}
+        self.result_cache = None
+        if RESULT_CACHE_ENABLED:
+            self.result_cache = get_cache_actor(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_S)
 
     @app.get("/detect")
-    async def detect(self, image_url: str):
-        result = await self.handle.detect.remote(image_url)
-        return JSONResponse(content=result)
+    async def detect(self,
+                     request: Request,
+                     image_url: str,
+                     precision: Optional[int] = Query(None, ge=0, le=6),
+                     tiling: Optional[dict] = Depends(tile_params),
+                     bounds: tuple = Depends(resolution_bounds)):
+        media_type = negotiate_format(request.headers.get("accept"))
+        version = self._model_version(request)
+        deadline = self._deadline(request)
+        async with self.admission.admit(deadline, self._priority(request)) as queue_ms:
+            imgsz = self._resolution(request, bounds)
+            start_time = time.perf_counter()
+            try:
+                # Fetch here so model replicas only receive decoded arrays
+                buffer = await asyncio.wait_for(self.fetcher.download(image_url), remaining_s(deadline))
+            except ImageTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except aiohttp.ClientResponseError as e:
+                raise HTTPException(status_code=502, detail=f"Image URL returned {e.status}")
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="Image download timed out")
+            except aiohttp.ClientError as e:
+                raise HTTPException(status_code=502, detail=f"Image download failed: {e}")
+            timings = {"queue": round(queue_ms, 2), "fetch": round((time.perf_counter() - start_time) * 1000, 2)}
+
+            columns = await self._detect_cached(buffer, timings, version, tiling, deadline, imgsz)
+
+        response = url_response(columns, media_type, precision)
+        response["imgsz"] = imgsz
+        response["timings_ms"] = timings
+        return self._render(response, media_type, timings)
+
+    @app.post("/detect")
+    async def detect_upload(self,
+                            request: Request,
+                            precision: Optional[int] = Query(None, ge=0, le=6),
+                            tiling: Optional[dict] = Depends(tile_params),
+                            bounds: tuple = Depends(resolution_bounds)):
+        """Accepts image as raw body (image/*) or multipart 'file' field"""
+        start_time = time.time()
+        media_type = negotiate_format(request.headers.get("accept"))
+        version = self._model_version(request)
+        deadline = self._deadline(request)
+        # The body is read before admission, so a slow uploader does not hold a slot while it trickles in
+        read_start = time.perf_counter()
+        contents = await read_upload(request, FETCH_MAX_BYTES)
+        read_ms = (time.perf_counter() - read_start) * 1000
+
+        async with self.admission.admit(deadline, self._priority(request)) as queue_ms:
+            imgsz = self._resolution(request, bounds)
+            timings = {"queue": round(queue_ms, 2), "read": round(read_ms, 2)}
+            columns = await self._detect_cached(
+                np.frombuffer(contents, np.uint8), timings, version, tiling, deadline, imgsz
+            )
+
+        processing_time = (time.time() - start_time) * 1000
+        response = upload_response(columns, processing_time, media_type, precision)
+        response["imgsz"] = imgsz
+        return self._render(response, media_type, timings)
+
+    @app.get("/health")
+    async def health(self):
+        """Healthy only when a model replica has finished warm-up"""
+        try:
+            replica = await asyncio.wait_for(self.handle.health.remote(), timeout=HEALTH_TIMEOUT_S)
+        except Exception as e:
+            return JSONResponse(status_code=503, content={
+                "status": "unavailable", "detail": str(e), "admission": self.admission.stats(),
+                "resolution": self.resolution.stats()
+            })
+
+        status_code = 200 if replica["ready"] else 503
+        status = "healthy" if replica["ready"] else "warming_up"
+        return JSONResponse(status_code=status_code, content={
+            "status": status, "replica": replica, "admission": self.admission.stats(),
+            "resolution": self.resolution.stats()
+        })
+
+    @app.get("/cache/stats")
+    async def cache_stats(self):
+        if self.result_cache is None:
+            return {"status": "disabled"}
+        return await self.result_cache.stats.remote()
+
+    def _model_version(self, request: Request) -> str:
+        """Artifact version selected by the client, '' for the deployment's default model"""
+        version = request.headers.get(MODEL_VERSION_HEADER, "")
+        if version and not MODEL_VERSION_PATTERN.match(version):
+            raise HTTPException(status_code=400, detail=f"Invalid {MODEL_VERSION_HEADER} header")
+        return version
+
+    def _deadline(self, request: Request) -> Optional[float]:
+        """Absolute deadline from the client's time budget header (DEFAULT_DEADLINE_MS without it)"""
+        try:
+            return parse_deadline(request.headers.get(DEADLINE_HEADER), DEFAULT_DEADLINE_MS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER}: {e}")
+
+    def _priority(self, request: Request) -> str:
+        """Priority class of the API key, otherwise of the priority header (PRIORITY_DEFAULT without both)"""
+        try:
+            return request_priority(
+                request.headers.get(PRIORITY_HEADER),
+                request.headers.get(API_KEY_HEADER),
+                PRIORITY_API_KEYS,
+                PRIORITY_WEIGHTS,
+                PRIORITY_DEFAULT,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{PRIORITY_HEADER}: {e}")
+
+    def _resolution(self, request: Request, bounds: tuple) -> int:
+        """Adaptive resolution from admission queue depth and latency, within the client's bounds"""
+        self.resolution.update(self.admission.queued, self.admission.service_ms)
+        client_bounds = ADAPTIVE_CLIENT_BOUNDS.get(request.headers.get(API_KEY_HEADER), (None, None))
+        return self.resolution.select(*combine_bounds(bounds, client_bounds))
+
+    async def _detect_cached(self,
+                             buffer: np.ndarray,
+                             timings: dict,
+                             version: str = "",
+                             tiling: Optional[dict] = None,
+                             deadline: Optional[float] = None,
+                             imgsz: int = INFERENCE_IMGSZ) -> Dict[str, list]:
+        """Returns cached result or runs detection once for identical concurrent requests"""
+        if self.result_cache is None:
+            return await self._detect(buffer, timings, version, tiling, deadline, imgsz)
+
+        start_time = time.perf_counter()
+        model_id = f"{self.model_collection}:{version}" if version else self.model_id
+        params = {**self.inference_params, "imgsz": imgsz}
+        if tiling:
+            params["tiling"] = tiling
+        key = cache_key(buffer, model_id, params)
+        status, value = await self.result_cache.get_or_reserve.remote(key)
+        timings["cache"] = round((time.perf_counter() - start_time) * 1000, 2)
+        if status == "hit":
+            return value
+
+        token = value
+        stored = False
+        try:
+            columns = await self._detect(buffer, timings, version, tiling, deadline, imgsz)
+            self.result_cache.put.remote(key, columns, token)
+            stored = True
+        finally:
+            if not stored:
+                # Also on cancellation, so waiters take over instead of waiting for the reservation to time out
+                self.result_cache.release.remote(key, token)
+        return columns
+
+    async def _detect(self,
+                      buffer: np.ndarray,
+                      timings: dict,
+                      version: str = "",
+                      tiling: Optional[dict] = None,
+                      deadline: Optional[float] = None,
+                      imgsz: int = INFERENCE_IMGSZ) -> Dict[str, list]:
+        start_time = time.perf_counter()
+        try:
+            image = await self.fetcher.decode(buffer)
+        except ImageDecodeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ExecutorOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        timings["decode"] = round((time.perf_counter() - start_time) * 1000, 2)
+        check_deadline(deadline, "inference")
+
+        # Hand off through the object store: the replica reads the array zero-copy.
+        # Multiplexed requests are routed to replicas that already hold the model version.
+        handle = self.handle.options(multiplexed_model_id=version) if version else self.handle
+        start_time = time.perf_counter()
+        try:
+            if tiling:
+                columns = await self._detect_tiled(handle, image, tiling, deadline, imgsz)
+            else:
+                # The deadline travels with the request, so replicas drop work that expired in their queue
+                columns = await handle.detect.remote(ray.put(image), deadline, imgsz)
+        except ExecutorOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except ModelNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        timings["infer"] = round((time.perf_counter() - start_time) * 1000, 2)
+        # Replica stages (of the whole batch the request ran in); removed before the result is cached
+        timings.update(columns.pop("stages_ms", {}))
+        return columns
+
+    async def _detect_tiled(self,
+                            handle: DeploymentHandle,
+                            image: np.ndarray,
+                            tiling: dict,
+                            deadline: Optional[float] = None,
+                            imgsz: int = INFERENCE_IMGSZ) -> Dict[str, list]:
+        """Tiles fan out to ObjectDetection replicas in parallel, where serve.batch batches them"""
+        height, width = image.shape[:2]
+        grid = tile_grid(height, width, tiling["tile_size"], tiling["overlap"], tiling["max_tiles"])
+        tiles = crop_tiles(image, grid)
+        if TILE_INCLUDE_FULL and len(grid) > 1:
+            # Downscaled full frame keeps objects larger than a tile
+            grid.append((0, 0, width, height))
+            tiles.append(image)
+
+        tile_columns = await asyncio.gather(*(handle.detect.remote(ray.put(tile), deadline, imgsz) for tile in tiles))
+        # Tiles run in parallel: the slowest tile is the time of each replica stage
+        stages = {}
+        for columns in tile_columns:
+            for stage, duration in columns.pop("stages_ms", {}).items():
+                stages[stage] = max(stages.get(stage, 0.0), duration)
+
+        start_time = time.perf_counter()
+        columns = merge_tiles(tile_columns, grid, TILE_NMS_THRESHOLD)
+        if stages:
+            # Cross-tile NMS adds to the per-tile NMS
+            stages["nms"] = round(stages.get("nms", 0.0) + (time.perf_counter() - start_time) * 1000, 2)
+            columns["stages_ms"] = stages
+        return columns
+
+    def _render(self, payload: dict, media_type: str, timings: dict) -> Response:
+        """Serializes the response; all stage timings go to the stage histogram and the Server-Timing header"""
+        start_time = time.perf_counter()
+        body = encode(payload, media_type)
+        timings["serialize"] = round((time.perf_counter() - start_time) * 1000, 2)
+        self._observe_stages(timings)
+        headers = {"Server-Timing": server_timing(timings)} if SERVER_TIMING_ENABLED else None
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def _observe_stages(self, timings: dict):
+        for stage, duration in timings.items():
+            self.stage_latency.observe(duration, tags={"stage": stage})
+
+    async def __del__(self):
+        await self.fetcher.close()
 
 
 @serve.deployment(
-    autoscaling_config={"min_replicas": 1, "max_replicas": 2},
+    autoscaling_config={"min_replicas": MODEL_MIN_REPLICAS, "max_replicas": MODEL_MAX_REPLICAS},
+    max_ongoing_requests=MAX_ONGOING_REQUESTS,
     ray_actor_options={
-        "num_cpus": 1,
+        "num_cpus": MODEL_NUM_CPUS,
+    },
+    user_config={
+        "max_batch_size": BATCH_MAX_SIZE,
+        "batch_wait_timeout_s": BATCH_WAIT_TIMEOUT_S,
     }
 )
 class ObjectDetection:
     def __init__(self):
+        # Before the model is loaded: the inter-op pool can only be sized once
+        self.threads = apply_thread_topology(MODEL_NUM_CPUS, TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS, CV2_THREADS)
+        self.readiness = ReadinessState()
+        self.imgsz = INFERENCE_IMGSZ
+        self.preprocessor = None
+        if PREPROCESS_POOL_ENABLED:
+            self.preprocessor = PooledPreprocessor(self.imgsz, BufferPool(PREPROCESS_POOL_MAX_IDLE))
+        self.preprocessors = {self.imgsz: self.preprocessor}
+        self.inference_executor = BoundedExecutor("inference", INFERENCE_WORKERS, INFERENCE_MAX_QUEUE)
+        self.decode_executor = BoundedExecutor("decode", DECODE_WORKERS, DECODE_MAX_QUEUE)
+
         # wandb configuration
-        self.wandb_project = os.getenv("WANDB_PROJECT", "ml-ops-yolo-cpu")
-        self.wandb_entity = os.getenv("WANDB_ENTITY", "maslov-mykhailo-set-university") 
         self.model_artifact_name = os.getenv("WANDB_MODEL_ARTIFACT", "maslov-mykhailo-set-university-org/wandb-registry-model/TestCollection:v1")
+        self.model_collection = self.model_artifact_name.rsplit(":", 1)[0]
+        self.artifact_cache = ArtifactCache(MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES, offline=MODEL_OFFLINE)
         
-        print("🤖 Initializing wandb and loading YOLO model...")
-        
-        # Ensure wandb is in online mode for artifact downloading
-        os.environ["WANDB_MODE"] = "online"
-        
-        # Initialize wandb
-        run = wandb.init(
-            project=self.wandb_project,
-            entity=self.wandb_entity,
-            job_type="inference",
-            mode="online"
-        )
+        print(f"🤖 Loading YOLO model ({'offline' if MODEL_OFFLINE else 'online'})...")
         
+        cold_start = {"resolve": 0.0, "download": 0.0}
         try:
-            # Check for API key presence
-            api_key = os.getenv("WANDB_API_KEY")
-            if not api_key:
-                raise ValueError("WANDB_API_KEY not found in environment variables")
-            
-            # Download model artifact from wandb
-            print(f"📥 Downloading model artifact: {self.model_artifact_name}")
-            artifact = run.use_artifact(self.model_artifact_name, type='model')
-            model_path = artifact.download()
-            
-            # Find model file in downloaded directory
-            model_file = None
-            for file in os.listdir(model_path):
-                if file.endswith('.pt'):
-                    model_file = os.path.join(model_path, file)
-                    break
-            
-            if model_file is None:
-                raise FileNotFoundError("No .pt model file found in the downloaded artifact")
+            # Resolve artifact digest and download it only if it is not cached on this node
+            model_file, cold_start = self.artifact_cache.get(self.model_artifact_name, digest=MODEL_ARTIFACT_DIGEST)
             
             print(f"📁 Model file path: {model_file}")
-            self.model = YOLO(model_file)
-            print("✅ Model successfully loaded from wandb!")
+            start_time = time.perf_counter()
+            self.model = load_model(model_file, INFERENCE_BACKEND, self.imgsz, EXPORT_CACHE_DIR)
+            cold_start["load"] = round((time.perf_counter() - start_time) * 1000, 2)
+            print("✅ Model successfully loaded from artifact cache!")
             
         except Exception as e:
-            print(f"❌ Failed to load model from wandb: {e}")
+            print(f"❌ Failed to load model artifact: {e}")
             print("🔄 Switching to fallback model yolov8n.pt...")
-            self.model = YOLO('yolov8n.pt')
+            # Resolve/download time spent before the failure is still part of the cold start
+            cold_start = dict(self.artifact_cache.last_timings)
+            start_time = time.perf_counter()
+            self.model = load_model('yolov8n.pt', INFERENCE_BACKEND, self.imgsz, EXPORT_CACHE_DIR)
+            cold_start["load"] = round((time.perf_counter() - start_time) * 1000, 2)
             print("✅ Fallback model successfully loaded!")
         
-        finally:
-            # Finish wandb run after model loading
-            wandb.finish()
-
-    async def detect(self, image_url: str):
-        results = self.model(image_url)
-
-        detected_objects = []
-        if len(results) > 0:
-            for result in results:
-                for box in result.boxes:
-                    class_id = int(box.cls[0])
-                    object_name = result.names[class_id]
-                    coords = box.xyxy[0].tolist()
-                    detected_objects.append({"class": object_name, "coordinates": coords})
-
-        if len(detected_objects) > 0:
-            return {"status": "found", "objects": detected_objects}
+        # Warm-up: lazy initialization is paid here, before Serve routes traffic to the replica
+        start_time = time.perf_counter()
+        self._warm_up()
+        cold_start["warmup"] = round((time.perf_counter() - start_time) * 1000, 2)
+        
+        cold_start_latency = metrics.Histogram(
+            "replica_cold_start_ms",
+            description="Replica cold start time by phase (resolve, download, load, warmup)",
+            boundaries=[10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000],
+            tag_keys=("phase",),
+        )
+        for phase, duration in cold_start.items():
+            cold_start_latency.observe(duration, tags={"phase": phase})
+        self.cold_start_ms = cold_start
+        print(f"⏱️  Cold start: {cold_start}")
+
+        self.time_to_first_request = metrics.Histogram(
+            "replica_time_to_first_request_ms",
+            description="Time from replica start to its first detection request",
+            boundaries=[100, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000],
+        )
+        self.first_request_latency = metrics.Histogram(
+            "replica_first_request_latency_ms",
+            description="Latency of the first detection request served by a replica",
+            boundaries=[10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+        )
+        self._init_multiplexing()
+
+    def _init_multiplexing(self):
+        """Memory budget and metrics of model versions selected per request"""
+        self.model_budget = ModelMemoryBudget(MULTIPLEX_MEMORY_BUDGET_BYTES, on_evict=self._on_model_evicted)
+        self.model_loads = metrics.Counter(
+            "multiplexed_model_loads",
+            description="Multiplexed model versions loaded by the replica",
+            tag_keys=("model_id",),
+        )
+        self.model_evictions = metrics.Counter(
+            "multiplexed_model_evictions",
+            description="Multiplexed model versions evicted (reason: count or memory)",
+            tag_keys=("model_id", "reason"),
+        )
+        self.model_memory = metrics.Gauge(
+            "multiplexed_model_memory_bytes",
+            description="Estimated memory of multiplexed models loaded on the replica",
+        )
+        self.model_load_latency = metrics.Histogram(
+            "multiplexed_model_load_ms",
+            description="Time to resolve, load and warm up a multiplexed model version",
+            boundaries=[100, 500, 1000, 2500, 5000, 10000, 30000, 60000],
+            tag_keys=("model_id",),
+        )
+        self.model_latency = metrics.Histogram(
+            "model_request_latency_ms",
+            description="Replica detection latency per model version",
+            boundaries=[10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+            tag_keys=("model_id",),
+        )
+        self.deadline_exceeded = metrics.Counter(
+            "model_deadline_exceeded_requests",
+            description="Requests dropped by the replica because their deadline passed before inference",
+        )
+
+    def _warm_up(self):
+        """Synthetic batches at the configured shapes and batch sizes go through the real inference path"""
+        if not WARMUP_ENABLED:
+            self.readiness.mark_ready()
+            return
+
+        def infer(images):
+            # Every resolution the adaptive mode can pick is warmed up
+            for imgsz in (ADAPTIVE_RESOLUTIONS if ADAPTIVE_RESOLUTION else [self.imgsz]):
+                self._infer_batch(images, imgsz=imgsz)
+
+        try:
+            timings = warm_up(infer, parse_shapes(WARMUP_SHAPES), parse_sizes(WARMUP_BATCH_SIZES), WARMUP_ROUNDS)
+        except Exception as e:
+            print(f"❌ Warm-up failed: {e}")
+            self.readiness.mark_failed(e)
+            if WARMUP_REQUIRED:
+                raise
+            timings = {}
+        self.readiness.mark_ready(timings)
+        print(f"🔥 Warm-up: {timings}")
+
+    def check_health(self):
+        """Called periodically by Serve: replica is healthy only after warm-up"""
+        if not self.readiness.ready:
+            raise RuntimeError(f"Replica is not ready: {self.readiness.error or 'warming up'}")
+
+    def health(self) -> dict:
+        return {
+            **self.readiness.stats(),
+            "cold_start_ms": self.cold_start_ms,
+            "threads": self.threads,
+            "multiplexed_models": self.model_budget.stats(),
+            "buffer_pool": self.preprocessor.pool.stats() if self.preprocessor else "disabled",
+        }
+
+    @serve.multiplexed(max_num_models_per_replica=MULTIPLEX_MAX_MODELS)
+    async def get_model(self, version: str) -> MultiplexedModel:
+        """Loads another version of the model artifact (LRU by count, see ModelMemoryBudget for memory)"""
+        model = MultiplexedModel(version, self._load_version, self.model_budget)
+        # Only loads: the request itself acquires the model once, also on serve.multiplexed hits
+        await model.load()
+        return model
+
+    def _load_version(self, version: str):
+        """Runs in a thread: resolve/download through the artifact cache, load and warm up"""
+        start_time = time.perf_counter()
+        try:
+            model_file, _ = self.artifact_cache.get(f"{self.model_collection}:{version}")
+            model = load_model(model_file, INFERENCE_BACKEND, self.imgsz, EXPORT_CACHE_DIR)
+        except Exception as e:
+            raise ModelNotFoundError(f"Model version '{version}' could not be loaded: {e}") from e
+        self._infer_batch(synthetic_images((self.imgsz, self.imgsz), 1), model)
+
+        duration = (time.perf_counter() - start_time) * 1000
+        self.model_loads.inc(tags={"model_id": version})
+        self.model_load_latency.observe(duration, tags={"model_id": version})
+        print(f"📦 Loaded model version {version} in {duration:.0f}ms")
+        return model, path_size(model_file)
+
+    def _on_model_evicted(self, version: str, reason: str):
+        self.model_evictions.inc(tags={"model_id": version, "reason": reason})
+        self.model_memory.set(self.model_budget.used_bytes)
+        print(f"🗑️  Evicted model version {version} ({reason})")
+
+    def reconfigure(self, config: dict):
+        """Apply batching settings from user_config"""
+        max_batch_size = int(config.get("max_batch_size", BATCH_MAX_SIZE))
+        batch_wait_timeout_s = float(config.get("batch_wait_timeout_s", BATCH_WAIT_TIMEOUT_S))
+
+        self.detect_batch.set_max_batch_size(max_batch_size)
+        self.detect_batch.set_batch_wait_timeout_s(batch_wait_timeout_s)
+        print(f"⚙️  Batching: max_batch_size={max_batch_size}, batch_wait_timeout_s={batch_wait_timeout_s}")
+
+    async def detect(self,
+                     image: Union[np.ndarray, str],
+                     deadline: Optional[float] = None,
+                     imgsz: Optional[int] = None) -> Dict[str, list]:
+        """
+        Returns columnar detections: {"bbox": [...], "confidence": [...], "class_name": [...]}
+        deadline is an absolute time.time() value; expired requests are not batched.
+        imgsz is the inference resolution picked by the ingress (INFERENCE_IMGSZ by default).
+        """
+        first_request = self.readiness.first_request()
+        if first_request:
+            self.time_to_first_request.observe(self.readiness.time_to_first_request_ms)
+        start_time = time.perf_counter()
+
+        # Version from the multiplexed model id of the request ('' = default model)
+        version = serve.get_multiplexed_model_id()
+        model = self.model
+        if version:
+            model = await (await self.get_model(version)).acquire()
+            self.model_memory.set(self.model_budget.used_bytes)
+
+        if isinstance(image, str):
+            # URL passed directly to the replica: download outside of the batch
+            # so a broken URL fails only its own request
+            image = await self.decode_executor.run(load_image, image)
+        try:
+            check_deadline(deadline, "inference")
+        except DeadlineExceededError:
+            self.deadline_exceeded.inc()
+            raise
+        columns = await self.detect_batch(image, model, imgsz or self.imgsz)
+        self.model_latency.observe((time.perf_counter() - start_time) * 1000, tags={"model_id": version or "default"})
+
+        if first_request:
+            self.readiness.record_first_request_latency((time.perf_counter() - start_time) * 1000)
+            self.first_request_latency.observe(self.readiness.first_request_latency_ms)
+            print(f"⏱️  First request: {self.readiness.first_request_latency_ms}ms, "
+                  f"{self.readiness.time_to_first_request_ms}ms after start")
+        return columns
+
+    @serve.batch(max_batch_size=BATCH_MAX_SIZE, batch_wait_timeout_s=BATCH_WAIT_TIMEOUT_S)
+    async def detect_batch(self, images: List[np.ndarray], models: list, sizes: List[int]) -> List[Dict[str, list]]:
+        return await self.inference_executor.run(self._infer_grouped, images, models, sizes)
+
+    def _preprocessor(self, imgsz: int) -> PooledPreprocessor:
+        """One preprocessor per resolution, all sharing the same buffer pool"""
+        if imgsz not in self.preprocessors:
+            self.preprocessors[imgsz] = PooledPreprocessor(imgsz, self.preprocessor.pool)
+        return self.preprocessors[imgsz]
+
+    def _infer_grouped(self, images: List[np.ndarray], models: list, sizes: List[int]) -> List[Dict[str, list]]:
+        """A batch may mix model versions and resolutions: one forward pass per (model, resolution)"""
+        groups = {}
+        for index, (model, imgsz) in enumerate(zip(models, sizes)):
+            groups.setdefault((id(model), imgsz), (model, imgsz, []))[2].append(index)
+
+        responses = [None] * len(images)
+        for model, imgsz, indices in groups.values():
+            stages = {}
+            columns = self._infer_batch([images[index] for index in indices], model, imgsz, stages)
+            for index, image_columns in zip(indices, columns):
+                # Stage timings ride along with the result; the ingress pops them
+                image_columns["stages_ms"] = stages
+                responses[index] = image_columns
+        return responses
+
+    def _infer_batch(self,
+                     images: List[np.ndarray],
+                     model=None,
+                     imgsz: Optional[int] = None,
+                     stages: Optional[dict] = None) -> List[Dict[str, list]]:
+        """Letterbox mixed-size images to one shape and run a single forward pass; fills stages (ms) if given"""
+        model = self.model if model is None else model
+        imgsz = imgsz or self.imgsz
+        start_time = time.perf_counter()
+        if self.preprocessor is None:
+            frames, metas = build_batch(images, imgsz)
+            model_start = time.perf_counter()
+            results = model(frames, imgsz=imgsz, verbose=False)
+            convert_start = time.perf_counter()
+            # Whole boxes tensor is converted at once per image
+            columns = [result_columns(result, meta) for result, meta in zip(results, metas)]
         else:
-            return {"status": "not found"}
+            # Normalized BCHW tensor from pooled buffers: ultralytics skips its own preprocessing
+            with self._preprocessor(imgsz).batch(images) as (tensor, metas):
+                model_start = time.perf_counter()
+                results = model(torch.from_numpy(tensor), verbose=False)
+                convert_start = time.perf_counter()
+                columns = [result_columns(result, meta) for result, meta in zip(results, metas)]
+
+        if stages is not None:
+            model_ms = (convert_start - model_start) * 1000
+            split = model_stages(results, model_ms, (time.perf_counter() - convert_start) * 1000)
+            split["preprocess"] += (model_start - start_time) * 1000
+            stages.update({stage: round(duration, 2) for stage, duration in split.items()})
+        return columns
 
 entrypoint = APIIngress.bind(ObjectDetection.bind())
\ No newline at end of file
@@ -0,0 +1,362 @@
+"""
+Multi-stage Ray Serve application: fetch/decode -> letterbox/normalize -> model forward -> NMS/serialization.
+Every stage is a separate deployment with its own autoscaling config. The ingress chains the
+stage calls, so intermediate arrays go from stage to stage through the Ray object store and
+never pass through the ingress.
+"""
+
+from contextlib import contextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+from typing import List, Optional
+import aiohttp
+import asyncio
+import os
+import time
+import numpy as np
+import torch
+
+from ray import serve
+from ray.serve import metrics
+from ray.serve.handle import DeploymentHandle, DeploymentResponse
+
+from artifact_cache import ArtifactCache
+from backends import load_forward
+from batching import scale_boxes
+from buffer_pool import BufferPool, letterbox_into, normalize_into
+from executor import BoundedExecutor, ExecutorOverloadedError
+from fetcher import ImageDecodeError, ImageFetcher, ImageTooLargeError
+from postprocess import empty_columns
+from responses import encode, negotiate_format, upload_response, url_response
+from thread_topology import apply_thread_topology
+from uploads import read_upload
+from ultralytics.utils.ops import non_max_suppression
+
+app = FastAPI()
+
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", "640"))
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_WAIT_TIMEOUT_S = float(os.getenv("BATCH_WAIT_TIMEOUT_S", "0.05"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "4"))
+
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(20 * 1024 * 1024)))
+FETCH_TIMEOUT_S = float(os.getenv("FETCH_TIMEOUT_S", "10"))
+FETCH_CONNECT_TIMEOUT_S = float(os.getenv("FETCH_CONNECT_TIMEOUT_S", "3"))
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "64"))
+FETCH_DECODE_WORKERS = int(os.getenv("FETCH_DECODE_WORKERS", "4"))
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/tmp/ray/model-cache")
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "false").lower() == "true"
+MODEL_ARTIFACT_DIGEST = os.getenv("MODEL_ARTIFACT_DIGEST") or None
+EXPORT_CACHE_DIR = os.path.join(MODEL_CACHE_DIR, "exports")
+
+# Same thresholds as the ultralytics predictor used by ObjectDetection
+NMS_CONF_THRESHOLD = float(os.getenv("NMS_CONF_THRESHOLD", "0.25"))
+NMS_IOU_THRESHOLD = float(os.getenv("NMS_IOU_THRESHOLD", "0.7"))
+NMS_MAX_DETECTIONS = int(os.getenv("NMS_MAX_DETECTIONS", "300"))
+
+
+def stage_autoscaling(stage: str, min_replicas: int, max_replicas: int, target_ongoing: int) -> dict:
+    """Autoscaling config of one stage, overridable with PIPELINE_<STAGE>_* variables"""
+    prefix = f"PIPELINE_{stage.upper()}_"
+    return {
+        "min_replicas": int(os.getenv(prefix + "MIN_REPLICAS", str(min_replicas))),
+        "max_replicas": int(os.getenv(prefix + "MAX_REPLICAS", str(max_replicas))),
+        "target_ongoing_requests": int(os.getenv(prefix + "TARGET_ONGOING", str(target_ongoing))),
+    }
+
+
+def stage_cpus(stage: str, default: float) -> float:
+    return float(os.getenv(f"PIPELINE_{stage.upper()}_NUM_CPUS", str(default)))
+
+
+class StageTimer:
+    """
+    Queueing and service time of a pipeline stage.
+    Queueing is measured from the hand-off timestamp ('finished_at' of the previous stage,
+    or dispatch by the ingress for the first stage) to the start of processing.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.queue_time = metrics.Histogram(
+            "pipeline_stage_queue_ms",
+            description="Time between hand-off from the previous stage and start of processing",
+            boundaries=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+            tag_keys=("stage",),
+        )
+        self.service_time = metrics.Histogram(
+            "pipeline_stage_service_ms",
+            description="Processing time of a request (or batch) in a stage",
+            boundaries=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+            tag_keys=("stage",),
+        )
+        self.queue_time.set_default_tags({"stage": stage})
+        self.service_time.set_default_tags({"stage": stage})
+
+    def observe_queue(self, handoff_at: float):
+        # Wall clock: hand-off and start may happen on different nodes
+        self.queue_time.observe(max(0.0, (time.time() - handoff_at) * 1000))
+
+    @contextmanager
+    def measure(self, handoff_at: Optional[float] = None):
+        if handoff_at is not None:
+            self.observe_queue(handoff_at)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.service_time.observe((time.perf_counter() - start_time) * 1000)
+
+
+@serve.deployment(
+    autoscaling_config=stage_autoscaling("decode", 1, 4, 8),
+    ray_actor_options={"num_cpus": stage_cpus("decode", 0.5)},
+)
+class DecodeStage:
+    """Downloads (pooled aiohttp) and decodes images"""
+
+    def __init__(self):
+        self.fetcher = ImageFetcher(
+            max_bytes=FETCH_MAX_BYTES,
+            timeout_s=FETCH_TIMEOUT_S,
+            connect_timeout_s=FETCH_CONNECT_TIMEOUT_S,
+            pool_size=FETCH_POOL_SIZE,
+            decode_workers=FETCH_DECODE_WORKERS,
+        )
+        self.timer = StageTimer("decode")
+
+    async def fetch(self, image_url: str, sent_at: float) -> dict:
+        with self.timer.measure(sent_at):
+            image, _ = await self.fetcher.fetch(image_url)
+        return {"image": image, "finished_at": time.time()}
+
+    async def decode(self, contents: bytes, sent_at: float) -> dict:
+        with self.timer.measure(sent_at):
+            image = await self.fetcher.decode(np.frombuffer(contents, np.uint8))
+        return {"image": image, "finished_at": time.time()}
+
+    async def __del__(self):
+        await self.fetcher.close()
+
+
+@serve.deployment(
+    autoscaling_config=stage_autoscaling("preprocess", 1, 4, 8),
+    ray_actor_options={"num_cpus": stage_cpus("preprocess", 0.5)},
+)
+class PreprocessStage:
+    """Letterbox to the model input size and normalize to a CHW float32 tensor"""
+
+    def __init__(self):
+        self.imgsz = INFERENCE_IMGSZ
+        self.pool = BufferPool()
+        self.timer = StageTimer("preprocess")
+
+    def run(self, decoded: dict) -> dict:
+        with self.timer.measure(decoded["finished_at"]):
+            # The letterbox canvas is reused; the tensor is new because it goes to the object store
+            with self.pool.borrow((self.imgsz, self.imgsz, 3)) as canvas:
+                meta = letterbox_into(decoded["image"], canvas)
+                tensor = normalize_into(canvas, np.empty((3, self.imgsz, self.imgsz), dtype=np.float32))
+        return {"input": tensor, "meta": meta, "finished_at": time.time()}
+
+
+@serve.deployment(
+    autoscaling_config=stage_autoscaling("model", 1, 2, 4),
+    max_ongoing_requests=int(os.getenv("MAX_ONGOING_REQUESTS", "32")),
+    ray_actor_options={"num_cpus": stage_cpus("model", 1)},
+    user_config={
+        "max_batch_size": BATCH_MAX_SIZE,
+        "batch_wait_timeout_s": BATCH_WAIT_TIMEOUT_S,
+    },
+)
+class ModelStage:
+    """Batched network forward pass only; NMS runs in PostprocessStage"""
+
+    def __init__(self):
+        apply_thread_topology(
+            stage_cpus("model", 1),
+            int(os.getenv("TORCH_INTRA_OP_THREADS", "0")),
+            int(os.getenv("TORCH_INTER_OP_THREADS", "0")),
+            int(os.getenv("CV2_THREADS", "0")),
+        )
+        self.inference_executor = BoundedExecutor("inference", INFERENCE_WORKERS, INFERENCE_MAX_QUEUE)
+        self.timer = StageTimer("model")
+
+        artifact_name = os.getenv("WANDB_MODEL_ARTIFACT", "maslov-mykhailo-set-university-org/wandb-registry-model/TestCollection:v1")
+        artifact_cache = ArtifactCache(MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES, offline=MODEL_OFFLINE)
+        try:
+            model_file, _ = artifact_cache.get(artifact_name, digest=MODEL_ARTIFACT_DIGEST)
+            self.model = load_forward(model_file, INFERENCE_BACKEND, INFERENCE_IMGSZ, EXPORT_CACHE_DIR)
+            print("✅ Model successfully loaded from artifact cache!")
+        except Exception as e:
+            print(f"❌ Failed to load model artifact: {e}")
+            print("🔄 Switching to fallback model yolov8n.pt...")
+            self.model = load_forward("yolov8n.pt", INFERENCE_BACKEND, INFERENCE_IMGSZ, EXPORT_CACHE_DIR)
+
+        self.names = dict(self.model.names)
+        self._forward([np.zeros((3, INFERENCE_IMGSZ, INFERENCE_IMGSZ), dtype=np.float32)])
+
+    def reconfigure(self, config: dict):
+        """Apply batching settings from user_config"""
+        self.forward_batch.set_max_batch_size(int(config.get("max_batch_size", BATCH_MAX_SIZE)))
+        self.forward_batch.set_batch_wait_timeout_s(float(config.get("batch_wait_timeout_s", BATCH_WAIT_TIMEOUT_S)))
+
+    def class_names(self) -> dict:
+        return self.names
+
+    async def forward(self, item: dict) -> dict:
+        return await self.forward_batch(item)
+
+    @serve.batch(max_batch_size=BATCH_MAX_SIZE, batch_wait_timeout_s=BATCH_WAIT_TIMEOUT_S)
+    async def forward_batch(self, items: List[dict]) -> List[dict]:
+        # Queue time includes waiting for the batch to fill
+        for item in items:
+            self.timer.observe_queue(item["finished_at"])
+        with self.timer.measure():
+            predictions = await self.inference_executor.run(self._forward, [item["input"] for item in items])
+
+        finished_at = time.time()
+        return [
+            {"predictions": prediction, "meta": item["meta"], "finished_at": finished_at}
+            for prediction, item in zip(predictions, items)
+        ]
+
+    def _forward(self, inputs: List[np.ndarray]) -> np.ndarray:
+        with torch.inference_mode():
+            predictions = self.model(torch.from_numpy(np.stack(inputs)))
+        if isinstance(predictions, (list, tuple)):
+            predictions = predictions[0]
+        if isinstance(predictions, torch.Tensor):
+            predictions = predictions.numpy()
+        return predictions
+
+
+@serve.deployment(
+    autoscaling_config=stage_autoscaling("postprocess", 1, 4, 8),
+    ray_actor_options={"num_cpus": stage_cpus("postprocess", 0.25)},
+)
+class PostprocessStage:
+    """NMS, rescaling to original image coordinates and response serialization"""
+
+    def __init__(self, model_handle: DeploymentHandle):
+        self.model_handle = model_handle
+        self.names = None
+        self.timer = StageTimer("postprocess")
+
+    async def run(self,
+                  output: dict,
+                  route: str,
+                  media_type: str,
+                  precision: Optional[int] = None,
+                  started_at: Optional[float] = None) -> bytes:
+        if self.names is None:
+            self.names = await self.model_handle.class_names.remote()
+
+        with self.timer.measure(output["finished_at"]):
+            columns = self._columns(output["predictions"], output["meta"])
+            if route == "url":
+                payload = url_response(columns, media_type, precision)
+            else:
+                processing_time = (time.time() - started_at) * 1000 if started_at else 0.0
+                payload = upload_response(columns, processing_time, media_type, precision)
+            return encode(payload, media_type)
+
+    def _columns(self, predictions: np.ndarray, meta: dict) -> dict:
+        detections = non_max_suppression(
+            torch.from_numpy(predictions[None]),
+            conf_thres=NMS_CONF_THRESHOLD,
+            iou_thres=NMS_IOU_THRESHOLD,
+            max_det=NMS_MAX_DETECTIONS,
+        )[0].numpy()
+        if len(detections) == 0:
+            return empty_columns()
+
+        return {
+            "bbox": scale_boxes(detections[:, :4], meta).tolist(),
+            "confidence": detections[:, 4].tolist(),
+            "class_name": [self.names[class_id] for class_id in detections[:, 5].astype(int).tolist()],
+        }
+
+
+@serve.deployment(
+    num_replicas=1,
+    ray_actor_options={"num_cpus": 0.5},
+)
+@serve.ingress(app)
+class PipelineIngress:
+    """
+    Chains the stages: each call gets the previous DeploymentResponse, so Serve passes the
+    result as an object reference and the ingress only receives the serialized response.
+    """
+
+    def __init__(self,
+                 decode: DeploymentHandle,
+                 preprocess: DeploymentHandle,
+                 model: DeploymentHandle,
+                 postprocess: DeploymentHandle):
+        self.decode = decode
+        self.preprocess = preprocess
+        self.model = model
+        self.postprocess = postprocess
+        self.latency = metrics.Histogram(
+            "pipeline_latency_ms",
+            description="End-to-end latency of a request through all pipeline stages",
+            boundaries=[10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000],
+            tag_keys=("route",),
+        )
+
+    @app.get("/detect")
+    async def detect(self, request: Request, image_url: str, precision: Optional[int] = Query(None, ge=0, le=6)):
+        media_type = negotiate_format(request.headers.get("accept"))
+        decoded = self.decode.fetch.remote(image_url, time.time())
+        return await self._run(decoded, "url", media_type, precision)
+
+    @app.post("/detect")
+    async def detect_upload(self, request: Request, precision: Optional[int] = Query(None, ge=0, le=6)):
+        """Accepts image as raw body (image/*) or multipart 'file' field"""
+        started_at = time.time()
+        media_type = negotiate_format(request.headers.get("accept"))
+        contents = await read_upload(request, FETCH_MAX_BYTES)
+        decoded = self.decode.decode.remote(contents, time.time())
+        return await self._run(decoded, "upload", media_type, precision, started_at)
+
+    async def _run(self,
+                   decoded: DeploymentResponse,
+                   route: str,
+                   media_type: str,
+                   precision: Optional[int],
+                   started_at: Optional[float] = None) -> Response:
+        start_time = time.perf_counter()
+        tensor = self.preprocess.run.remote(decoded)
+        output = self.model.forward.remote(tensor)
+        try:
+            # Errors of any stage surface here with their original exception type
+            body = await self.postprocess.run.remote(output, route, media_type, precision, started_at)
+        except ImageTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ImageDecodeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except aiohttp.ClientResponseError as e:
+            raise HTTPException(status_code=502, detail=f"Image URL returned {e.status}")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Image download timed out")
+        except aiohttp.ClientError as e:
+            raise HTTPException(status_code=502, detail=f"Image download failed: {e}")
+        except ExecutorOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        self.latency.observe((time.perf_counter() - start_time) * 1000, tags={"route": route})
+        return Response(content=body, media_type=media_type)
+
+
+model_stage = ModelStage.bind()
+entrypoint = PipelineIngress.bind(
+    DecodeStage.bind(),
+    PreprocessStage.bind(),
+    model_stage,
+    PostprocessStage.bind(model_stage),
+)
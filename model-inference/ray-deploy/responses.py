@@ -0,0 +1,70 @@
+import json
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from postprocess import round_columns, to_records
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Response formats selected through the Accept header
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.yolo.columnar+json"
+MSGPACK = "application/msgpack"
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Picks response format from Accept header (records JSON by default)"""
+    accept = (accept or "").lower()
+    if "msgpack" in accept:
+        return MSGPACK
+    if COLUMNAR_JSON in accept:
+        return COLUMNAR_JSON
+    return JSON
+
+
+def encode(payload: dict, media_type: str) -> bytes:
+    """Serializes payload in the negotiated format"""
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="msgpack responses are not available")
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. 'decode;dur=3.21, forward;dur=41.50'"""
+    return ", ".join(f"{stage};dur={duration:.2f}" for stage, duration in timings.items())
+
+
+def url_response(columns: Dict[str, list], media_type: str = JSON, precision: Optional[int] = None) -> dict:
+    """Response of GET /detect?image_url=..."""
+    if len(columns["bbox"]) == 0:
+        return {"status": "not found"}
+
+    columns = round_columns(columns, precision)
+    if media_type == JSON:
+        objects = [
+            {"class": class_name, "coordinates": bbox}
+            for class_name, bbox in zip(columns["class_name"], columns["bbox"])
+        ]
+    else:
+        objects = {"class": columns["class_name"], "coordinates": columns["bbox"]}
+    return {"status": "found", "objects": objects}
+
+
+def upload_response(columns: Dict[str, list],
+                    processing_time_ms: float,
+                    media_type: str = JSON,
+                    precision: Optional[int] = None) -> dict:
+    """Response of POST /detect, same contract as the FastAPI service in model-monitoring/yolo"""
+    columns = round_columns(columns, precision)
+    return {
+        "success": True,
+        "processing_time_ms": round(processing_time_ms, 2),
+        "objects_detected": len(columns["bbox"]),
+        "detections": to_records(columns) if media_type == JSON else columns,
+    }
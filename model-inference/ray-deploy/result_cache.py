@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import ray
+from ray.util import metrics
+
+CACHE_ACTOR_NAME = "detection_result_cache"
+CACHE_NAMESPACE = "serve"
+
+
+def cache_key(content: Any, model_id: str, params: Optional[dict] = None) -> str:
+    """Content-addressed key: image bytes hash + model identity + inference parameters"""
+    digest = hashlib.sha256()
+    digest.update(memoryview(content).cast("B"))
+    digest.update(model_id.encode())
+    digest.update(json.dumps(params or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU cache with TTL and memory cap for detection results"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, size = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> int:
+        """Stores value and returns number of evicted entries"""
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return 0
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl_s, size)
+        self._size_bytes += size
+        return self._trim()
+
+    def reconfigure(self, max_entries: int, max_bytes: int, ttl_s: float) -> int:
+        """Applies new limits (new TTL applies to new entries) and returns number of evicted entries"""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        return self._trim()
+
+    def _trim(self) -> int:
+        evicted = 0
+        while len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._size_bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+@ray.remote(num_cpus=0)
+class ResultCacheActor:
+    """
+    Detection result cache shared by all replicas.
+    Identical in-flight requests wait for a single computation (single-flight).
+    Detached, so it outlives the replica that created it (and redeploys); every ingress
+    replica pushes its limits through reconfigure() when it starts.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_s: float, inflight_timeout_s: float = 30.0):
+        self.cache = ResultCache(max_entries, max_bytes, ttl_s)
+        self.inflight_timeout_s = inflight_timeout_s
+        # key -> (reservation token, event set when the reservation ends)
+        self._inflight = {}
+        self._tokens = itertools.count(1)
+
+        self._hits = metrics.Counter("result_cache_hits", description="Detection result cache hits")
+        self._misses = metrics.Counter("result_cache_misses", description="Detection result cache misses")
+        self._evictions = metrics.Counter("result_cache_evictions", description="Detection result cache evictions")
+        self._coalesced = metrics.Counter(
+            "result_cache_coalesced",
+            description="Requests that waited for an identical in-flight computation",
+        )
+
+    async def get_or_reserve(self, key: str) -> Tuple[str, Optional[Any]]:
+        """
+        Returns ("hit", value) when result is available, or ("compute", token) when
+        the caller owns the computation and must call put() or release() with the token.
+        """
+        while True:
+            value = self.cache.get(key)
+            if value is not None:
+                self._hits.inc()
+                return "hit", value
+
+            reservation = self._inflight.get(key)
+            if reservation is None:
+                self._misses.inc()
+                return "compute", self._reserve(key)
+
+            # Another replica is computing the same result: wait for it
+            self._coalesced.inc()
+            _, event = reservation
+            try:
+                await asyncio.wait_for(event.wait(), timeout=self.inflight_timeout_s)
+            except asyncio.TimeoutError:
+                if self._inflight.get(key) is not reservation:
+                    # Another waiter already took over (or the owner finished): wait for that one
+                    continue
+                # Owner is stuck or gone: take over, and wake the other waiters so they wait for this caller
+                event.set()
+                self._misses.inc()
+                return "compute", self._reserve(key)
+            # Owner finished: loop to read the value, or become owner if it failed
+
+    def _reserve(self, key: str) -> int:
+        token = next(self._tokens)
+        self._inflight[key] = (token, asyncio.Event())
+        return token
+
+    def reconfigure(self, max_entries: int, max_bytes: int, ttl_s: float, inflight_timeout_s: float):
+        evicted = self.cache.reconfigure(max_entries, max_bytes, ttl_s)
+        if evicted:
+            self._evictions.inc(evicted)
+        self.inflight_timeout_s = inflight_timeout_s
+
+    def put(self, key: str, value: Any, token: int):
+        evicted = self.cache.put(key, value)
+        if evicted:
+            self._evictions.inc(evicted)
+        self.release(key, token)
+
+    def release(self, key: str, token: int):
+        """Ends the reservation, unless it was taken over since (the late owner must not end its successor's)"""
+        reservation = self._inflight.get(key)
+        if reservation is not None and reservation[0] == token:
+            del self._inflight[key]
+            reservation[1].set()
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "inflight": len(self._inflight)}
+
+
+def get_cache_actor(max_entries: int, max_bytes: int, ttl_s: float, inflight_timeout_s: float = 30.0):
+    """
+    Returns the shared cache actor, creating it on first use.
+    An existing actor (e.g. from an earlier deploy) gets the given limits through reconfigure().
+    """
+    actor = ResultCacheActor.options(
+        name=CACHE_ACTOR_NAME,
+        namespace=CACHE_NAMESPACE,
+        lifetime="detached",
+        get_if_exists=True,
+    ).remote(max_entries, max_bytes, ttl_s, inflight_timeout_s)
+    actor.reconfigure.remote(max_entries, max_bytes, ttl_s, inflight_timeout_s)
+    return actor
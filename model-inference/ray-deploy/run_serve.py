@@ -6,6 +6,15 @@ from dotenv import load_dotenv
 # Load environment variables from .env file (if it exists)
 load_dotenv()
 
+# Extra runtime packages required by the selected inference backend
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+BACKEND_PACKAGES = {
+    "pytorch": [],
+    "torchscript": [],
+    "onnx": ["onnx", "onnxslim", "onnxruntime"],
+    "openvino": ["openvino"],
+}
+
 # Initialize Ray with task-level runtime environment
 ray.init(
     address="ray://localhost:10001",
@@ -15,13 +24,16 @@ ray.init(
             "ultralytics",
             "wandb", 
             "python-dotenv",
+            "aiohttp",
+            "python-multipart",
+            "msgpack",
             "opencv-python-headless",
             "matplotlib",
             "seaborn",
             "scikit-learn",
             "torch",
             "torchvision"
-        ],
+        ] + BACKEND_PACKAGES.get(INFERENCE_BACKEND, []),
         "env_vars": {
             "OPENCV_IO_ENABLE_OPENEXR": "0",
             "OPENCV_IO_ENABLE_JASPER": "0", 
@@ -33,13 +45,98 @@ ray.init(
             "WANDB_MODEL_ARTIFACT": os.getenv("WANDB_MODEL_ARTIFACT", "maslov-mykhailo-set-university-org/wandb-registry-model/TestCollection:v1"),
             "WANDB_API_KEY": os.getenv("WANDB_API_KEY", ""),
             "WANDB_MODE": os.getenv("WANDB_MODE", "online"),
-            "WANDB_SILENT": "true"
+            "WANDB_SILENT": "true",
+            # Dynamic batching settings for ObjectDetection replicas
+            "BATCH_MAX_SIZE": os.getenv("BATCH_MAX_SIZE", "8"),
+            "BATCH_WAIT_TIMEOUT_S": os.getenv("BATCH_WAIT_TIMEOUT_S", "0.05"),
+            "INFERENCE_IMGSZ": os.getenv("INFERENCE_IMGSZ", "640"),
+            # Bounded executor limits for blocking work inside replicas
+            "INFERENCE_WORKERS": os.getenv("INFERENCE_WORKERS", "1"),
+            "INFERENCE_MAX_QUEUE": os.getenv("INFERENCE_MAX_QUEUE", "4"),
+            "DECODE_WORKERS": os.getenv("DECODE_WORKERS", "4"),
+            "DECODE_MAX_QUEUE": os.getenv("DECODE_MAX_QUEUE", "32"),
+            "MAX_ONGOING_REQUESTS": os.getenv("MAX_ONGOING_REQUESTS", "32"),
+            # Image fetch stage in APIIngress
+            "FETCH_MAX_BYTES": os.getenv("FETCH_MAX_BYTES", str(20 * 1024 * 1024)),
+            "FETCH_TIMEOUT_S": os.getenv("FETCH_TIMEOUT_S", "10"),
+            "FETCH_CONNECT_TIMEOUT_S": os.getenv("FETCH_CONNECT_TIMEOUT_S", "3"),
+            "FETCH_POOL_SIZE": os.getenv("FETCH_POOL_SIZE", "64"),
+            "FETCH_DECODE_WORKERS": os.getenv("FETCH_DECODE_WORKERS", "4"),
+            # Shared detection result cache
+            "RESULT_CACHE_ENABLED": os.getenv("RESULT_CACHE_ENABLED", "true"),
+            "RESULT_CACHE_MAX_ENTRIES": os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"),
+            "RESULT_CACHE_MAX_BYTES": os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)),
+            "RESULT_CACHE_TTL_S": os.getenv("RESULT_CACHE_TTL_S", "3600"),
+            # On-node model artifact cache
+            "MODEL_CACHE_DIR": os.getenv("MODEL_CACHE_DIR", "/tmp/ray/model-cache"),
+            "MODEL_CACHE_MAX_BYTES": os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)),
+            "MODEL_OFFLINE": os.getenv("MODEL_OFFLINE", "false"),
+            "MODEL_ARTIFACT_DIGEST": os.getenv("MODEL_ARTIFACT_DIGEST", ""),
+            # Inference runtime
+            "INFERENCE_BACKEND": INFERENCE_BACKEND,
+            # Replica warm-up and readiness
+            "WARMUP_ENABLED": os.getenv("WARMUP_ENABLED", "true"),
+            "WARMUP_SHAPES": os.getenv("WARMUP_SHAPES", "1280x720,640x480"),
+            "WARMUP_BATCH_SIZES": os.getenv("WARMUP_BATCH_SIZES", "1," + os.getenv("BATCH_MAX_SIZE", "8")),
+            "WARMUP_ROUNDS": os.getenv("WARMUP_ROUNDS", "2"),
+            "WARMUP_REQUIRED": os.getenv("WARMUP_REQUIRED", "true"),
+            "HEALTH_TIMEOUT_S": os.getenv("HEALTH_TIMEOUT_S", "5"),
+            # Model multiplexing
+            "MODEL_VERSION_HEADER": os.getenv("MODEL_VERSION_HEADER", "X-Model-Version"),
+            "MULTIPLEX_MAX_MODELS": os.getenv("MULTIPLEX_MAX_MODELS", "3"),
+            "MULTIPLEX_MEMORY_BUDGET_BYTES": os.getenv("MULTIPLEX_MEMORY_BUDGET_BYTES", str(512 * 1024 ** 2)),
+            # Tiled inference defaults
+            "TILE_SIZE": os.getenv("TILE_SIZE", "640"),
+            "TILE_OVERLAP": os.getenv("TILE_OVERLAP", "0.2"),
+            "TILE_MAX_TILES": os.getenv("TILE_MAX_TILES", "16"),
+            "TILE_INCLUDE_FULL": os.getenv("TILE_INCLUDE_FULL", "true"),
+            "TILE_NMS_THRESHOLD": os.getenv("TILE_NMS_THRESHOLD", "0.5"),
+            # Multi-stage pipeline (SERVE_APP=pipeline)
+            "NMS_CONF_THRESHOLD": os.getenv("NMS_CONF_THRESHOLD", "0.25"),
+            "NMS_IOU_THRESHOLD": os.getenv("NMS_IOU_THRESHOLD", "0.7"),
+            "NMS_MAX_DETECTIONS": os.getenv("NMS_MAX_DETECTIONS", "300"),
+            # Preprocessing buffer pool
+            "PREPROCESS_POOL_ENABLED": os.getenv("PREPROCESS_POOL_ENABLED", "true"),
+            "PREPROCESS_POOL_MAX_IDLE": os.getenv("PREPROCESS_POOL_MAX_IDLE", "4"),
+            # Admission control and client deadlines in APIIngress
+            "ADMISSION_MAX_IN_FLIGHT": os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"),
+            "ADMISSION_MAX_QUEUE": os.getenv("ADMISSION_MAX_QUEUE", "32"),
+            "DEADLINE_HEADER": os.getenv("DEADLINE_HEADER", "X-Request-Timeout-Ms"),
+            "DEFAULT_DEADLINE_MS": os.getenv("DEFAULT_DEADLINE_MS", "0"),
+            # Priority classes and weighted fair queuing in APIIngress
+            "PRIORITY_HEADER": os.getenv("PRIORITY_HEADER", "X-Priority"),
+            "API_KEY_HEADER": os.getenv("API_KEY_HEADER", "X-API-Key"),
+            "PRIORITY_WEIGHTS": os.getenv("PRIORITY_WEIGHTS", "interactive:8,bulk:1"),
+            "PRIORITY_API_KEYS": os.getenv("PRIORITY_API_KEYS", ""),
+            "PRIORITY_DEFAULT": os.getenv("PRIORITY_DEFAULT", ""),
+            "PRIORITY_BULK_MAX_DELAY_MS": os.getenv("PRIORITY_BULK_MAX_DELAY_MS", "50"),
+            # Load-adaptive inference resolution
+            "ADAPTIVE_RESOLUTION": os.getenv("ADAPTIVE_RESOLUTION", "false"),
+            "ADAPTIVE_RESOLUTIONS": os.getenv("ADAPTIVE_RESOLUTIONS", os.getenv("INFERENCE_IMGSZ", "640") + ",480,320"),
+            "ADAPTIVE_QUEUE_HIGH": os.getenv("ADAPTIVE_QUEUE_HIGH", "8"),
+            "ADAPTIVE_LATENCY_TARGET_MS": os.getenv("ADAPTIVE_LATENCY_TARGET_MS", "500"),
+            "ADAPTIVE_CLIENT_BOUNDS": os.getenv("ADAPTIVE_CLIENT_BOUNDS", ""),
+            # Replica topology and thread pools (0 threads = sized to the CPU reservation)
+            "MODEL_NUM_CPUS": os.getenv("MODEL_NUM_CPUS", "1"),
+            "MODEL_MIN_REPLICAS": os.getenv("MODEL_MIN_REPLICAS", "1"),
+            "MODEL_MAX_REPLICAS": os.getenv("MODEL_MAX_REPLICAS", "2"),
+            "INGRESS_NUM_CPUS": os.getenv("INGRESS_NUM_CPUS", "1"),
+            "TORCH_INTRA_OP_THREADS": os.getenv("TORCH_INTRA_OP_THREADS", "0"),
+            "TORCH_INTER_OP_THREADS": os.getenv("TORCH_INTER_OP_THREADS", "0"),
+            "CV2_THREADS": os.getenv("CV2_THREADS", "0"),
+            # Per-stage timing header
+            "SERVER_TIMING_ENABLED": os.getenv("SERVER_TIMING_ENABLED", "true")
         }
     }
 )
 
-# Import application after Ray initialization
-from object_detection import entrypoint
+# Import application after Ray initialization:
+# "yolo" - single ObjectDetection deployment, "pipeline" - separately scaled stages
+SERVE_APP = os.getenv("SERVE_APP", "yolo")
+if SERVE_APP == "pipeline":
+    from pipeline import entrypoint
+else:
+    from object_detection import entrypoint
 
 # Start serve application
 serve.run(entrypoint, name="yolo") 
\ No newline at end of file
@@ -0,0 +1,44 @@
+import math
+import os
+
+import cv2
+import torch
+
+
+def thread_count(value: int, cpus: float) -> int:
+    """0 = one thread per reserved CPU (at least one)"""
+    return value if value > 0 else max(1, math.floor(cpus))
+
+
+def apply_thread_topology(cpus: float,
+                          intra_op_threads: int = 0,
+                          inter_op_threads: int = 0,
+                          cv2_threads: int = 0) -> dict:
+    """
+    Sizes the thread pools of this process to its CPU reservation.
+    Without it torch and OpenCV start one thread per core of the node in every replica,
+    so a few replicas on one node oversubscribe it. Intra-op threads default to the reserved
+    CPUs, inter-op threads and OpenCV threads to one (requests run concurrently in the
+    executor threads already). Call it before the first torch operation of the process:
+    the inter-op pool can only be sized once.
+    """
+    intra_op = thread_count(intra_op_threads, cpus)
+    inter_op = inter_op_threads if inter_op_threads > 0 else 1
+    cv2_count = cv2_threads if cv2_threads > 0 else 1
+
+    # Runtimes started later (OpenMP, ONNX Runtime / OpenVINO through it) read the environment
+    os.environ["OMP_NUM_THREADS"] = str(intra_op)
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError:
+        # Already started (e.g. set earlier in this process)
+        pass
+    cv2.setNumThreads(cv2_count)
+
+    return {
+        "cpus": cpus,
+        "torch_intra_op": torch.get_num_threads(),
+        "torch_inter_op": torch.get_num_interop_threads(),
+        "cv2": cv2.getNumThreads(),
+    }
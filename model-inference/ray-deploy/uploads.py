@@ -0,0 +1,64 @@
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+# Allowance for the multipart part headers and boundary on top of the image bytes
+MULTIPART_OVERHEAD = 4096
+
+
+async def limited_stream(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Request body chunks, rejected with 413 before reading when Content-Length is above
+    max_bytes, and as soon as the body grows beyond it otherwise (chunked uploads)
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes limit")
+
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes limit")
+        yield chunk
+
+
+async def read_form(request: Request, max_bytes: int) -> FormData:
+    """Multipart form parsed from the size-limited body, so an oversized upload is never spooled whole"""
+    parser = MultiPartParser(request.headers, limited_stream(request, max_bytes + MULTIPART_OVERHEAD), max_files=1)
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+async def read_upload(request: Request, max_bytes: int) -> bytes:
+    """
+    Reads uploaded image bytes with the same validation as the FastAPI service.
+    The body is read through limited_stream, so uploads above max_bytes stop being received
+    as soon as the limit is crossed.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await read_form(request, max_bytes)
+        try:
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                raise HTTPException(status_code=400, detail="Missing 'file' field")
+            if not file.content_type or not file.content_type.startswith("image/"):
+                raise HTTPException(status_code=400, detail="File must be an image")
+            contents = await file.read()
+        finally:
+            await form.close()
+    elif content_type.startswith("image/") or content_type == "application/octet-stream":
+        contents = b"".join([chunk async for chunk in limited_stream(request, max_bytes)])
+    else:
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    if len(contents) == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    if len(contents) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {max_bytes} bytes limit")
+    return contents
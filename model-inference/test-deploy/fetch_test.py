@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# Import fetch stage from the Ray Serve application
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ray-deploy"))
+from fetcher import ImageFetcher, ImageTooLargeError
+
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "model-monitoring", "test", "input")
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    """Serves files from IMAGES_DIR, /slow/<file> waits before responding"""
+
+    def do_GET(self):
+        if self.path.startswith("/slow/"):
+            time.sleep(2)
+            self.path = self.path[len("/slow"):]
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """Start local HTTP stand-in server on a free port"""
+    handler = partial(SlowHandler, directory=IMAGES_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def main():
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    images = sorted(os.listdir(IMAGES_DIR))
+
+    # Fetch every test image through one pooled session
+    fetcher = ImageFetcher(timeout_s=1.0)
+    for name in images:
+        image, timings = await fetcher.fetch(f"{base_url}/{name}")
+        print(f"✅ {name}: {image.shape[1]}x{image.shape[0]} | "
+              f"fetch {timings['fetch']:.1f}ms | decode {timings['decode']:.1f}ms")
+
+    # Slow origin must hit the timeout
+    try:
+        await fetcher.fetch(f"{base_url}/slow/{images[0]}")
+        print("❌ Slow origin did not time out")
+    except asyncio.TimeoutError:
+        print("✅ Slow origin timed out")
+    await fetcher.close()
+
+    # Size limit must reject the download
+    small_fetcher = ImageFetcher(max_bytes=1024)
+    try:
+        await small_fetcher.fetch(f"{base_url}/{images[0]}")
+        print("❌ Size limit was not enforced")
+    except ImageTooLargeError as e:
+        print(f"✅ Size limit enforced: {e}")
+    await small_fetcher.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -26,6 +26,12 @@ class ClickHouseClient:
             logger.error(f"ClickHouse connection error: {e}")
             return False
     
+    def _imgsz_filter(self) -> str:
+        """Restricts analysis to one inference resolution (adaptive resolution mixes them under load)"""
+        if not Config.DRIFT_IMGSZ:
+            return ""
+        return f" AND SpanAttributes['imgsz'] = '{int(Config.DRIFT_IMGSZ)}'"
+    
     def get_yolo_predictions_data(self, hours_ago: int = None, limit: int = None) -> pd.DataFrame:
         """
         Extract YOLO prediction data from otel_traces
@@ -44,11 +50,12 @@ class ClickHouseClient:
             SpanAttributes['processing_time_seconds'] as processing_time,
             SpanAttributes['filename'] as filename,
             SpanAttributes['model_name'] as model_name,
+            SpanAttributes['imgsz'] as imgsz,
             arrayJoin(Events.Attributes)['class_name'] as class_name,
             arrayJoin(Events.Attributes)['confidence'] as confidence,
             arrayJoin(Events.Attributes)['object_index'] as object_index
         FROM {table_name}
-        WHERE SpanName = 'yolo_prediction'
+        WHERE SpanName = 'yolo_prediction'{self._imgsz_filter()}
         """
         
         # Add time condition if specified
@@ -68,7 +75,7 @@ class ClickHouseClient:
             # Create DataFrame
             columns = [
                 'timestamp', 'prediction_id', 'processing_time', 
-                'filename', 'model_name', 'class_name', 'confidence', 'object_index'
+                'filename', 'model_name', 'imgsz', 'class_name', 'confidence', 'object_index'
             ]
             
             df = pd.DataFrame(result, columns=columns)
@@ -97,11 +104,12 @@ class ClickHouseClient:
             SpanAttributes['processing_time_seconds'] as processing_time,
             SpanAttributes['filename'] as filename,
             SpanAttributes['model_name'] as model_name,
+            SpanAttributes['imgsz'] as imgsz,
             arrayJoin(Events.Attributes)['class_name'] as class_name,
             arrayJoin(Events.Attributes)['confidence'] as confidence,
             arrayJoin(Events.Attributes)['object_index'] as object_index
         FROM {table_name}
-        WHERE SpanName = 'yolo_prediction'
+        WHERE SpanName = 'yolo_prediction'{self._imgsz_filter()}
         ORDER BY Timestamp DESC
         """
         
@@ -111,7 +119,7 @@ class ClickHouseClient:
             # Create DataFrame
             columns = [
                 'timestamp', 'prediction_id', 'processing_time', 
-                'filename', 'model_name', 'class_name', 'confidence', 'object_index'
+                'filename', 'model_name', 'imgsz', 'class_name', 'confidence', 'object_index'
             ]
             
             df = pd.DataFrame(result, columns=columns)
@@ -149,11 +157,12 @@ class ClickHouseClient:
             SpanAttributes['processing_time_seconds'] as processing_time,
             SpanAttributes['filename'] as filename,
             SpanAttributes['model_name'] as model_name,
+            SpanAttributes['imgsz'] as imgsz,
             arrayJoin(Events.Attributes)['class_name'] as class_name,
             arrayJoin(Events.Attributes)['confidence'] as confidence,
             arrayJoin(Events.Attributes)['object_index'] as object_index
         FROM {table_name}
-        WHERE SpanName = 'yolo_prediction'
+        WHERE SpanName = 'yolo_prediction'{self._imgsz_filter()}
           AND Timestamp >= now() - INTERVAL {Config.CURRENT_DAYS_AGO} DAY
         ORDER BY Timestamp DESC
         """
@@ -164,7 +173,7 @@ class ClickHouseClient:
             # Create DataFrame
             columns = [
                 'timestamp', 'prediction_id', 'processing_time', 
-                'filename', 'model_name', 'class_name', 'confidence', 'object_index'
+                'filename', 'model_name', 'imgsz', 'class_name', 'confidence', 'object_index'
             ]
             
             df = pd.DataFrame(result, columns=columns)
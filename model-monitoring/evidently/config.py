@@ -28,6 +28,8 @@ class Config:
     
     # Drift analysis configuration
     REFERENCE_DATASET_ID = os.getenv('REFERENCE_DATASET_ID', '')
+    # Only predictions made at this inference resolution (empty = all resolutions)
+    DRIFT_IMGSZ = os.getenv('DRIFT_IMGSZ', '')
 
     @classmethod
     def validate(cls) -> list:
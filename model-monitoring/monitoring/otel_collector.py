@@ -3,8 +3,11 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 import logging
 
-from opentelemetry import trace
+from opentelemetry import metrics, trace
+from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.sdk.resources import Resource
@@ -14,7 +17,7 @@ logger = logging.getLogger(__name__)
 class YOLOOpenTelemetryCollector:
     """
     OpenTelemetry collector for YOLO predictions.
-    Records only spans with data about each prediction.
+    Records spans with data about each prediction and service metrics.
     """
     
     def __init__(self, 
@@ -43,8 +46,9 @@ class YOLOOpenTelemetryCollector:
             # Batch span processor
             span_processor = BatchSpanProcessor(
                 span_exporter,
-                max_queue_size=256,
-                max_export_batch_size=32,
+                # Up to ~10 stage spans per prediction
+                max_queue_size=2048,
+                max_export_batch_size=256,
                 export_timeout_millis=3000,
                 schedule_delay_millis=1000
             )
@@ -57,6 +61,19 @@ class YOLOOpenTelemetryCollector:
         except Exception as e:
             print(f"❌ OpenTelemetry failed: {e}")
             self.tracer = None
+        
+        try:
+            # Configure meter provider with periodic OTLP export
+            metric_reader = PeriodicExportingMetricReader(
+                OTLPMetricExporter(endpoint=f"{otel_endpoint}/v1/metrics"),
+                export_interval_millis=10000
+            )
+            metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[metric_reader]))
+            self.meter = metrics.get_meter(__name__)
+            
+        except Exception as e:
+            print(f"❌ OpenTelemetry metrics failed: {e}")
+            self.meter = None
     
     async def record_prediction(self, 
                                image: Any,
@@ -64,9 +81,19 @@ class YOLOOpenTelemetryCollector:
                                processing_time_ms: float,
                                filename: str = "unknown",
                                model_name: str = "yolo11n",
-                               confidence_threshold: float = 0.90) -> Optional[str]:
+                               confidence_threshold: float = 0.90,
+                               image_shape: Optional[tuple] = None,
+                               cache_hit: bool = False,
+                               imgsz: int = 640,
+                               stages: Optional[Any] = None,
+                               attributes: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """
         Records prediction data in a span.
+        image_shape is used when the decoded image is not available (cached results).
+        imgsz is the inference resolution (it changes under load with adaptive resolution).
+        stages (StageTimings of the request) become child spans with their measured start and
+        end, and the span starts when the request did; recording itself is the telemetry span.
+        attributes are added to the span (e.g. batch id and position for /detect/batch).
         """
         
         if not self.tracer:
@@ -75,10 +102,14 @@ class YOLOOpenTelemetryCollector:
         prediction_id = str(uuid.uuid4())
         
         # Create span with prediction data
-        with self.tracer.start_as_current_span("yolo_prediction") as span:
+        start_time = stages.started_at_ns if stages is not None else None
+        with self.tracer.start_as_current_span("yolo_prediction", start_time=start_time) as span:
             try:
                 # Get image dimensions
-                height, width = image.shape[:2] if hasattr(image, 'shape') else (0, 0)
+                if hasattr(image, 'shape'):
+                    height, width = image.shape[:2]
+                else:
+                    height, width = image_shape[:2] if image_shape else (0, 0)
                 
                 # Set main attributes for the span
                 span.set_attributes({
@@ -89,24 +120,35 @@ class YOLOOpenTelemetryCollector:
                     "image_height": height,
                     "total_objects": len(detections),
                     "filename": filename,
-                    "model_name": model_name
+                    "model_name": model_name,
+                    "cache_hit": cache_hit,
+                    "imgsz": imgsz
                 })
+                if attributes:
+                    span.set_attributes(attributes)
+                
+                # Stages already measured by the request, as children of this span
+                if stages is not None:
+                    for name, start_ns, duration_ms in stages.stages:
+                        child = self.tracer.start_span(name, start_time=start_ns, attributes={"stage": name})
+                        child.end(end_time=start_ns + int(duration_ms * 1e6))
                 
-                # Add each object as an event to the span
-                for i, detection in enumerate(detections):
-                    bbox = detection.get('bbox', [0, 0, 0, 0])
-                    span.add_event(
-                        name="object_detected",
-                        attributes={
-                            "object_index": i,
-                            "class_name": detection.get('class_name', 'unknown'),
-                            "confidence": detection.get('confidence', 0.0),
-                            "bbox_x1": bbox[0],
-                            "bbox_y1": bbox[1],
-                            "bbox_x2": bbox[2],
-                            "bbox_y2": bbox[3]
-                        }
-                    )
+                with self.tracer.start_as_current_span("telemetry", attributes={"stage": "telemetry"}):
+                    # Add each object as an event to the span
+                    for i, detection in enumerate(detections):
+                        bbox = detection.get('bbox', [0, 0, 0, 0])
+                        span.add_event(
+                            name="object_detected",
+                            attributes={
+                                "object_index": i,
+                                "class_name": detection.get('class_name', 'unknown'),
+                                "confidence": detection.get('confidence', 0.0),
+                                "bbox_x1": bbox[0],
+                                "bbox_y1": bbox[1],
+                                "bbox_x2": bbox[2],
+                                "bbox_y2": bbox[3]
+                            }
+                        )
                 
                 print(f"📊 OTEL: {len(detections)} objects | {processing_time_ms:.0f}ms")
                 return prediction_id
@@ -122,6 +164,7 @@ class YOLOOpenTelemetryCollector:
         """
         return {
             "status": "initialized" if self.tracer else "failed",
+            "metrics": "initialized" if self.meter else "failed",
             "instance_id": self.instance_id
         }
     
@@ -132,5 +175,7 @@ class YOLOOpenTelemetryCollector:
         try:
             if self.tracer:
                 trace.get_tracer_provider().shutdown()
+            if self.meter:
+                metrics.get_meter_provider().shutdown()
         except Exception as e:
             logger.error(f"OTEL close error: {e}") 
\ No newline at end of file
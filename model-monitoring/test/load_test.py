@@ -0,0 +1,218 @@
+"""
+Load generator for the detection APIs.
+Closed loop: N workers, each sends its next request when the previous one has finished.
+Open loop: requests arrive as a Poisson process at --rate per second, whether or not earlier
+ones have finished; latency is measured from the scheduled arrival, so a slow server shows
+up as latency instead of as a lower request rate (no coordinated omission).
+All requests share one keep-alive connection pool.
+"""
+
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import mimetypes
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import numpy as np
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "input")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+def load_corpus(input_folder):
+    """(file name, bytes) of every image in the folder"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(input_folder, "*"))):
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            with open(path, "rb") as file:
+                corpus.append((os.path.basename(path), file.read()))
+    return corpus
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve_corpus(input_folder, host, port):
+    """Serves the corpus over HTTP for the URL API; returns the base URL"""
+    server = ThreadingHTTPServer(("0.0.0.0", port), partial(QuietHandler, directory=input_folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_address[1]}/"
+
+def local_ip():
+    """Address the server can reach this machine at (no packet is sent)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.connect(("10.255.255.255", 1))
+            return sock.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+class LoadTest:
+    def __init__(self, args, corpus, base_url=None):
+        self.args = args
+        self.corpus = corpus
+        self.base_url = base_url
+        self.results = []  # (sent offset s, latency ms, status, error)
+        self.dropped = 0
+        self.started_at = 0.0
+
+    async def send(self, session, scheduled_at):
+        """One request; latency counts from scheduled_at"""
+        name, contents = random.choice(self.corpus)
+        headers = {"Accept": self.args.accept} if self.args.accept else {}
+        if self.args.priority:
+            headers["X-Priority"] = self.args.priority
+        status, error = 0, None
+        try:
+            if self.args.target == "upload":
+                form = aiohttp.FormData()
+                form.add_field("file", contents, filename=name, content_type=mimetypes.guess_type(name)[0] or "image/jpeg")
+                request = session.post(f"{self.args.url}/detect", data=form, headers=headers)
+            else:
+                request = session.get(f"{self.args.url}/detect", params={"image_url": self.base_url + name}, headers=headers)
+            async with request as response:
+                await response.read()
+                status = response.status
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except aiohttp.ClientError as e:
+            error = type(e).__name__
+        latency_ms = (time.perf_counter() - scheduled_at) * 1000
+        self.results.append((scheduled_at - self.started_at, latency_ms, status, error))
+
+    async def closed_loop(self, session, end_at):
+        async def worker():
+            while time.perf_counter() < end_at:
+                await self.send(session, time.perf_counter())
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def open_loop(self, session, end_at):
+        tasks = set()
+        next_at = time.perf_counter()
+        while next_at < end_at:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            if len(tasks) >= self.args.max_in_flight:
+                # Client-side limit: counted, so the report shows the generator fell behind
+                self.dropped += 1
+            else:
+                task = asyncio.create_task(self.send(session, next_at))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_at += random.expovariate(self.args.rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def run(self):
+        connector = aiohttp.TCPConnector(limit=self.args.connections, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self.started_at = time.perf_counter()
+            end_at = self.started_at + self.args.warmup + self.args.duration
+            if self.args.mode == "closed":
+                await self.closed_loop(session, end_at)
+            else:
+                await self.open_loop(session, end_at)
+
+def summarize(rows, duration_s):
+    """Throughput, latency percentiles and error rate of a set of results"""
+    latencies = np.array([latency for _, latency, status, error in rows if error is None and 200 <= status < 300])
+    errors = sum(1 for _, _, status, error in rows if error is not None or not 200 <= status < 300)
+    summary = {
+        "requests": len(rows),
+        "ok": int(len(latencies)),
+        "errors": errors,
+        "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+        "throughput_rps": round(len(latencies) / duration_s, 2) if duration_s > 0 else 0.0,
+    }
+    for name, percentile in (("p50_ms", 50), ("p90_ms", 90), ("p99_ms", 99), ("max_ms", 100)):
+        summary[name] = round(float(np.percentile(latencies, percentile)), 2) if len(latencies) else None
+    return summary
+
+def report(test, args):
+    """Overall summary (after warm-up) and per-interval timeline"""
+    measured = [row for row in test.results if row[0] >= args.warmup]
+    summary = summarize(measured, args.duration)
+    summary["statuses"] = dict(Counter(str(error or status) for _, _, status, error in measured))
+    summary["dropped"] = test.dropped
+
+    timeline = []
+    for start in np.arange(args.warmup, args.warmup + args.duration, args.interval):
+        window = [row for row in measured if start <= row[0] < start + args.interval]
+        timeline.append({"t_s": round(float(start - args.warmup), 3), **summarize(window, args.interval)})
+    return summary, timeline
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the detection APIs")
+    parser.add_argument("--target", choices=["upload", "url"], default="upload",
+                        help="upload: POST /detect with a file (FastAPI), url: GET /detect?image_url= (Ray Serve)")
+    parser.add_argument("--url", default=None, help="API base URL (default: :30080 for upload, :8000 for url)")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="Closed loop or Poisson open loop")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop: concurrent workers")
+    parser.add_argument("--rate", type=float, default=10.0, help="Open loop: mean arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=512, help="Open loop: requests beyond this are dropped")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds excluded from the results")
+    parser.add_argument("--interval", type=float, default=1.0, help="Timeline interval in seconds")
+    parser.add_argument("--connections", type=int, default=64, help="Keep-alive connection pool size")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Folder with the image corpus")
+    parser.add_argument("--image-base-url", default=None,
+                        help="url target: where the server can download the corpus (default: served by this tool)")
+    parser.add_argument("--serve-port", type=int, default=0, help="Port of the built-in corpus server (0 = any)")
+    parser.add_argument("--accept", default=None, help="Accept header (e.g. application/msgpack)")
+    parser.add_argument("--priority", default=None, help="X-Priority header (e.g. bulk)")
+    parser.add_argument("--output", default=None, help="JSON file with summary and timeline")
+    parser.add_argument("--csv", default=None, help="CSV file with the timeline")
+    args = parser.parse_args()
+    args.url = (args.url or ("http://localhost:30080" if args.target == "upload" else "http://localhost:8000")).rstrip("/")
+
+    corpus = load_corpus(args.input)
+    if not corpus:
+        print(f"❌ No images found in '{args.input}'")
+        sys.exit(1)
+
+    base_url = None
+    if args.target == "url":
+        base_url = args.image_base_url or serve_corpus(args.input, local_ip(), args.serve_port)
+        base_url = base_url.rstrip("/") + "/"
+        print(f"🌐 Corpus served at {base_url}")
+
+    load = f"{args.concurrency} workers" if args.mode == "closed" else f"{args.rate}/s Poisson arrivals"
+    print(f"🚀 {args.target} API at {args.url} | {args.mode} loop, {load} | "
+          f"{len(corpus)} images | {args.warmup:.0f}s warm-up + {args.duration:.0f}s")
+    test = LoadTest(args, corpus, base_url)
+    asyncio.run(test.run())
+    summary, timeline = report(test, args)
+
+    print(f"\n{'t s':>6} | {'req/s':>7} | {'p50 ms':>8} | {'p90 ms':>8} | {'p99 ms':>8} | {'max ms':>8} | {'errors':>7}")
+    print("-" * 70)
+    for row in timeline:
+        p50, p90, p99, p100 = (f"{row[key]:.1f}" if row[key] is not None else "-" for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms"))
+        print(f"{row['t_s']:>6.1f} | {row['throughput_rps']:>7.1f} | {p50:>8} | {p90:>8} | {p99:>8} | {p100:>8} | {row['error_rate']:>7.1%}")
+    print(f"\n📊 {summary['ok']}/{summary['requests']} ok, {summary['throughput_rps']} req/s | "
+          f"p50 {summary['p50_ms']} ms | p90 {summary['p90_ms']} ms | p99 {summary['p99_ms']} ms | max {summary['max_ms']} ms")
+    print(f"   Statuses: {summary['statuses']}" + (f" | dropped by client: {summary['dropped']}" if summary["dropped"] else ""))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"config": vars(args), "summary": summary, "timeline": timeline}, file, indent=2)
+        print(f"📄 Results saved: {args.output}")
+    if args.csv:
+        with open(args.csv, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(timeline[0].keys()) if timeline else ["t_s"])
+            writer.writeheader()
+            writer.writerows(timeline)
+        print(f"📄 Timeline saved: {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import websockets
+
+STREAM_URL = "ws://localhost:30080/detect/stream"
+
+def read_frames(source):
+    """Frames from a video file or from the images of a folder (sorted by name)"""
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*"))):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+
+    capture = cv2.VideoCapture(source)
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield frame
+    capture.release()
+
+async def stream(source, detect_every=5):
+    """Sends JPEG frames over one connection and prints the per-frame results"""
+    url = f"{STREAM_URL}?detect_every={detect_every}&precision=1"
+    start_time = time.time()
+    async with websockets.connect(url, max_size=None) as websocket:
+        for frame in read_frames(source):
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if not ok:
+                continue
+            await websocket.send(encoded.tobytes())
+            result = json.loads(await websocket.recv())
+            if not result.get("success"):
+                print(f"❌ Frame {result.get('frame')}: {result.get('error')}")
+                continue
+            objects = ", ".join(f"{d['class_name']}#{d['track_id']}" for d in result["detections"])
+            print(f"🎞️ Frame {result['frame']:>5} | {result['mode']:>8} | "
+                  f"{result['processing_time_ms']:>7.1f} ms | {objects}")
+
+        await websocket.send("stats")
+        stats = json.loads(await websocket.recv())
+
+    elapsed = time.time() - start_time
+    print(f"\n📊 {stats['frames']} frames in {elapsed:.1f}s ({stats['frames'] / max(elapsed, 1e-9):.1f} fps) | "
+          f"detected: {stats['detected']} | tracked: {stats['skipped']}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python test/stream_client.py <video file or frame folder> [detect_every]")
+        sys.exit(1)
+    asyncio.run(stream(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 5))
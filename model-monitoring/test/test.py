@@ -117,7 +117,8 @@ def detect_objects(image_path):
         # Send to API
         print(f"🔍 Sending image to API...")
         files = {'file': ('image.jpg', image_bytes, 'image/jpeg')}
-        response = requests.post(f"{API_URL}/detect", files=files)
+        # Folder scans are bulk traffic: they use idle capacity without slowing interactive calls
+        response = requests.post(f"{API_URL}/detect", files=files, headers={"X-Priority": "bulk"})
         
         if response.status_code == 200:
             data = response.json()
@@ -1,22 +1,40 @@
+import asyncio
+import json
 import os
 import time
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, List, Optional
 
 import cv2
 import numpy as np
+import torch
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from ultralytics import YOLO
+from fastapi import Depends, FastAPI, File, UploadFile, HTTPException, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+
+from admission import AdmissionController, AdmissionRejectedError, DeadlineExceededError, check_deadline, parse_deadline
+from admission import parse_api_keys, parse_weights, request_priority
+from batch_upload import read_batch
+from buffer_pool import BufferPool, PooledPreprocessor
+from decoding import ImageDecoder, rescale_columns
+from executor import BoundedExecutor, ExecutorOverloadedError
+from postprocess import model_stages, result_columns, to_records
+# Model (already loaded in the gunicorn master when running with gunicorn.conf.py)
+from preload import INFERENCE_BACKEND, MODEL_NAME, MODEL_WEIGHTS, model
+from resolution import ResolutionPolicy, combine_bounds, parse_client_bounds, parse_resolutions
+from responses import detect_response, encode, negotiate_format, server_timing
+from result_cache import ResultCache, cache_key
+from stage_timing import StageMetrics, StageTimings
+from streaming import StreamMetrics, StreamSession
+from tiling import crop_tiles, merge_tiles, tile_grid
+from warmup import ReadinessState, parse_shapes, warm_up
 
 # OpenTelemetry monitoring
 from monitoring.otel_collector import YOLOOpenTelemetryCollector
 
+PROCESS_START = time.perf_counter()
 app = FastAPI(title="YOLO11 Detection API", version="3.0.0")
 
-# Model
-MODEL_NAME = "yolo11n"
-model = YOLO(f"{MODEL_NAME}.pt")
-
 # OpenTelemetry collector
 try:
     otel_collector = YOLOOpenTelemetryCollector()
@@ -25,84 +43,670 @@ except Exception as e:
     print(f"❌ OpenTelemetry failed: {e}")
     otel_collector = None
 
+# Bounded executors: decoding and inference never run on the event loop
+meter = otel_collector.meter if otel_collector else None
+decode_executor = BoundedExecutor(
+    "decode",
+    max_workers=int(os.getenv("DECODE_WORKERS", "2")),
+    max_queue_size=int(os.getenv("DECODE_MAX_QUEUE", "32")),
+    meter=meter
+)
+inference_executor = BoundedExecutor(
+    "inference",
+    max_workers=int(os.getenv("INFERENCE_WORKERS", "1")),
+    max_queue_size=int(os.getenv("INFERENCE_MAX_QUEUE", "8")),
+    meter=meter
+)
+
+# JPEG uploads much larger than the inference size are decoded at 1/2, 1/4 or 1/8 scale
+# (DCT-domain downscaling); boxes are scaled back to the original image
+DECODE_REDUCED = os.getenv("DECODE_REDUCED", "true").lower() == "true"
+decoder = ImageDecoder(
+    os.getenv("DECODER_BACKEND", "opencv"),
+    max_factor=int(os.getenv("DECODE_REDUCED_MAX_FACTOR", "8"))
+)
+
+# Letterbox/normalize into reusable buffers instead of ultralytics preprocessing
+preprocessor = None
+if os.getenv("PREPROCESS_POOL_ENABLED", "true").lower() == "true":
+    # Rectangular letterbox like ultralytics, except for static-shape TorchScript exports
+    preprocessor = PooledPreprocessor(
+        640,
+        BufferPool(int(os.getenv("PREPROCESS_POOL_MAX_IDLE", "4"))),
+        rect=INFERENCE_BACKEND != "torchscript"
+    )
+preprocessors = {640: preprocessor}
+
+# Detection result cache keyed by image content, model and inference parameters
+INFERENCE_PARAMS = {"imgsz": 640, "backend": INFERENCE_BACKEND}
+result_cache = None
+if os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true":
+    result_cache = ResultCache(
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000")),
+        max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl_s=float(os.getenv("RESULT_CACHE_TTL_S", "3600")),
+        meter=meter
+    )
+
+# Warm-up: synthetic inference at typical upload shapes before /health reports healthy
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_SHAPES = os.getenv("WARMUP_SHAPES", "1280x720,720x1280,640x640")
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "2"))
+readiness = ReadinessState(meter, started_at=PROCESS_START)
+
+# Tiled inference for high-resolution images (enabled per request with ?tiled=true)
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "16"))
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", "8"))
+TILE_INCLUDE_FULL = os.getenv("TILE_INCLUDE_FULL", "true").lower() == "true"
+TILE_NMS_THRESHOLD = float(os.getenv("TILE_NMS_THRESHOLD", "0.5"))
+
+# Admission control: bounded in-flight and queued requests, client deadlines
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Timeout-Ms")
+DEFAULT_DEADLINE_MS = float(os.getenv("DEFAULT_DEADLINE_MS", "0"))
+# Priority classes (header or API key) share the slots by weighted fair queuing;
+# the first class is latency-sensitive and the others may add at most PRIORITY_BULK_MAX_DELAY_MS to it
+PRIORITY_HEADER = os.getenv("PRIORITY_HEADER", "X-Priority")
+API_KEY_HEADER = os.getenv("API_KEY_HEADER", "X-API-Key")
+PRIORITY_WEIGHTS = parse_weights(os.getenv("PRIORITY_WEIGHTS", "interactive:8,bulk:1"))
+PRIORITY_API_KEYS = parse_api_keys(os.getenv("PRIORITY_API_KEYS", ""))
+PRIORITY_DEFAULT = os.getenv("PRIORITY_DEFAULT") or next(iter(PRIORITY_WEIGHTS))
+admission = AdmissionController(
+    "api",
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+    weights=PRIORITY_WEIGHTS,
+    background_delay_ms=float(os.getenv("PRIORITY_BULK_MAX_DELAY_MS", "50")),
+    meter=meter
+)
+
+# Load-adaptive resolution: steps down (e.g. 640 -> 480 -> 320) when the admission queue or latency grows.
+# TorchScript exports have a static input size, so they always run at 640.
+ADAPTIVE_RESOLUTION = os.getenv("ADAPTIVE_RESOLUTION", "false").lower() == "true" and INFERENCE_BACKEND != "torchscript"
+ADAPTIVE_CLIENT_BOUNDS = parse_client_bounds(os.getenv("ADAPTIVE_CLIENT_BOUNDS", ""))
+resolution = ResolutionPolicy(
+    parse_resolutions(os.getenv("ADAPTIVE_RESOLUTIONS", "640,480,320")) if ADAPTIVE_RESOLUTION else [640],
+    queue_high=float(os.getenv("ADAPTIVE_QUEUE_HIGH", "4")),
+    latency_target_ms=float(os.getenv("ADAPTIVE_LATENCY_TARGET_MS", "500")),
+    enabled=ADAPTIVE_RESOLUTION,
+    meter=meter
+)
+
+# Streaming: per connection, detection every STREAM_DETECT_EVERY frames or on scene change,
+# boxes are propagated by optical flow in between
+STREAM_DETECT_EVERY = int(os.getenv("STREAM_DETECT_EVERY", "5"))
+STREAM_SCENE_THRESHOLD = float(os.getenv("STREAM_SCENE_THRESHOLD", "0.08"))
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "16"))
+STREAM_TELEMETRY = os.getenv("STREAM_TELEMETRY", "true").lower() == "true"
+# Keyframes go through admission like requests: in STREAM_PRIORITY (last class by default, so streams
+# fill idle capacity) unless the connection's API key or priority header says otherwise, and shed to
+# tracked boxes when no slot is free within STREAM_KEYFRAME_DEADLINE_MS
+STREAM_PRIORITY = os.getenv("STREAM_PRIORITY") or list(PRIORITY_WEIGHTS)[-1]
+STREAM_KEYFRAME_DEADLINE_MS = float(os.getenv("STREAM_KEYFRAME_DEADLINE_MS", "250"))
+if STREAM_PRIORITY not in PRIORITY_WEIGHTS:
+    raise ValueError(f"STREAM_PRIORITY '{STREAM_PRIORITY}' is not one of {', '.join(PRIORITY_WEIGHTS)}")
+stream_metrics = StreamMetrics(meter)
+
+# Per-stage timing of /detect: always in the yolo_stage_ms histogram, optionally as the
+# Server-Timing header and as child spans of yolo_prediction
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+STAGE_SPANS_ENABLED = os.getenv("STAGE_SPANS_ENABLED", "true").lower() == "true"
+stage_metrics = StageMetrics(meter)
+
+# Batch endpoint: many images (or a zip/tar archive) per request, decoded concurrently
+# and run through the model in batches of BATCH_INFERENCE_SIZE
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "64"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(256 * 1024 * 1024)))
+BATCH_INFERENCE_SIZE = int(os.getenv("BATCH_INFERENCE_SIZE", "8"))
+# Decodes of one batch in flight at once, so a large batch does not fill the shared decode queue
+BATCH_DECODE_CONCURRENCY = int(os.getenv("BATCH_DECODE_CONCURRENCY", os.getenv("DECODE_WORKERS", "2")))
+
+def decode_image(contents: bytes) -> np.ndarray:
+    """Decodes image bytes to BGR numpy array"""
+    nparr = np.frombuffer(contents, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def get_preprocessor(imgsz: int) -> PooledPreprocessor:
+    """One preprocessor per resolution, all sharing the same buffer pool"""
+    if imgsz not in preprocessors:
+        preprocessors[imgsz] = PooledPreprocessor(imgsz, preprocessor.pool, rect=preprocessor.rect)
+    return preprocessors[imgsz]
+
+def run_batch(images: List[np.ndarray], imgsz: int = 640, timings: Optional[StageTimings] = None) -> List[Dict[str, list]]:
+    """One forward pass; returns columnar detections (bbox, confidence, class_name) per image"""
+    start_ns = time.time_ns()
+    start_time = time.perf_counter()
+    if preprocessor is None:
+        model_start = start_time
+        results = model(images, imgsz=imgsz, verbose=False)
+        convert_start = time.perf_counter()
+        columns = [result_columns(result) for result in results]
+    else:
+        # Normalized BCHW tensor from pooled buffers: ultralytics skips its own preprocessing
+        with get_preprocessor(imgsz).batch(images) as (tensor, metas):
+            model_start = time.perf_counter()
+            results = model(torch.from_numpy(tensor), verbose=False)
+            convert_start = time.perf_counter()
+            columns = [result_columns(result, meta) for result, meta in zip(results, metas)]
+    
+    if timings is not None:
+        stages = model_stages(results, (convert_start - model_start) * 1000, (time.perf_counter() - convert_start) * 1000)
+        stages["preprocess"] += (model_start - start_time) * 1000
+        timings.add_sequence(start_ns, stages)
+    return columns
+
+def run_detection(image: np.ndarray, imgsz: int = 640, timings: Optional[StageTimings] = None) -> Dict[str, list]:
+    """Runs YOLO model on one image"""
+    return run_batch([image], imgsz, timings)[0]
+
+def timed_decode(contents: bytes, target_size: int, timings: StageTimings) -> tuple:
+    """Decode timed in the executor thread, without the wait for a free thread"""
+    with timings.measure("decode"):
+        return decoder.decode(contents, target_size)
+
+async def run_tiled_detection(image: np.ndarray,
+                              tiling: dict,
+                              imgsz: int = 640,
+                              timings: Optional[StageTimings] = None) -> Dict[str, list]:
+    """Overlapping tiles run in batches on the inference pool and are merged with cross-tile NMS"""
+    height, width = image.shape[:2]
+    grid = tile_grid(height, width, tiling["tile_size"], tiling["overlap"], tiling["max_tiles"])
+    tiles = crop_tiles(image, grid)
+    if TILE_INCLUDE_FULL and len(grid) > 1:
+        # Downscaled full frame keeps objects larger than a tile
+        grid.append((0, 0, width, height))
+        tiles.append(image)
+    
+    # Chunks run one after another: all inference threads share one model, and the ultralytics
+    # predictor serializes its calls, so parallel chunks would only hold more executor slots
+    tile_columns = []
+    for start in range(0, len(tiles), TILE_BATCH_SIZE):
+        tile_columns.extend(await inference_executor.run(run_batch, tiles[start:start + TILE_BATCH_SIZE], imgsz, timings))
+    if timings is None:
+        return merge_tiles(tile_columns, grid, TILE_NMS_THRESHOLD)
+    # Cross-tile NMS adds to the per-chunk NMS
+    with timings.measure("nms"):
+        return merge_tiles(tile_columns, grid, TILE_NMS_THRESHOLD)
+
+def tile_params(
+    tiled: bool = False,
+    tile_size: Optional[int] = Query(None, ge=128, le=4096),
+    tile_overlap: Optional[float] = Query(None, ge=0, le=0.75),
+    max_tiles: Optional[int] = Query(None, ge=1)
+) -> Optional[dict]:
+    """Per-request tiling options; max_tiles is capped by TILE_MAX_TILES"""
+    if not tiled:
+        return None
+    return {
+        "tile_size": tile_size or TILE_SIZE,
+        "overlap": TILE_OVERLAP if tile_overlap is None else tile_overlap,
+        "max_tiles": min(max_tiles or TILE_MAX_TILES, TILE_MAX_TILES)
+    }
+
+def resolution_bounds(
+    min_imgsz: Optional[int] = Query(None, ge=32, le=4096),
+    max_imgsz: Optional[int] = Query(None, ge=32, le=4096)
+) -> tuple:
+    """Per-request limits of the adaptive resolution"""
+    return min_imgsz, max_imgsz
+
+def warm_up_images(images) -> None:
+    # Every resolution the adaptive mode can pick is warmed up
+    for imgsz in resolution.resolutions:
+        for image in images:
+            run_detection(image, imgsz)
+
+async def run_warm_up():
+    """Runs in the inference executor, so it never overlaps with real inference"""
+    if not WARMUP_ENABLED:
+        readiness.mark_ready()
+        return
+    
+    try:
+        timings = await inference_executor.run(
+            warm_up, warm_up_images, parse_shapes(WARMUP_SHAPES), (1,), WARMUP_ROUNDS
+        )
+    except Exception as e:
+        # Stay unhealthy: the orchestrator restarts the container
+        print(f"❌ Warm-up failed: {e}")
+        readiness.mark_failed(e)
+        return
+    readiness.mark_ready(timings)
+    print(f"🔥 Warm-up: {timings}")
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected(request: Request, e: AdmissionRejectedError):
+    return JSONResponse(status_code=e.status_code, content={"detail": str(e)}, headers={"Retry-After": e.retry_after})
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Keep a reference so the task is not garbage collected
+    app.state.warmup_task = asyncio.create_task(run_warm_up())
+
 @app.get("/")
 async def root():
     return {
         "message": "YOLO11 Detection API",
         "model": MODEL_NAME,
         "monitoring": "OpenTelemetry → ClickHouse → Grafana",
-        "endpoints": ["/detect", "/health"]
+        "endpoints": ["/detect", "/detect/batch", "/detect/stream", "/health"]
     }
 
 @app.get("/health")
 async def health():
-    return {
-        "status": "healthy", 
-        "model": f"{MODEL_NAME}.pt",
-        "monitoring": "opentelemetry" if otel_collector else "disabled"
-    }
+    """503 until warm-up has completed, so traffic is only routed to a warm process"""
+    return JSONResponse(status_code=200 if readiness.ready else 503, content={
+        "status": "healthy" if readiness.ready else "warming_up",
+        "readiness": readiness.stats(),
+        "model": MODEL_WEIGHTS,
+        "backend": INFERENCE_BACKEND,
+        "pid": os.getpid(),
+        "monitoring": "opentelemetry" if otel_collector else "disabled",
+        "executors": {
+            "decode": decode_executor.stats(),
+            "inference": inference_executor.stats()
+        },
+        "admission": admission.stats(),
+        "resolution": resolution.stats(),
+        "stream_sessions": stream_metrics.sessions,
+        "result_cache": result_cache.stats() if result_cache else "disabled",
+        "buffer_pool": preprocessor.pool.stats() if preprocessor else "disabled",
+        "decoder": {**decoder.stats(), "reduced": DECODE_REDUCED}
+    })
+
+async def detect_image(contents: bytes,
+                       tiling: Optional[dict] = None,
+                       imgsz: int = 640,
+                       timings: Optional[StageTimings] = None) -> Dict[str, Any]:
+    """Decodes image and runs detection in bounded executors; stages are added to timings"""
+    timings = timings or StageTimings()
+    # Tiles need the full resolution
+    target_size = imgsz if DECODE_REDUCED and not tiling else 0
+    image, scale, shape = await decode_executor.run(timed_decode, contents, target_size, timings)
+    
+    if image is None:
+        raise HTTPException(status_code=400, detail="Invalid image format")
+    
+    # YOLO detection and results processing
+    if tiling:
+        detections = await run_tiled_detection(image, tiling, imgsz, timings)
+    else:
+        detections = await inference_executor.run(run_detection, image, imgsz, timings)
+    return {"detections": rescale_columns(detections, scale, shape), "image_shape": list(shape)}
+
+def request_policy(deadline_ms: Optional[str], priority_header: Optional[str], api_key: Optional[str]) -> tuple:
+    """(deadline, priority class) of a request from its headers"""
+    try:
+        deadline = parse_deadline(deadline_ms, DEFAULT_DEADLINE_MS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{DEADLINE_HEADER}: {e}")
+    try:
+        # The API key's class wins over the header
+        priority = request_priority(priority_header, api_key, PRIORITY_API_KEYS, PRIORITY_WEIGHTS, PRIORITY_DEFAULT)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{PRIORITY_HEADER}: {e}")
+    return deadline, priority
 
 @app.post("/detect")
-async def detect_objects(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def detect_objects(
+    file: UploadFile = File(...),
+    accept: Optional[str] = Header(None),
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+    priority_header: Optional[str] = Header(None, alias=PRIORITY_HEADER),
+    api_key: Optional[str] = Header(None, alias=API_KEY_HEADER),
+    precision: Optional[int] = Query(None, ge=0, le=6),
+    tiling: Optional[dict] = Depends(tile_params),
+    bounds: tuple = Depends(resolution_bounds)
+) -> Response:
     start_time = time.time()
+    first_request = readiness.first_request()
+    media_type = negotiate_format(accept)
+    deadline, priority = request_policy(deadline_ms, priority_header, api_key)
     
     # Validation
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    try:
-        # Load and decode image
-        contents = await file.read()
-        if len(contents) == 0:
-            raise HTTPException(status_code=400, detail="Empty file")
-        
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image format")
-        
-        # YOLO detection
-        results = model(image)[0]
-        processing_time = (time.time() - start_time) * 1000
-        
-        # Process results
-        detections = []
-        if results.boxes is not None:
-            boxes = results.boxes.xyxy.cpu().numpy()
-            confidences = results.boxes.conf.cpu().numpy()
-            class_ids = results.boxes.cls.cpu().numpy().astype(int)
+    timings = StageTimings()
+    # Over the limits or past the deadline the request is shed here with 429/503 + Retry-After
+    async with admission.admit(deadline, priority) as queue_ms:
+        timings.add("queue", queue_ms)
+        # Resolution from the current queue depth and latency, within the client's bounds
+        resolution.update(admission.queued, admission.service_ms)
+        imgsz = resolution.select(*combine_bounds(bounds, ADAPTIVE_CLIENT_BOUNDS.get(api_key, (None, None))))
+        try:
+            # Load and decode image
+            with timings.measure("read"):
+                contents = await file.read()
+            if len(contents) == 0:
+                raise HTTPException(status_code=400, detail="Empty file")
+            check_deadline(deadline, "inference")
             
-            for box, confidence, class_id in zip(boxes, confidences, class_ids):
-                x1, y1, x2, y2 = box
-                detections.append({
-                    "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                    "confidence": float(confidence),
-                    "class_name": model.names[class_id]
-                })
-        
-        # Write to ClickHouse via OpenTelemetry
-        if otel_collector:
+            # Identical images (also concurrent ones) are processed only once;
+            # requests served from the cache only report their own stages
+            if result_cache:
+                params = {**INFERENCE_PARAMS, "imgsz": imgsz}
+                if tiling:
+                    params["tiling"] = tiling
+                with timings.measure("cache"):
+                    key = cache_key(contents, MODEL_NAME, params)
+                result, cache_hit = await result_cache.get_or_compute(
+                    key, lambda: detect_image(contents, tiling, imgsz, timings)
+                )
+            else:
+                result, cache_hit = await detect_image(contents, tiling, imgsz, timings), False
+        except HTTPException:
+            raise
+        except DeadlineExceededError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except ExecutorOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+    
+    columns = result["detections"]
+    processing_time = (time.time() - start_time) * 1000
+    if first_request:
+        readiness.record_first_request_latency(processing_time)
+    
+    # Response (records JSON by default, columnar JSON or msgpack via Accept);
+    # encoded before the telemetry, so the serialize span is part of the trace
+    response = detect_response(columns, processing_time, media_type, precision)
+    response["imgsz"] = imgsz
+    with timings.measure("serialize"):
+        body = encode(response, media_type)
+    
+    # Write to ClickHouse via OpenTelemetry (outside the admission slot)
+    if otel_collector:
+        with timings.measure("telemetry"):
             try:
                 await otel_collector.record_prediction(
-                    image, detections, processing_time, 
-                    file.filename or "unknown", MODEL_NAME
+                    None, to_records(columns), processing_time, 
+                    file.filename or "unknown", MODEL_NAME,
+                    image_shape=tuple(result["image_shape"]),
+                    cache_hit=cache_hit,
+                    imgsz=imgsz,
+                    stages=timings if STAGE_SPANS_ENABLED else None
                 )
             except Exception:
                 pass  # Don't block API
-        
-        # Response
-        return {
-            "success": True,
-            "processing_time_ms": round(processing_time, 2),
-            "objects_detected": len(detections),
-            "detections": detections
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+    
+    stages = timings.as_dict()
+    stage_metrics.record(stages)
+    headers = {"Server-Timing": server_timing(stages)} if SERVER_TIMING_ENABLED else None
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def decode_batch_image(contents: bytes, target_size: int, timings: StageTimings, slots: asyncio.Semaphore) -> tuple:
+    """Decode of one batch image, at most BATCH_DECODE_CONCURRENCY of a batch at once"""
+    async with slots:
+        return await decode_executor.run(timed_decode, contents, target_size, timings)
+
+async def run_batch_detection(items: List[tuple], imgsz: int, timings: StageTimings) -> tuple:
+    """
+    Returns (results, per-image StageTimings) in upload order. Cached images skip decoding;
+    all other images are decoded concurrently and a model batch starts as soon as its images
+    are decoded. An image that cannot be decoded gets an error result instead of failing the batch.
+    """
+    results = [None] * len(items)
+    image_timings = [StageTimings() for _ in items]
+    for stages in image_timings:
+        # Image spans start with the batch
+        stages.started_at_ns = timings.started_at_ns
+    
+    keys, pending = [None] * len(items), []
+    params = {**INFERENCE_PARAMS, "imgsz": imgsz}
+    with timings.measure("cache"):
+        for index, (_, contents) in enumerate(items):
+            if result_cache:
+                keys[index] = cache_key(contents, MODEL_NAME, params)
+                cached = result_cache.lookup(keys[index])
+                if cached is not None:
+                    results[index] = {**cached, "cache_hit": True}
+                    continue
+            pending.append(index)
+    
+    slots = asyncio.Semaphore(BATCH_DECODE_CONCURRENCY)
+    target_size = imgsz if DECODE_REDUCED else 0
+    decodes = {
+        index: asyncio.ensure_future(decode_batch_image(items[index][1], target_size, image_timings[index], slots))
+        for index in pending
+    }
+    try:
+        for start in range(0, len(pending), BATCH_INFERENCE_SIZE):
+            chunk = []
+            for index in pending[start:start + BATCH_INFERENCE_SIZE]:
+                image, scale, shape = await decodes[index]
+                if image is None:
+                    results[index] = {"error": "Invalid image format"}
+                else:
+                    chunk.append((index, image, scale, shape))
+            if not chunk:
+                continue
+            
+            # Stages of the model batch are shared by its images
+            chunk_timings = StageTimings()
+            columns = await inference_executor.run(run_batch, [image for _, image, _, _ in chunk], imgsz, chunk_timings)
+            timings.stages.extend(chunk_timings.stages)
+            for (index, _, scale, shape), image_columns in zip(chunk, columns):
+                image_timings[index].stages.extend(chunk_timings.stages)
+                result = {"detections": rescale_columns(image_columns, scale, shape), "image_shape": list(shape)}
+                if result_cache:
+                    result_cache.put(keys[index], result)
+                results[index] = {**result, "cache_hit": False}
+    finally:
+        # After a failure the remaining decodes are not needed
+        for task in decodes.values():
+            task.cancel()
+    
+    # Decode work of the whole batch (decodes overlap, so it is more than their wall time)
+    timings.add("decode", sum(stages.as_dict().get("decode", 0.0) for stages in image_timings))
+    return results, image_timings
+
+@app.post("/detect/batch")
+async def detect_batch(
+    request: Request,
+    accept: Optional[str] = Header(None),
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+    priority_header: Optional[str] = Header(None, alias=PRIORITY_HEADER),
+    api_key: Optional[str] = Header(None, alias=API_KEY_HEADER),
+    precision: Optional[int] = Query(None, ge=0, le=6),
+    bounds: tuple = Depends(resolution_bounds)
+) -> Response:
+    """
+    Many images in one request: multipart 'files' fields (images or zip/tar archives) or a
+    zip/tar archive as the body. Returns one result per image in upload (archive) order,
+    with per-image and per-batch stage timings. The batch holds one admission slot while it
+    is decoded and detected; the upload is read before admission.
+    """
+    start_time = time.time()
+    media_type = negotiate_format(accept)
+    deadline, priority = request_policy(deadline_ms, priority_header, api_key)
+    batch_id = uuid.uuid4().hex[:12]
+    
+    timings = StageTimings()
+    # Upload and archive extraction happen before admission, so a slow client does not hold a slot
+    try:
+        with timings.measure("read"):
+            items = await read_batch(request, BATCH_MAX_IMAGES, BATCH_MAX_BYTES, decode_executor)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    async with admission.admit(deadline, priority) as queue_ms:
+        timings.add("queue", queue_ms)
+        resolution.update(admission.queued, admission.service_ms)
+        imgsz = resolution.select(*combine_bounds(bounds, ADAPTIVE_CLIENT_BOUNDS.get(api_key, (None, None))))
+        try:
+            check_deadline(deadline, "inference")
+            results, image_timings = await run_batch_detection(items, imgsz, timings)
+        except HTTPException:
+            raise
+        except DeadlineExceededError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except ExecutorOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+    
+    processing_time = (time.time() - start_time) * 1000
+    images = []
+    for (filename, _), result, stages in zip(items, results, image_timings):
+        if "error" in result:
+            images.append({"filename": filename, "success": False, "error": result["error"]})
+            continue
+        image_stages = stages.as_dict()
+        image = detect_response(result["detections"], sum(image_stages.values()), media_type, precision)
+        images.append({"filename": filename, **image, "cache_hit": result["cache_hit"], "timings_ms": image_stages})
+    
+    response = {
+        "success": True,
+        "batch_id": batch_id,
+        "images": len(items),
+        "processing_time_ms": round(processing_time, 2),
+        "imgsz": imgsz,
+        "timings_ms": timings.as_dict(),
+        "results": images,
+    }
+    with timings.measure("serialize"):
+        body = encode(response, media_type)
+    
+    # Every image is its own prediction in telemetry, tagged with its batch
+    if otel_collector:
+        with timings.measure("telemetry"):
+            for index, ((filename, _), result, stages) in enumerate(zip(items, results, image_timings)):
+                if "error" in result:
+                    continue
+                try:
+                    await otel_collector.record_prediction(
+                        None, to_records(result["detections"]), sum(stages.as_dict().values()),
+                        filename, MODEL_NAME,
+                        image_shape=tuple(result["image_shape"]),
+                        cache_hit=result["cache_hit"],
+                        imgsz=imgsz,
+                        stages=stages if STAGE_SPANS_ENABLED else None,
+                        attributes={
+                            "batch_id": batch_id,
+                            "batch_index": index,
+                            "batch_size": len(items),
+                            "batch_processing_time_ms": processing_time,
+                        }
+                    )
+                except Exception:
+                    pass  # Don't block API
+    
+    stages = timings.as_dict()
+    stage_metrics.record(stages, endpoint="batch")
+    headers = {"Server-Timing": server_timing(stages)} if SERVER_TIMING_ENABLED else None
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def decode_stream_frame(contents: bytes):
+    """Decoded frame plus the grayscale frame, scale and thumbnail used for tracking"""
+    image = decode_image(contents)
+    if image is None:
+        return None, None
+    return image, StreamSession.prepare(image)
+
+async def process_stream_frame(session: StreamSession, contents: bytes, precision: Optional[int], priority: str) -> dict:
+    """
+    Runs the model or propagates the tracked boxes for one frame. Keyframes take an admission
+    slot of the given priority class, like requests; rejected ones are shed to tracked boxes.
+    """
+    start_time = time.time()
+    image, prepared = await decode_executor.run(decode_stream_frame, contents)
+    if image is None:
+        return {"frame": session.frames, "success": False, "error": "Invalid image format"}
+    gray, scale, thumbnail = prepared
+    
+    reason = session.needs_detection(thumbnail)
+    mode, imgsz = "tracked", None
+    if reason:
+        deadline = parse_deadline(None, STREAM_KEYFRAME_DEADLINE_MS)
+        try:
+            async with admission.admit(deadline, priority):
+                resolution.update(admission.queued, admission.service_ms)
+                imgsz = resolution.select()
+                check_deadline(deadline, "inference")
+                columns = await inference_executor.run(run_detection, image, imgsz)
+            session.detected_frame(columns, gray, scale, thumbnail)
+            mode = "detected"
+        except (AdmissionRejectedError, DeadlineExceededError, ExecutorOverloadedError):
+            # Inference is saturated: keep the stream going on tracked boxes
+            mode = "shed"
+        except Exception as e:
+            return {"frame": session.frames, "success": False, "error": f"Detection failed: {str(e)}"}
+    if mode != "detected":
+        await decode_executor.run(session.tracked_frame, gray, scale)
+    
+    processing_time = (time.time() - start_time) * 1000
+    stream_metrics.record_frame(mode, reason, processing_time)
+    detections = session.detections(precision)
+    
+    # Only frames that ran the model are model predictions worth storing
+    if otel_collector and STREAM_TELEMETRY and mode == "detected":
+        try:
+            await otel_collector.record_prediction(
+                image, [{key: value for key, value in record.items() if key != "track_id"} for record in detections],
+                processing_time, f"stream:{session.session_id}:{session.frames - 1}", MODEL_NAME,
+                imgsz=imgsz
+            )
+        except Exception:
+            pass  # Don't block the stream
+    
+    return {
+        "frame": session.frames - 1,
+        "success": True,
+        "mode": mode,
+        "reason": reason or None,
+        "processing_time_ms": round(processing_time, 2),
+        "objects_detected": len(detections),
+        "detections": detections,
+    }
+
+@app.websocket("/detect/stream")
+async def detect_stream(
+    websocket: WebSocket,
+    detect_every: int = Query(STREAM_DETECT_EVERY, ge=1, le=300),
+    scene_threshold: float = Query(STREAM_SCENE_THRESHOLD, ge=0, le=1),
+    precision: Optional[int] = Query(None, ge=0, le=6)
+):
+    """
+    Frame sequence over one WebSocket: the client sends encoded frames (JPEG/PNG) as binary
+    messages and gets one JSON result per frame, in order. Detected frames run the model,
+    tracked frames carry the previous boxes moved by optical flow (with stable track_id).
+    A text message "stats" returns the session counters.
+    """
+    await websocket.accept()
+    try:
+        priority = request_priority(websocket.headers.get(PRIORITY_HEADER), websocket.headers.get(API_KEY_HEADER),
+                                    PRIORITY_API_KEYS, PRIORITY_WEIGHTS, STREAM_PRIORITY)
+    except ValueError as e:
+        # 1008: policy violation
+        await websocket.close(code=1008, reason=f"{PRIORITY_HEADER}: {e}")
+        return
+    if stream_metrics.sessions >= STREAM_MAX_SESSIONS:
+        # 1013: try again later
+        await websocket.close(code=1013, reason="Too many streaming sessions")
+        return
+    
+    stream_metrics.sessions += 1
+    session = StreamSession(uuid.uuid4().hex[:12], detect_every, scene_threshold)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                result = await process_stream_frame(session, message["bytes"], precision, priority)
+            elif message.get("text") == "stats":
+                result = {"session": session.session_id, **session.stats()}
+            else:
+                result = {"success": False, "error": "Send frames as binary messages or 'stats' as text"}
+            await websocket.send_text(json.dumps(result, separators=(",", ":")))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream_metrics.sessions -= 1
+        print(f"🎞️ Stream {session.session_id} closed: {session.stats()}")
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
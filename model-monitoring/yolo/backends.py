@@ -0,0 +1,86 @@
+import hashlib
+import os
+import shutil
+import uuid
+
+from ultralytics import YOLO
+
+BACKENDS = ("pytorch", "onnx", "openvino", "torchscript")
+
+# Export arguments per backend; dynamic shapes keep batched inference working
+EXPORT_ARGS = {
+    "onnx": {"format": "onnx", "dynamic": True, "simplify": True},
+    "openvino": {"format": "openvino", "dynamic": True},
+    "torchscript": {"format": "torchscript"},
+}
+
+EXPORTED_MARKER = ".exported"
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_model(weights: str, backend: str, imgsz: int, cache_dir: str) -> str:
+    """
+    Exports .pt weights to the backend format once and caches the result.
+    Cache entries are keyed by weights digest, backend and input size.
+    """
+    target_dir = os.path.join(cache_dir, f"{_file_digest(weights)[:16]}-{backend}-{imgsz}")
+    marker = os.path.join(target_dir, EXPORTED_MARKER)
+    if os.path.exists(marker):
+        with open(marker) as file:
+            return os.path.join(target_dir, file.read().strip())
+
+    print(f"📦 Exporting {os.path.basename(weights)} to {backend} (imgsz={imgsz})...")
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = f"{target_dir}.tmp-{uuid.uuid4().hex[:8]}"
+    try:
+        os.makedirs(tmp_dir)
+        tmp_weights = os.path.join(tmp_dir, "model.pt")
+        shutil.copyfile(weights, tmp_weights)
+
+        exported = YOLO(tmp_weights).export(imgsz=imgsz, **EXPORT_ARGS[backend])
+        exported_name = os.path.basename(str(exported).rstrip(os.sep))
+        with open(os.path.join(tmp_dir, EXPORTED_MARKER), "w") as file:
+            file.write(exported_name)
+
+        os.rename(tmp_dir, target_dir)
+    except OSError:
+        # Another process exported the same model first
+        if not os.path.exists(marker):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    with open(marker) as file:
+        return os.path.join(target_dir, file.read().strip())
+
+
+def load_model(weights: str, backend: str = "pytorch", imgsz: int = 640, cache_dir: str = ".export-cache") -> YOLO:
+    """
+    Loads YOLO model running on the selected backend.
+    Exported models are used through ultralytics, so detection results keep the same schema.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+    # Already exported model (e.g. INT8 OpenVINO from quantize_int8.py) is loaded as is
+    if not str(weights).endswith(".pt"):
+        print(f"✅ Using exported model: {weights}")
+        return YOLO(weights, task="detect")
+
+    model = YOLO(weights)
+    if backend == "pytorch":
+        return model
+
+    # Resolve actual weights file (names like 'yolo11n.pt' are downloaded by ultralytics)
+    weights_path = model.ckpt_path or weights
+    exported_path = export_model(weights_path, backend, imgsz, cache_dir)
+    print(f"✅ Using {backend} backend: {exported_path}")
+    return YOLO(exported_path, task="detect")
+
@@ -0,0 +1,146 @@
+import io
+import os
+import tarfile
+import zipfile
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from executor import BoundedExecutor
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+ARCHIVE_TYPES = (
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-gtar",
+)
+# Allowance per multipart part for its headers and boundary
+MULTIPART_PART_OVERHEAD = 4096
+
+
+def is_archive(filename: Optional[str], content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return content_type in ARCHIVE_TYPES or (filename or "").lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_image_member(name: str) -> bool:
+    """Image files of an archive, without hidden files and macOS resource forks"""
+    base = os.path.basename(name)
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not base.startswith(".") and "__MACOSX/" not in name
+
+
+def check_limits(count: int, size: int, max_images: int, max_bytes: int):
+    if count > max_images:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {max_images} images limit")
+    if size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {max_bytes} bytes limit")
+
+
+def extract_images(contents: bytes, max_images: int, max_bytes: int) -> List[Tuple[str, bytes]]:
+    """
+    (name, bytes) of the image members of a zip or (optionally compressed) tar archive, in
+    archive order. Limits are checked on the sizes in the archive index before anything is
+    extracted, so an archive expanding beyond max_bytes is rejected without inflating it.
+    """
+    if zipfile.is_zipfile(io.BytesIO(contents)):
+        try:
+            with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+                members = [info for info in archive.infolist() if not info.is_dir() and is_image_member(info.filename)]
+                check_limits(len(members), sum(info.file_size for info in members), max_images, max_bytes)
+                return [(info.filename, archive.read(info)) for info in members]
+        except zipfile.BadZipFile as e:
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+
+    try:
+        with tarfile.open(fileobj=io.BytesIO(contents), mode="r:*") as archive:
+            members = [member for member in archive.getmembers() if member.isfile() and is_image_member(member.name)]
+            check_limits(len(members), sum(member.size for member in members), max_images, max_bytes)
+            return [(member.name, archive.extractfile(member).read()) for member in members]
+    except tarfile.TarError:
+        raise HTTPException(status_code=400, detail="Archive must be a zip or tar file")
+
+
+async def limited_stream(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Request body chunks, rejected with 413 before reading when Content-Length is above
+    max_bytes, and as soon as the body grows beyond it otherwise (chunked uploads)
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes limit")
+
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes limit")
+        yield chunk
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """Whole request body, size-limited like limited_stream"""
+    return b"".join([chunk async for chunk in limited_stream(request, max_bytes)])
+
+
+async def read_form(request: Request, max_images: int, max_bytes: int) -> FormData:
+    """
+    Multipart form parsed from the size-limited body, so an oversized upload is rejected
+    before (or while) it is spooled rather than after
+    """
+    # Part headers and boundaries come on top of the image bytes
+    body_limit = max_bytes + max_images * MULTIPART_PART_OVERHEAD
+    parser = MultiPartParser(request.headers, limited_stream(request, body_limit), max_files=max_images)
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+async def read_batch(request: Request,
+                     max_images: int,
+                     max_bytes: int,
+                     executor: BoundedExecutor) -> List[Tuple[str, bytes]]:
+    """
+    (file name, bytes) of every image of a batch upload, in request order.
+    Accepts multipart 'files' (or 'file') fields, each an image or a zip/tar archive of images,
+    or a zip/tar archive as the raw body. Bodies above max_bytes are rejected while they are
+    received; image count and size are checked per file, archives from their index before
+    extraction. Archives are extracted in the executor.
+    """
+    content_type = request.headers.get("content-type", "")
+    items, size = [], 0
+    if content_type.startswith("multipart/form-data"):
+        form = await read_form(request, max_images, max_bytes)
+        try:
+            uploads = [upload for upload in form.getlist("files") + form.getlist("file") if not isinstance(upload, str)]
+            if not uploads:
+                raise HTTPException(status_code=400, detail="Missing 'files' field")
+            for upload in uploads:
+                contents = await upload.read()
+                if is_archive(upload.filename, upload.content_type):
+                    members = await executor.run(extract_images, contents, max_images - len(items), max_bytes - size)
+                    items.extend(members)
+                    size += sum(len(member) for _, member in members)
+                    continue
+                if not upload.content_type or not upload.content_type.startswith("image/"):
+                    raise HTTPException(status_code=400, detail=f"{upload.filename or 'File'} must be an image or an archive")
+                items.append((upload.filename or f"image_{len(items)}", contents))
+                size += len(contents)
+                check_limits(len(items), size, max_images, max_bytes)
+        finally:
+            await form.close()
+    elif is_archive(None, content_type):
+        contents = await read_body(request, max_bytes)
+        items = await executor.run(extract_images, contents, max_images, max_bytes)
+    else:
+        raise HTTPException(status_code=415, detail="Send images as multipart 'files' or a zip/tar archive")
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch contains no images")
+    return items
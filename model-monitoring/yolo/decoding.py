@@ -0,0 +1,151 @@
+import io
+import struct
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+DECODER_BACKENDS = ("opencv", "turbojpeg", "pillow")
+
+# DCT-domain downscaling: OpenCV flag per reduction factor
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Start-of-frame markers carry the image size (DHT 0xC4, JPG 0xC8 and DAC 0xCC share the range)
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(contents: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from the JPEG frame header without decoding; None for other formats"""
+    if contents[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    while offset + 4 <= len(contents):
+        if contents[offset] != 0xFF:
+            return None
+        marker = contents[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            offset += 2
+            continue
+        if marker in SOF_MARKERS:
+            if offset + 9 > len(contents):
+                return None
+            height, width = struct.unpack(">HH", contents[offset + 5:offset + 9])
+            return (width, height) if width and height else None
+        offset += 2 + struct.unpack(">H", contents[offset + 2:offset + 4])[0]
+    return None
+
+
+def reduction_factor(width: int, height: int, target_size: int, max_factor: int = 8) -> int:
+    """Largest DCT scale (1/2, 1/4, 1/8) that keeps the longest side at or above target_size"""
+    factor = 1
+    while factor < max_factor and max(width, height) // (factor * 2) >= target_size:
+        factor *= 2
+    return factor
+
+
+def rescale_columns(columns: Dict[str, list], scale: Tuple[float, float], shape: Tuple[int, int]) -> Dict[str, list]:
+    """Maps boxes detected on a reduced decode back to the original image ((x, y) scale, (height, width) shape)"""
+    if not columns["bbox"] or scale == (1.0, 1.0):
+        return columns
+    scale_x, scale_y = scale
+    height, width = shape
+    boxes = np.asarray(columns["bbox"], dtype=np.float32) * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return {**columns, "bbox": boxes.tolist()}
+
+
+class ImageDecoder:
+    """
+    Decodes uploads at the smallest size that still covers the inference resolution.
+    JPEGs at least twice as large as target_size are decoded with DCT-domain downscaling
+    (1/2, 1/4 or 1/8), which skips most of the IDCT and color conversion of a full decode;
+    the model would downscale the image to target_size anyway. Other formats, and every
+    image with target_size=0 (e.g. tiled requests), are decoded at full resolution.
+
+    Backends: opencv (IMREAD_REDUCED_COLOR_*), turbojpeg (libjpeg-turbo scaling factors,
+    PyTurboJPEG; no EXIF orientation) and pillow (draft mode).
+    """
+
+    def __init__(self, backend: str = "opencv", max_factor: int = 8):
+        if backend not in DECODER_BACKENDS:
+            raise ValueError(f"Unknown decoder backend '{backend}', expected one of {', '.join(DECODER_BACKENDS)}")
+        if max_factor not in REDUCED_FLAGS:
+            raise ValueError(f"Reduction factor must be one of {', '.join(map(str, REDUCED_FLAGS))}, got {max_factor}")
+        if backend == "turbojpeg" and TurboJPEG is None:
+            raise ImportError("turbojpeg backend requires PyTurboJPEG and libjpeg-turbo")
+        if backend == "pillow" and Image is None:
+            raise ImportError("pillow backend requires Pillow")
+
+        self.backend = backend
+        self.max_factor = max_factor
+        self._turbojpeg = TurboJPEG() if backend == "turbojpeg" else None
+        self._factors = Counter()
+
+    def decode(self, contents: bytes, target_size: int = 0) -> Tuple[Optional[np.ndarray], Tuple[float, float], Tuple[int, int]]:
+        """
+        Returns (image, scale, shape): the BGR image (None if the data cannot be decoded),
+        the (x, y) factors from decoded to original coordinates and the original (height, width).
+        """
+        size = jpeg_size(contents)
+        if size is None:
+            image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+            return image, (1.0, 1.0), image.shape[:2] if image is not None else (0, 0)
+
+        factor = reduction_factor(*size, target_size, self.max_factor) if target_size > 0 else 1
+        image = self._decode_jpeg(contents, factor)
+        if image is None:
+            return None, (1.0, 1.0), (0, 0)
+        self._factors[factor] += 1
+
+        height, width = image.shape[:2]
+        original_width, original_height = size
+        if (width > height) != (original_width > original_height):
+            # The decoder applied an EXIF rotation
+            original_width, original_height = original_height, original_width
+        return image, (original_width / width, original_height / height), (original_height, original_width)
+
+    def _decode_jpeg(self, contents: bytes, factor: int) -> Optional[np.ndarray]:
+        if self.backend == "turbojpeg":
+            try:
+                return self._turbojpeg.decode(contents, pixel_format=TJPF_BGR, scaling_factor=(1, factor))
+            except OSError:
+                return None
+
+        if self.backend == "pillow":
+            try:
+                with Image.open(io.BytesIO(contents)) as image:
+                    if factor > 1:
+                        # Picks the largest JPEG scale that keeps at least the requested size
+                        image.draft("RGB", (image.width // factor, image.height // factor))
+                    rgb = ImageOps.exif_transpose(image).convert("RGB")
+                    return cv2.cvtColor(np.asarray(rgb), cv2.COLOR_RGB2BGR)
+            except OSError:
+                return None
+
+        return cv2.imdecode(np.frombuffer(contents, np.uint8), REDUCED_FLAGS[factor])
+
+    def stats(self) -> dict:
+        """Decoded JPEGs per reduction factor"""
+        return {"backend": self.backend, "max_factor": self.max_factor, "jpeg_by_factor": dict(self._factors)}
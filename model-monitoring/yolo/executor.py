@@ -0,0 +1,96 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """Raised when the executor queue is full"""
+
+
+class BoundedExecutor:
+    """
+    Size-limited thread pool for blocking work (decoding, inference, post-processing).
+    Keeps the uvicorn event loop free and rejects work once the queue is full.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_workers: int = 1,
+                 max_queue_size: int = 16,
+                 meter: Optional[Any] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0
+        self._queue_wait = None
+        self._rejected = None
+
+        if meter is not None:
+            self._register_metrics(meter)
+
+    def _register_metrics(self, meter):
+        """Registers queue depth and wait time instruments on OpenTelemetry meter"""
+        from opentelemetry.metrics import Observation
+
+        attributes = {"pool": self.name}
+        meter.create_observable_gauge(
+            "yolo_executor_queue_depth",
+            callbacks=[lambda options: [Observation(self.queued, attributes)]],
+            description="Number of tasks waiting for a free worker",
+        )
+        meter.create_observable_gauge(
+            "yolo_executor_running_tasks",
+            callbacks=[lambda options: [Observation(self.running, attributes)]],
+            description="Number of tasks currently running in the pool",
+        )
+        self._queue_wait = meter.create_histogram(
+            "yolo_executor_queue_wait_ms",
+            unit="ms",
+            description="Time a task waited in the queue before running",
+        )
+        self._rejected = meter.create_counter(
+            "yolo_executor_rejected_tasks",
+            description="Number of tasks rejected because the queue was full",
+        )
+
+    @property
+    def running(self) -> int:
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queued(self) -> int:
+        return max(self._pending - self.max_workers, 0)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+        }
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run blocking function in the pool and await its result"""
+        if self._pending >= self.max_workers + self.max_queue_size:
+            if self._rejected:
+                self._rejected.add(1, {"pool": self.name})
+            raise ExecutorOverloadedError(f"{self.name} executor queue is full ({self.max_queue_size})")
+
+        submitted_at = time.perf_counter()
+
+        def timed_call():
+            if self._queue_wait:
+                self._queue_wait.record((time.perf_counter() - submitted_at) * 1000, {"pool": self.name})
+            return fn(*args)
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, timed_call)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,56 @@
+"""
+Production run mode: gunicorn with pre-forked uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py
+
+The master loads the model (preload.py) and forks WORKERS workers that share its weights
+copy-on-write. Only the model is loaded in the master: every worker imports app.py itself,
+so executors, caches, OpenTelemetry exporters and warm-up are per worker.
+"""
+
+import gc
+import os
+
+import torch
+
+
+def available_cpus() -> int:
+    """CPUs of this container: affinity mask, capped by the cgroup v2 CPU quota"""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+CPUS = available_cpus()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+wsgi_app = "app:app"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WORKERS", "0")) or max(1, CPUS // 2)
+# Intra-op threads per worker (0 = split the CPUs between the workers, so they do not oversubscribe)
+torch_threads = int(os.getenv("TORCH_THREADS_PER_WORKER", "0")) or max(1, CPUS // workers)
+# Warm-up runs per worker before it reports healthy
+timeout = int(os.getenv("WORKER_TIMEOUT_S", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+if os.getenv("PRELOAD_MODEL", "true").lower() == "true":
+    # Single-threaded master: parallel regions started before fork are not usable in the children
+    torch.set_num_threads(1)
+    import preload  # noqa: F401
+
+    # Objects alive now go to the permanent generation, so the workers' garbage
+    # collections do not write to (and un-share) the pages holding them
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    torch.set_num_threads(torch_threads)
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    server.log.info(f"Worker {worker.pid}: {torch_threads} torch threads ({CPUS} CPUs / {workers} workers)")
@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def empty_columns() -> Dict[str, list]:
+    return {"bbox": [], "confidence": [], "class_name": []}
+
+
+def scale_boxes(boxes: np.ndarray, meta: dict) -> np.ndarray:
+    """Map xyxy boxes from letterboxed coordinates back to the original image"""
+    pad_x, pad_y = meta["pad"]
+    height, width = meta["shape"]
+
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / meta["ratio"]).clip(0, width)
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / meta["ratio"]).clip(0, height)
+    return boxes
+
+
+def result_columns(result, meta: Optional[dict] = None) -> Dict[str, list]:
+    """
+    Converts ultralytics result to columnar detections (parallel arrays) in one pass:
+    a single device->host copy of the boxes tensor and one tolist() per column.
+    meta (from buffer_pool.letterbox_into) maps letterboxed boxes back to the original image.
+    """
+    if result.boxes is None or len(result.boxes) == 0:
+        return empty_columns()
+
+    # data columns: x1, y1, x2, y2, [track_id,] confidence, class
+    data = result.boxes.data.cpu().numpy()
+    boxes = data[:, :4]
+    if meta is not None:
+        boxes = scale_boxes(boxes, meta)
+
+    names = result.names
+    return {
+        "bbox": boxes.tolist(),
+        "confidence": data[:, -2].tolist(),
+        "class_name": [names[class_id] for class_id in data[:, -1].astype(int).tolist()],
+    }
+
+
+def round_columns(columns: Dict[str, list], precision: Optional[int]) -> Dict[str, list]:
+    """Rounds bbox and confidence columns to the given number of decimals"""
+    if precision is None or not columns["bbox"]:
+        return columns
+    return {
+        "bbox": np.round(np.asarray(columns["bbox"]), precision).tolist(),
+        "confidence": np.round(np.asarray(columns["confidence"]), precision).tolist(),
+        "class_name": columns["class_name"],
+    }
+
+
+def to_records(columns: Dict[str, list]) -> List[Dict]:
+    """Columnar detections -> [{"bbox", "confidence", "class_name"}, ...]"""
+    return [
+        {"bbox": bbox, "confidence": confidence, "class_name": class_name}
+        for bbox, confidence, class_name in zip(columns["bbox"], columns["confidence"], columns["class_name"])
+    ]
+
+
+def model_stages(results, model_ms: float, convert_ms: float = 0.0) -> Dict[str, float]:
+    """
+    Splits one ultralytics call (plus the conversion to columns) into preprocess, forward and NMS.
+    The predictor profiles each step itself (result.speed, per-image averages of the batch);
+    whatever the profile does not cover (Results objects, conversion) is counted as NMS.
+    """
+    speed = (getattr(results[0], "speed", None) or {}) if len(results) else {}
+    preprocess_ms = min((speed.get("preprocess") or 0.0) * len(results), model_ms)
+    forward_ms = min((speed.get("inference") or 0.0) * len(results), model_ms - preprocess_ms) if speed else model_ms
+    return {
+        "preprocess": preprocess_ms,
+        "forward": forward_ms,
+        "nms": model_ms - preprocess_ms - forward_ms + convert_ms,
+    }
@@ -0,0 +1,28 @@
+"""
+Model shared by all API processes.
+Imported by app.py; under gunicorn (gunicorn.conf.py) the master imports it before forking,
+so the workers inherit the loaded weights copy-on-write instead of loading their own copy.
+"""
+
+import os
+
+from backends import load_model
+
+# Model (exported once to the selected backend: pytorch, onnx, openvino or torchscript)
+MODEL_NAME = os.getenv("MODEL_NAME", "yolo11n")
+MODEL_WEIGHTS = os.getenv("MODEL_WEIGHTS", f"{MODEL_NAME}.pt")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+model = load_model(
+    MODEL_WEIGHTS,
+    backend=INFERENCE_BACKEND,
+    imgsz=640,
+    cache_dir=os.getenv("EXPORT_CACHE_DIR", ".export-cache")
+)
+
+if INFERENCE_BACKEND == "pytorch":
+    # ultralytics fuses Conv+BN on the first prediction; done once here, the fused weights
+    # are shared too instead of being rebuilt (and written) by every worker
+    try:
+        model.fuse()
+    except Exception as e:
+        print(f"⚠️ Conv+BN fusion skipped: {e}")
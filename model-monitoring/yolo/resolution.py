@@ -0,0 +1,105 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def parse_resolutions(spec: str) -> List[int]:
+    """'640,480,320' -> [640, 480, 320]: largest first, rounded to the 32 px model stride"""
+    sizes = {max(32, int(item) // 32 * 32) for item in spec.split(",") if item.strip()}
+    return sorted(sizes, reverse=True)
+
+
+def parse_client_bounds(spec: str) -> Dict[str, Tuple[int, int]]:
+    """'KEY_A:480-640,KEY_B:320-480' -> {"KEY_A": (480, 640), "KEY_B": (320, 480)}"""
+    bounds = {}
+    for item in spec.split(","):
+        if item.strip():
+            key, sizes = item.rsplit(":", 1)
+            low, high = sizes.split("-")
+            bounds[key.strip()] = (int(low), int(high))
+    return bounds
+
+
+def combine_bounds(*bounds: Tuple[Optional[int], Optional[int]]) -> Tuple[Optional[int], Optional[int]]:
+    """Intersection of (min_imgsz, max_imgsz) pairs, None meaning unbounded"""
+    lows = [low for low, _ in bounds if low is not None]
+    highs = [high for _, high in bounds if high is not None]
+    return (max(lows) if lows else None), (min(highs) if highs else None)
+
+
+class ResolutionPolicy:
+    """
+    Load-adaptive inference resolution.
+    Pressure is the larger of queue depth / queue_high and latency / latency_target_ms.
+    Every full unit of pressure steps one resolution down (640 -> 480 -> 320); it has to
+    drop hysteresis below the step before the resolution goes back up, so it does not flap.
+    Disabled, it always returns the largest resolution.
+    """
+
+    def __init__(self,
+                 resolutions: List[int],
+                 queue_high: float = 8,
+                 latency_target_ms: float = 500,
+                 hysteresis: float = 0.25,
+                 enabled: bool = True,
+                 meter: Optional[Any] = None):
+        self.resolutions = resolutions
+        self.queue_high = queue_high
+        self.latency_target_ms = latency_target_ms
+        self.hysteresis = hysteresis
+        self.enabled = enabled and len(resolutions) > 1
+        self.level = 0
+        self.last_pressure = 0.0
+
+        self._selected = None
+
+        if meter is not None:
+            self._register_metrics(meter)
+
+    def _register_metrics(self, meter):
+        """Registers per-resolution request counter and pressure gauge on OpenTelemetry meter"""
+        from opentelemetry.metrics import Observation
+
+        self._selected = meter.create_counter(
+            "yolo_inference_resolution_requests",
+            description="Requests served per inference resolution",
+        )
+        meter.create_observable_gauge(
+            "yolo_inference_resolution_pressure",
+            callbacks=[lambda options: [Observation(self.last_pressure)]],
+            description="Load pressure driving the adaptive resolution (1.0 = one step down)",
+        )
+
+    def pressure(self, queued: int, latency_ms: float) -> float:
+        return max(queued / max(self.queue_high, 1e-3), latency_ms / max(self.latency_target_ms, 1e-3))
+
+    def update(self, queued: int, latency_ms: float) -> int:
+        """Moves at most one step per call; returns the current resolution level"""
+        if not self.enabled:
+            return 0
+        self.last_pressure = self.pressure(queued, latency_ms)
+        if self.last_pressure >= self.level + 1 and self.level < len(self.resolutions) - 1:
+            self.level += 1
+        elif self.level > 0 and self.last_pressure < self.level - self.hysteresis:
+            self.level -= 1
+        return self.level
+
+    def select(self, min_imgsz: Optional[int] = None, max_imgsz: Optional[int] = None) -> int:
+        """Resolution of the current level, kept within the client's bounds"""
+        allowed = [
+            size for size in self.resolutions
+            if (min_imgsz is None or size >= min_imgsz) and (max_imgsz is None or size <= max_imgsz)
+        ] or self.resolutions
+        target = self.resolutions[self.level] if self.enabled else self.resolutions[0]
+        at_or_below = [size for size in allowed if size <= target]
+        imgsz = max(at_or_below) if at_or_below else min(allowed)
+        if self._selected:
+            self._selected.add(1, {"imgsz": imgsz})
+        return imgsz
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "resolutions": self.resolutions,
+            "imgsz": self.resolutions[self.level],
+            "pressure": round(self.last_pressure, 3),
+        }
+
@@ -0,0 +1,54 @@
+import json
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from postprocess import round_columns, to_records
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Response formats selected through the Accept header
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.yolo.columnar+json"
+MSGPACK = "application/msgpack"
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Picks response format from Accept header (records JSON by default)"""
+    accept = (accept or "").lower()
+    if "msgpack" in accept:
+        return MSGPACK
+    if COLUMNAR_JSON in accept:
+        return COLUMNAR_JSON
+    return JSON
+
+
+def encode(payload: dict, media_type: str) -> bytes:
+    """Serializes payload in the negotiated format"""
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="msgpack responses are not available")
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. 'decode;dur=3.21, forward;dur=41.50'"""
+    return ", ".join(f"{stage};dur={duration:.2f}" for stage, duration in timings.items())
+
+
+def detect_response(columns: Dict[str, list],
+                    processing_time_ms: float,
+                    media_type: str = JSON,
+                    precision: Optional[int] = None) -> dict:
+    """Response of POST /detect: records for JSON, parallel arrays for compact formats"""
+    columns = round_columns(columns, precision)
+    return {
+        "success": True,
+        "processing_time_ms": round(processing_time_ms, 2),
+        "objects_detected": len(columns["bbox"]),
+        "detections": to_records(columns) if media_type == JSON else columns,
+    }
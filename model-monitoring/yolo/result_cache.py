@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def cache_key(content: bytes, model_id: str, params: Optional[dict] = None) -> str:
+    """Content-addressed key: image bytes hash + model identity + inference parameters"""
+    digest = hashlib.sha256()
+    digest.update(content)
+    digest.update(model_id.encode())
+    digest.update(json.dumps(params or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+# Result of an in-flight future whose computing request was cancelled or failed
+_RETRY = object()
+
+
+class ResultCache:
+    """
+    LRU cache with TTL and memory cap for detection results.
+    Identical in-flight requests wait for a single computation (single-flight).
+    """
+
+    def __init__(self,
+                 max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl_s: float = 3600,
+                 meter: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if meter is not None:
+            self._register_metrics(meter)
+
+    def _register_metrics(self, meter):
+        """Registers cache counters on OpenTelemetry meter"""
+        from opentelemetry.metrics import Observation
+
+        for name in ("hits", "misses", "coalesced", "evictions", "expirations"):
+            meter.create_observable_counter(
+                f"yolo_result_cache_{name}",
+                callbacks=[lambda options, name=name: [Observation(getattr(self, name))]],
+                description=f"Detection result cache {name}",
+            )
+        meter.create_observable_gauge(
+            "yolo_result_cache_size_bytes",
+            callbacks=[lambda options: [Observation(self._size_bytes)]],
+            description="Approximate memory used by cached results",
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at, size = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def lookup(self, key: str) -> Optional[Any]:
+        """get() counted as a hit or miss, for callers that compute misses themselves (batches)"""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl_s, size)
+        self._size_bytes += size
+
+        while len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._size_bytes -= size
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Returns (value, cached). Runs compute() only once for identical concurrent keys,
+        other callers wait for its result. If the computing request is cancelled or fails,
+        the waiters are not failed with it: one of them takes over with its own compute().
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value, True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            value = await asyncio.shield(inflight)
+            if value is not _RETRY:
+                return value, True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except BaseException:
+            # Cancellation (e.g. client disconnect) or failure of this request only
+            self._inflight.pop(key, None)
+            future.set_result(_RETRY)
+            raise
+
+        self._inflight.pop(key, None)
+        self.put(key, value)
+        future.set_result(value)
+        return value, False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._size_bytes,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
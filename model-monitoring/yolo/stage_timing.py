@@ -0,0 +1,66 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class StageTimings:
+    """
+    Stages of one request (read, decode, preprocess, forward, nms, serialize, telemetry).
+    Every stage keeps its wall-clock start, so the collector can recreate them as child spans
+    of yolo_prediction after the fact; durations use perf_counter.
+    """
+
+    def __init__(self):
+        self.started_at_ns = time.time_ns()
+        self.stages: List[Tuple[str, int, float]] = []  # (name, start ns, duration ms)
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        start_ns = time.time_ns()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, start_ns, (time.perf_counter() - start_time) * 1000))
+
+    def add(self, name: str, duration_ms: float, start_ns: Optional[int] = None):
+        """Stage measured elsewhere; without start_ns it ended just now"""
+        if start_ns is None:
+            start_ns = time.time_ns() - int(duration_ms * 1e6)
+        self.stages.append((name, start_ns, duration_ms))
+
+    def add_sequence(self, start_ns: int, durations: Dict[str, float]):
+        """Consecutive stages starting at start_ns (e.g. preprocess -> forward -> nms of one batch)"""
+        for name, duration_ms in durations.items():
+            self.stages.append((name, start_ns, duration_ms))
+            start_ns += int(duration_ms * 1e6)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage in first-seen order; repeated stages (tile chunks) are summed"""
+        totals: Dict[str, float] = {}
+        for name, _, duration_ms in self.stages:
+            totals[name] = totals.get(name, 0.0) + duration_ms
+        return {name: round(duration_ms, 2) for name, duration_ms in totals.items()}
+
+
+class StageMetrics:
+    """Per-stage latency histogram of /detect and /detect/batch"""
+
+    def __init__(self, meter: Optional[Any] = None):
+        self._stage_latency = None
+
+        if meter is not None:
+            self._register_metrics(meter)
+
+    def _register_metrics(self, meter):
+        """Registers stage latency histogram on OpenTelemetry meter"""
+        self._stage_latency = meter.create_histogram(
+            "yolo_stage_ms",
+            unit="ms",
+            description="Time spent in each request stage (queue, read, cache, decode, preprocess, forward, nms, serialize, telemetry)",
+        )
+
+    def record(self, timings: Dict[str, float], endpoint: str = "detect"):
+        if self._stage_latency:
+            for stage, duration_ms in timings.items():
+                self._stage_latency.record(duration_ms, {"stage": stage, "endpoint": endpoint})
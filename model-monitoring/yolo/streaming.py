@@ -0,0 +1,229 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# Frames are tracked and compared in grayscale at this size (longest side)
+TRACK_MAX_SIDE = 640
+THUMBNAIL_SIZE = (32, 32)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of xyxy boxes"""
+    a, b = a[:, None, :], b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+
+class BoxTracker:
+    """
+    Lightweight tracker between detections.
+    On a detection frame boxes are matched to the current tracks by IoU (same class) to keep
+    their track ids; on the frames in between every box is moved by the median sparse optical
+    flow (pyramidal Lucas-Kanade) of corner points inside it, and scaled by their spread.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_points: int = 16):
+        self.iou_threshold = iou_threshold
+        self.max_points = max_points
+        self.tracks: List[Dict[str, Any]] = []
+        self._next_id = 1
+        self._gray: Optional[np.ndarray] = None
+        self._scale = 1.0
+
+    def update(self, columns: Dict[str, list], gray: np.ndarray, scale: float):
+        """New detections replace the tracks; matched boxes inherit the track id"""
+        boxes = np.asarray(columns["bbox"], dtype=np.float32).reshape(-1, 4)
+        ids = [None] * len(boxes)
+        if self.tracks and len(boxes):
+            ious = iou_matrix(boxes, np.asarray([track["bbox"] for track in self.tracks], dtype=np.float32))
+            same_class = (
+                np.asarray(columns["class_name"])[:, None]
+                == np.asarray([track["class_name"] for track in self.tracks])[None, :]
+            )
+            ious = np.where(same_class, ious, 0)
+            used = set()
+            for row in np.argsort(-ious.max(axis=1)):
+                column = int(np.argmax(ious[row]))
+                if ious[row, column] >= self.iou_threshold and column not in used:
+                    used.add(column)
+                    ids[row] = self.tracks[column]["track_id"]
+
+        tracks = []
+        for index, box in enumerate(boxes):
+            if ids[index] is None:
+                ids[index] = self._next_id
+                self._next_id += 1
+            tracks.append({
+                "bbox": box.tolist(),
+                "confidence": columns["confidence"][index],
+                "class_name": columns["class_name"][index],
+                "track_id": ids[index],
+            })
+        self.tracks = tracks
+        self._gray, self._scale = gray, scale
+
+    def propagate(self, gray: np.ndarray, scale: float):
+        """Moves every track with the optical flow from the previous frame"""
+        if self._gray is None or self._gray.shape != gray.shape:
+            self._gray, self._scale = gray, scale
+            return
+
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            x1, y1, x2, y2 = (np.asarray(track["bbox"]) * scale).astype(int)
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, width), min(y2, height)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                continue
+
+            points = cv2.goodFeaturesToTrack(self._gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+            if points is None or len(points) < 2:
+                continue
+            points = points.reshape(-1, 1, 2) + np.array([x1, y1], dtype=np.float32)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+            found = status.reshape(-1) == 1
+            if found.sum() < 2:
+                continue
+
+            before, after = points[found].reshape(-1, 2), moved[found].reshape(-1, 2)
+            dx, dy = np.median(after - before, axis=0)
+            spread_before = np.linalg.norm(before - before.mean(axis=0), axis=1).mean()
+            spread_after = np.linalg.norm(after - after.mean(axis=0), axis=1).mean()
+            zoom = float(np.clip(spread_after / spread_before, 0.8, 1.25)) if spread_before > 1e-3 else 1.0
+
+            # Move and scale around the box center, back in original image coordinates
+            cx, cy = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+            half_width, half_height = (x2 - x1) * zoom / 2, (y2 - y1) * zoom / 2
+            track["bbox"] = [
+                max(cx - half_width, 0) / scale,
+                max(cy - half_height, 0) / scale,
+                min(cx + half_width, width) / scale,
+                min(cy + half_height, height) / scale,
+            ]
+        self._gray, self._scale = gray, scale
+
+
+class StreamSession:
+    """
+    State of one frame stream (one WebSocket connection).
+    Detection runs on the first frame, every detect_every frames and when the scene changes
+    (mean absolute difference of a small thumbnail to the last detected frame above
+    scene_threshold); the frames in between get the tracker's boxes.
+    """
+
+    def __init__(self, session_id: str, detect_every: int = 5, scene_threshold: float = 0.08):
+        self.session_id = session_id
+        self.detect_every = max(1, detect_every)
+        self.scene_threshold = scene_threshold
+        self.tracker = BoxTracker()
+        self.frames = 0
+        self.detected = 0
+        self.skipped = 0
+        self.started_at = time.perf_counter()
+        self._since_detection = 0
+        self._keyframe: Optional[np.ndarray] = None
+
+    @staticmethod
+    def prepare(image: np.ndarray):
+        """Grayscale frame at tracking size, its scale to the original and a thumbnail"""
+        height, width = image.shape[:2]
+        scale = min(1.0, TRACK_MAX_SIDE / max(height, width))
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(round(width * scale)), int(round(height * scale))), interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+        return gray, scale, thumbnail
+
+    def scene_changed(self, thumbnail: np.ndarray) -> bool:
+        if self._keyframe is None or self.scene_threshold <= 0:
+            return False
+        return float(np.abs(thumbnail - self._keyframe).mean()) / 255 > self.scene_threshold
+
+    def needs_detection(self, thumbnail: np.ndarray) -> str:
+        """Reason to run the model on this frame ('' = track only)"""
+        if self._keyframe is None:
+            return "first"
+        if self._since_detection + 1 >= self.detect_every:
+            return "interval"
+        if self.scene_changed(thumbnail):
+            return "scene_change"
+        return ""
+
+    def detected_frame(self, columns: Dict[str, list], gray: np.ndarray, scale: float, thumbnail: np.ndarray):
+        self.tracker.update(columns, gray, scale)
+        self._keyframe = thumbnail
+        self._since_detection = 0
+        self.frames += 1
+        self.detected += 1
+
+    def tracked_frame(self, gray: np.ndarray, scale: float):
+        self.tracker.propagate(gray, scale)
+        self._since_detection += 1
+        self.frames += 1
+        self.skipped += 1
+
+    def detections(self, precision: Optional[int] = None) -> List[Dict[str, Any]]:
+        records = []
+        for track in self.tracker.tracks:
+            bbox, confidence = track["bbox"], track["confidence"]
+            if precision is not None:
+                bbox, confidence = [round(value, precision) for value in bbox], round(confidence, precision)
+            records.append({
+                "bbox": bbox,
+                "confidence": confidence,
+                "class_name": track["class_name"],
+                "track_id": track["track_id"],
+            })
+        return records
+
+    def stats(self) -> dict:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        return {
+            "frames": self.frames,
+            "detected": self.detected,
+            "skipped": self.skipped,
+            "fps": round(self.frames / elapsed, 2),
+            "detected_fps": round(self.detected / elapsed, 2),
+        }
+
+
+class StreamMetrics:
+    """Frames per mode (detected / tracked / shed) and open sessions"""
+
+    def __init__(self, meter: Optional[Any] = None):
+        self.sessions = 0
+        self._frames = None
+        self._frame_latency = None
+
+        if meter is not None:
+            self._register_metrics(meter)
+
+    def _register_metrics(self, meter):
+        """Registers frame counter, frame latency and session gauge on OpenTelemetry meter"""
+        from opentelemetry.metrics import Observation
+
+        self._frames = meter.create_counter(
+            "yolo_stream_frames",
+            description="Stream frames by mode: detected (model ran) or tracked (boxes propagated)",
+        )
+        self._frame_latency = meter.create_histogram(
+            "yolo_stream_frame_ms",
+            unit="ms",
+            description="Time from receiving a stream frame to sending its result",
+        )
+        meter.create_observable_gauge(
+            "yolo_stream_sessions",
+            callbacks=[lambda options: [Observation(self.sessions)]],
+            description="Open streaming sessions",
+        )
+
+    def record_frame(self, mode: str, reason: str, duration_ms: float):
+        if self._frames:
+            self._frames.add(1, {"mode": mode, "reason": reason or "tracked"})
+            self._frame_latency.record(duration_ms, {"mode": mode})
@@ -0,0 +1,101 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from postprocess import empty_columns
+
+Tile = Tuple[int, int, int, int]  # x1, y1, x2, y2 in image pixels
+
+
+def _axis_starts(length: int, tile: int, stride: int) -> List[int]:
+    """Tile offsets along one axis; the last tile is aligned to the image edge"""
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height: int, width: int, tile_size: int, overlap: float, max_tiles: int) -> List[Tile]:
+    """
+    Overlapping tiles covering the image.
+    When the grid would exceed max_tiles the tile size grows until it fits,
+    so the whole image is always covered.
+    """
+    tile_size = max(32, tile_size)
+    while True:
+        stride = max(1, int(tile_size * (1 - overlap)))
+        xs = _axis_starts(width, tile_size, stride)
+        ys = _axis_starts(height, tile_size, stride)
+        if len(xs) * len(ys) <= max_tiles or tile_size >= max(height, width):
+            break
+        tile_size = int(tile_size * 1.25) + 1
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in ys
+        for x in xs
+    ]
+
+
+def crop_tiles(image: np.ndarray, grid: Sequence[Tile]) -> List[np.ndarray]:
+    """Contiguous tile crops (views are copied once so they can be batched or put in the object store)"""
+    return [np.ascontiguousarray(image[y1:y2, x1:x2]) for x1, y1, x2, y2 in grid]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray,
+        threshold: float = 0.5, metric: str = "ios") -> np.ndarray:
+    """
+    Class-aware greedy NMS, returns kept indices sorted by score.
+    'ios' (intersection over smaller box) also removes partial boxes of objects
+    cut by a tile border, which plain IoU keeps.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=int)
+
+    # Offset boxes per class so different classes never overlap
+    offsets = classes.astype(np.float64)[:, None] * (boxes.max() + 1)
+    shifted = boxes.astype(np.float64) + offsets
+    areas = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        current, rest = order[0], order[1:]
+        keep.append(current)
+        if not rest.size:
+            break
+        width = np.clip(np.minimum(shifted[current, 2], shifted[rest, 2]) - np.maximum(shifted[current, 0], shifted[rest, 0]), 0, None)
+        height = np.clip(np.minimum(shifted[current, 3], shifted[rest, 3]) - np.maximum(shifted[current, 1], shifted[rest, 1]), 0, None)
+        intersection = width * height
+        if metric == "ios":
+            denominator = np.minimum(areas[current], areas[rest])
+        else:
+            denominator = areas[current] + areas[rest] - intersection
+        overlap = intersection / np.maximum(denominator, 1e-9)
+        order = rest[overlap <= threshold]
+    return np.array(keep, dtype=int)
+
+
+def merge_tiles(tile_columns: Sequence[Dict[str, list]], grid: Sequence[Tile],
+                threshold: float = 0.5, metric: str = "ios") -> Dict[str, list]:
+    """Shifts per-tile detections to image coordinates and merges them with cross-tile NMS"""
+    boxes, scores, names = [], [], []
+    for columns, (x1, y1, _, _) in zip(tile_columns, grid):
+        if not columns["bbox"]:
+            continue
+        boxes.append(np.asarray(columns["bbox"], dtype=np.float32) + np.array([x1, y1, x1, y1], dtype=np.float32))
+        scores.extend(columns["confidence"])
+        names.extend(columns["class_name"])
+    if not boxes:
+        return empty_columns()
+
+    boxes = np.concatenate(boxes)
+    scores = np.asarray(scores, dtype=np.float32)
+    class_names, classes = np.unique(np.asarray(names), return_inverse=True)
+    keep = nms(boxes, scores, classes, threshold, metric)
+    return {
+        "bbox": boxes[keep].tolist(),
+        "confidence": scores[keep].tolist(),
+        "class_name": class_names[classes[keep]].tolist(),
+    }
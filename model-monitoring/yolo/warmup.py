@@ -0,0 +1,116 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def parse_shapes(spec: str) -> List[Tuple[int, int]]:
+    """'1280x720,640x480' (width x height) -> [(720, 1280), (480, 640)] as (height, width)"""
+    shapes = []
+    for item in spec.split(","):
+        if item.strip():
+            width, height = item.lower().split("x")
+            shapes.append((int(height), int(width)))
+    return shapes
+
+
+def parse_sizes(spec: str) -> List[int]:
+    """'1,8' -> [1, 8]"""
+    return sorted({int(item) for item in spec.split(",") if item.strip()})
+
+
+def synthetic_images(shape: Tuple[int, int], count: int, seed: int = 0) -> List[np.ndarray]:
+    """Random noise BGR frames: unlike zeros they also exercise the NMS path"""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, size=(*shape, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def warm_up(infer: Callable[[List[np.ndarray]], object],
+            shapes: Sequence[Tuple[int, int]],
+            batch_sizes: Sequence[int] = (1,),
+            rounds: int = 1) -> Dict[str, float]:
+    """
+    Runs synthetic inference for every input shape and batch size,
+    so kernel selection and buffer allocation happen before real traffic.
+    Returns time of the last round per 'WIDTHxHEIGHTxBATCH' in ms.
+    """
+    timings = {}
+    for height, width in shapes:
+        for batch_size in batch_sizes:
+            images = synthetic_images((height, width), batch_size)
+            for _ in range(max(1, rounds)):
+                start_time = time.perf_counter()
+                infer(images)
+                duration = (time.perf_counter() - start_time) * 1000
+            timings[f"{width}x{height}x{batch_size}"] = round(duration, 2)
+    return timings
+
+
+class ReadinessState:
+    """Warm-up state and first request timing of a serving process"""
+
+    def __init__(self, meter: Optional[Any] = None, started_at: Optional[float] = None):
+        self.created_at = started_at or time.perf_counter()
+        self.ready = False
+        self.error: Optional[str] = None
+        self.warmup_ms: Dict[str, float] = {}
+        self.time_to_ready_ms: Optional[float] = None
+        self.time_to_first_request_ms: Optional[float] = None
+        self.first_request_latency_ms: Optional[float] = None
+        self._histograms = {}
+
+        if meter is not None:
+            self._register_metrics(meter)
+
+    def _register_metrics(self, meter):
+        """Registers readiness gauge and startup latency histograms on OpenTelemetry meter"""
+        from opentelemetry.metrics import Observation
+
+        meter.create_observable_gauge(
+            "yolo_ready",
+            callbacks=[lambda options: [Observation(int(self.ready))]],
+            description="1 once warm-up has completed and the API reports healthy",
+        )
+        for name, description in (
+            ("warmup", "Total synthetic warm-up inference time"),
+            ("time_to_ready", "Time from process start until the API reports healthy"),
+            ("time_to_first_request", "Time from process start to the first detection request"),
+            ("first_request_latency", "Latency of the first detection request"),
+        ):
+            self._histograms[name] = meter.create_histogram(f"yolo_{name}_ms", unit="ms", description=description)
+
+    def _record(self, name: str, value: float):
+        if name in self._histograms:
+            self._histograms[name].record(value)
+
+    def mark_ready(self, warmup_ms: Optional[Dict[str, float]] = None):
+        self.warmup_ms = warmup_ms or {}
+        self.time_to_ready_ms = round((time.perf_counter() - self.created_at) * 1000, 2)
+        self.ready = True
+        self._record("warmup", sum(self.warmup_ms.values()))
+        self._record("time_to_ready", self.time_to_ready_ms)
+
+    def mark_failed(self, error: Exception):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def first_request(self) -> bool:
+        """True exactly once: for the first request served by this process"""
+        if self.time_to_first_request_ms is not None:
+            return False
+        self.time_to_first_request_ms = round((time.perf_counter() - self.created_at) * 1000, 2)
+        self._record("time_to_first_request", self.time_to_first_request_ms)
+        return True
+
+    def record_first_request_latency(self, latency_ms: float):
+        self.first_request_latency_ms = round(latency_ms, 2)
+        self._record("first_request_latency", self.first_request_latency_ms)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "warmup_ms": self.warmup_ms,
+            "time_to_ready_ms": self.time_to_ready_ms,
+            "time_to_first_request_ms": self.time_to_first_request_ms,
+            "first_request_latency_ms": self.first_request_latency_ms,
+        }
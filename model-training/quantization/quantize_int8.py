@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+INT8 post-training quantization for CPU serving
+Calibrates a YOLO .pt model on a sample of the DVC dataset, exports an INT8
+OpenVINO model and reports mAP delta and latency gain against the FP32 model
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+from dotenv import load_dotenv
+from ultralytics import YOLO
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "..", "..", "data-managment", "dataset")
+
+
+def find_images(dataset_dir):
+    """Finds labeled images (YOLO export layout: images/ next to labels/)"""
+    images = []
+    for path in glob.glob(os.path.join(dataset_dir, "**", "images", "*"), recursive=True):
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(os.path.abspath(path))
+    return sorted(images)
+
+
+def load_class_names(dataset_dir):
+    """Reads class names from classes.txt of the Label Studio export"""
+    classes_files = glob.glob(os.path.join(dataset_dir, "**", "classes.txt"), recursive=True)
+    if not classes_files:
+        raise FileNotFoundError(f"classes.txt not found in {dataset_dir} (run 'dvc pull' first)")
+    with open(classes_files[0]) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def write_data_yaml(output_dir, name, image_paths, class_names):
+    """Writes ultralytics data yaml whose val split is the given image list"""
+    list_file = os.path.join(output_dir, f"{name}.txt")
+    with open(list_file, "w") as file:
+        file.write("\n".join(image_paths))
+
+    data_file = os.path.join(output_dir, f"{name}.yaml")
+    with open(data_file, "w") as file:
+        yaml.safe_dump({
+            "train": list_file,
+            "val": list_file,
+            "names": dict(enumerate(class_names)),
+        }, file)
+    return data_file
+
+
+def split_dataset(images, calib_size, val_fraction, seed):
+    """Splits images into calibration sample and validation split"""
+    images = list(images)
+    random.Random(seed).shuffle(images)
+    val_count = max(1, int(len(images) * val_fraction))
+    val_images = images[:val_count]
+    calib_images = images[val_count:val_count + calib_size] or val_images
+    return calib_images, val_images
+
+
+def evaluate(model, data_file, imgsz):
+    """Returns mAP50-95 and mAP50 on the validation split"""
+    metrics = model.val(data=data_file, imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False)
+    return {"map50_95": float(metrics.box.map), "map50": float(metrics.box.map50)}
+
+
+def measure_latency(model, image_paths, imgsz, repeats=3):
+    """Median single-image latency in ms"""
+    model(image_paths[0], imgsz=imgsz, verbose=False)  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        for path in image_paths:
+            start_time = time.perf_counter()
+            model(path, imgsz=imgsz, verbose=False)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+    return float(np.percentile(latencies, 50))
+
+
+def log_artifact(model_dir, report, artifact_name, project):
+    """Uploads INT8 model to W&B so Ray Serve replicas can load it"""
+    import wandb
+
+    run = wandb.init(project=project, job_type="quantization", config=report)
+    try:
+        artifact = wandb.Artifact(artifact_name, type="model", metadata=report)
+        artifact.add_dir(model_dir, name=os.path.basename(model_dir))
+        run.log_artifact(artifact)
+        print(f"📤 Logged W&B artifact: {artifact_name}")
+    finally:
+        wandb.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization for YOLO")
+    parser.add_argument("--model", required=True, help="Path to YOLO .pt weights")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="DVC dataset directory (YOLO export)")
+    parser.add_argument("--output", default="quantized", help="Output directory")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--calib-size", type=int, default=300, help="Calibration images")
+    parser.add_argument("--val-fraction", type=float, default=0.2, help="Fraction of images used for mAP")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the split")
+    parser.add_argument("--log-artifact", default=None, help="W&B artifact name for the INT8 model")
+    parser.add_argument("--wandb-project", default=os.getenv("WANDB_PROJECT", "ml-ops-yolo-cpu"))
+    args = parser.parse_args()
+
+    load_dotenv()
+    os.makedirs(args.output, exist_ok=True)
+
+    images = find_images(args.dataset)
+    if not images:
+        raise SystemExit(f"❌ No labeled images found in {args.dataset} (run 'dvc pull' first)")
+    class_names = load_class_names(args.dataset)
+
+    calib_images, val_images = split_dataset(images, args.calib_size, args.val_fraction, args.seed)
+    print(f"📁 {len(images)} images | calibration: {len(calib_images)} | validation: {len(val_images)}")
+    calib_data = write_data_yaml(args.output, "calibration", calib_images, class_names)
+    val_data = write_data_yaml(args.output, "validation", val_images, class_names)
+
+    # FP32 baseline
+    print("🤖 Evaluating FP32 model...")
+    fp32_model = YOLO(args.model)
+    fp32_metrics = evaluate(fp32_model, val_data, args.imgsz)
+    fp32_latency = measure_latency(fp32_model, val_images, args.imgsz)
+
+    # INT8 export (OpenVINO + NNCF calibration on the calibration split)
+    print("⚙️  Quantizing to INT8...")
+    int8_path = YOLO(args.model).export(
+        format="openvino", int8=True, data=calib_data, imgsz=args.imgsz, fraction=1.0, dynamic=True
+    )
+    int8_dir = os.path.join(args.output, f"{Path(args.model).stem}_int8_openvino_model")
+    if os.path.abspath(str(int8_path)) != os.path.abspath(int8_dir):
+        shutil.rmtree(int8_dir, ignore_errors=True)
+        shutil.move(str(int8_path), int8_dir)
+
+    print("🤖 Evaluating INT8 model...")
+    int8_model = YOLO(int8_dir, task="detect")
+    int8_metrics = evaluate(int8_model, val_data, args.imgsz)
+    int8_latency = measure_latency(int8_model, val_images, args.imgsz)
+
+    report = {
+        "model": args.model,
+        "int8_model": int8_dir,
+        "calibration_images": len(calib_images),
+        "validation_images": len(val_images),
+        "fp32": {**fp32_metrics, "latency_ms_p50": fp32_latency},
+        "int8": {**int8_metrics, "latency_ms_p50": int8_latency},
+        "map50_95_delta": int8_metrics["map50_95"] - fp32_metrics["map50_95"],
+        "map50_delta": int8_metrics["map50"] - fp32_metrics["map50"],
+        "speedup": fp32_latency / int8_latency,
+    }
+    report_file = os.path.join(args.output, "quantization_report.json")
+    with open(report_file, "w") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"\n{'':>6} | {'mAP50-95':>9} | {'mAP50':>7} | {'p50 ms':>8}")
+    print("-" * 40)
+    for name in ("fp32", "int8"):
+        row = report[name]
+        print(f"{name:>6} | {row['map50_95']:>9.4f} | {row['map50']:>7.4f} | {row['latency_ms_p50']:>8.1f}")
+    print(f"\nΔ mAP50-95: {report['map50_95_delta']:+.4f} | speedup: x{report['speedup']:.2f}")
+    print(f"📄 Report saved: {report_file}")
+
+    if args.log_artifact:
+        log_artifact(int8_dir, report, args.log_artifact, args.wandb_project)
+
+
+if __name__ == "__main__":
+    main()